@@ -2,19 +2,28 @@ from django.shortcuts import render, get_object_or_404, redirect, get_list_or_40
 from django.http import HttpResponse
 from django.template import loader
 
-from api.pagination import CustomPagination
+from api import bulk
+from api.conditional import ConditionalMixin
+from api.filters import FullTextSearchFilter
+from api.pagination import (CommentKeysetPagination, FollowKeysetPagination,
+                            PostKeysetPagination)
+from api.rows import (CommentRowSerializer, FollowRowSerializer,
+                      GroupRowSerializer, PostRowSerializer, RowListMixin)
+from api.sparse import SparseFieldsMixin
 from api.throttling import LunchBreakThrottle
+from posts import conditional
 from posts.models import Post, Group, User, Comment, Follow
 import datetime
 from django.core.paginator import Paginator
 from posts.forms import PostForm, CommentForm
+from posts.export import CONTENT_TYPES, export_lines
 from django.contrib.auth.decorators import login_required
 from django.views.decorators.cache import cache_page
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
 
 from api.serializer import CommentSerializer, FollowSerializer, GroupSerializer, PostSerializer
 from rest_framework import status, viewsets, mixins
-from rest_framework.decorators import api_view
+from rest_framework.decorators import action, api_view
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.generics import ListCreateAPIView, RetrieveUpdateDestroyAPIView
@@ -40,7 +49,7 @@ def get_post(request, pk):
     """Получает пост по переданному pk."""
     if request.method == 'GET':
         # получаем объект публикации по id, он же pk
-        post = get_object_or_404(Post, id=pk)
+        post = get_object_or_404(Post.objects.with_related(), id=pk)
         #post = Post.objects.get(pk=pk)
         # передаём объект публикации сериализатору
         serial_post = PostSerializer(post)
@@ -80,7 +89,7 @@ def api_posts(request):
 
     # В случае GET-запроса возвращаем список постов
     # Получаем все объекты модели
-    posts = Post.objects.all()
+    posts = Post.objects.with_related()
     # Передаём queryset в конструктор сериализатора
     serializer = PostSerializer(posts, many=True)
     # В ответ на GET-запрос нужно вернуть JSON
@@ -96,7 +105,7 @@ def api_post_detail(request, pk):
     Post по его id.
     """
     try:
-        post = Post.objects.get(id=pk)
+        post = Post.objects.with_related().get(id=pk)
     except Post.DoesNotExist:
         return Response(status=status.HTTP_404_NOT_FOUND)
 
@@ -138,7 +147,7 @@ class APIPost(APIView):
     """
 
     def get(self, request):
-        posts = Post.objects.all()
+        posts = Post.objects.with_related()
         serializer = PostSerializer(posts, many=True)
         return Response(serializer.data)
 
@@ -150,13 +159,31 @@ class APIPost(APIView):
         return Response(serializer.error, status=status.HTTP_400_BAD_REQUEST)
 
 
+class PostExportView(APIView):
+    """Потоковая выгрузка всех постов с авторами, группами и тэгами:
+    api/v1/posts/export.ndjson и api/v1/posts/export.csv.
+
+    В отличие от APIPost.get не собирает весь список в памяти: строки
+    отдаются клиенту по мере чтения постов из БД пачками.
+    """
+
+    def get(self, request, export_format):
+        response = StreamingHttpResponse(
+            export_lines(export_format),
+            content_type=CONTENT_TYPES[export_format]
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="posts.{export_format}"')
+        return response
+
+
 class APIPostDetail(APIView):
     """Обрабатывает запросы GET, PUT, PATCH и DELETE:
     возвращает, изменяет или удаляет отдельный объект модели Post."""
 
     def get(self, request, pk):
         try:
-            post = Post.objects.get(id=pk)
+            post = Post.objects.with_related().get(id=pk)
             serializer = PostSerializer(post)
             return Response(serializer.data)
         except Post.DoesNotExist:
@@ -198,36 +225,79 @@ class APIPostDetail(APIView):
 class APIGenericPostList(ListCreateAPIView):
     """Возвращает всю коллекцию объектов (например, все посты)
     или может создать новую запись в БД."""
-    queryset = Post.objects.all()
+    queryset = Post.objects.with_related()
     serializer_class = PostSerializer
 
 class APIGenericPostDetail(RetrieveUpdateDestroyAPIView):
     """Его работа — возвращать, обновлять или удалять объекты модели по одному."""
-    queryset = Post.objects.all()
+    queryset = Post.objects.with_related()
     serializer_class = PostSerializer
 
 
-class PostViewSet(viewsets.ModelViewSet):
+class PostViewSet(ConditionalMixin, SparseFieldsMixin, RowListMixin,
+                  viewsets.ModelViewSet):
     """Этот набор представлений предоставит доступ ко всем
     операциям с моделью Post (CRUD). Созданный для него роутер
     будет генерировать два эндпоинта:
     api/v1/posts/, api/v1/posts/<int:pk>/.
     """
-    queryset = Post.objects.all()
+    queryset = Post.objects.with_related()
     serializer_class = PostSerializer
+    # список отдаётся из строк .values() (см. api/rows.py),
+    # ?fields=, ?omit= и ?expand=tags отбирают поля (см. api/sparse.py)
+    row_serializer_class = PostRowSerializer
     # читать могут все, редактировать только автор поста
     permission_classes = [IsAuthorOrReadOnly, ]
     # добавили ограничения на публикации и доступ к ним в обеденное время,
     # ограничения на проект user=100/minute, anon=10/minute
     #throttle_classes = [LunchBreakThrottle, ]
-    pagination_class = CustomPagination
-    # добавим возможность поиска по тексту по регулярным выражениям
-    filter_backends = [filters.SearchFilter, ]
-    search_fields = ['$text']
+    # страницы по ключу (pub_date, id) без COUNT(*) и OFFSET,
+    # в конверте {'count', 'response'} с адресами next/previous
+    # (см. api/pagination.py)
+    pagination_class = PostKeysetPagination
+    # полнотекстовый поиск ?search= по заголовку, анонсу, тексту и тэгам
+    filter_backends = [FullTextSearchFilter, ]
+    search_fields = ['title', 'anons', 'text', 'tag__name']
 
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
 
+    def retrieve_validators(self, request, pk=None):
+        """Версия поста для ответа 304 (см. api/conditional.py)."""
+        return conditional.post_resource(pk, self.representation(request))
+
+    @action(detail=False, methods=['post'],
+            permission_classes=[IsAuthenticated])
+    def bulk(self, request):
+        """api/v1/posts/bulk/ (POST): создаёт список постов за один запрос.
+
+        Ответ - результат по каждому элементу (см. api/bulk.py):
+        201, если созданы все посты, 400 - если ни одного,
+        207 - если часть элементов отклонена.
+        """
+        items = request.data
+        if not isinstance(items, list):
+            return Response({'detail': 'Ожидается список постов'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if len(items) > bulk.MAX_ITEMS:
+            return Response(
+                {'detail': f'Не больше {bulk.MAX_ITEMS} постов за запрос'},
+                status=status.HTTP_400_BAD_REQUEST)
+        results = bulk.create_posts(items, request.user)
+        created = sum(
+            result['status'] == status.HTTP_201_CREATED for result in results)
+        if created == len(results):
+            code = status.HTTP_201_CREATED
+        elif created:
+            code = status.HTTP_207_MULTI_STATUS
+        else:
+            code = status.HTTP_400_BAD_REQUEST
+        return Response({
+            'created': created,
+            'failed': len(results) - created,
+            'results': results,
+        }, status=code)
+
 
     # def create(self, request):
     #     """Переопределим метод create так, чтобы при создании поста
@@ -285,16 +355,24 @@ class PostViewSet(viewsets.ModelViewSet):
             return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class GroupViewSet(viewsets.ReadOnlyModelViewSet):
+class GroupViewSet(ConditionalMixin, SparseFieldsMixin, RowListMixin,
+                   viewsets.ReadOnlyModelViewSet):
     """Группы может создавать только админ сайта, значит доступны только GET
     запросы. Роутер будет генерировать два эндпоинта:
     api/v1/groups/, api/v1/groups/<int:pk>/."""
 
     queryset = Group.objects.all()
     serializer_class = GroupSerializer
+    row_serializer_class = GroupRowSerializer
+
+    def list_validators(self, request):
+        return conditional.group_list(self.representation(request))
+
+    def retrieve_validators(self, request, pk=None):
+        return conditional.group_resource(pk, self.representation(request))
 
 
-class CommentViewSet(viewsets.ModelViewSet):
+class CommentViewSet(SparseFieldsMixin, RowListMixin, viewsets.ModelViewSet):
     """
     api/v1/posts/{post_id}/comments/ (GET, POST):
     получаем список всех комментариев поста с id=post_id или создаём новый,
@@ -303,6 +381,8 @@ class CommentViewSet(viewsets.ModelViewSet):
     получаем, редактируем или удаляем комментарий по id у поста с id=post_id.
     """
     serializer_class = CommentSerializer
+    row_serializer_class = CommentRowSerializer
+    pagination_class = CommentKeysetPagination
     permission_classes = [IsAuthenticated, AuthorPermission]
 
     def perform_create(self, serializer):
@@ -321,7 +401,7 @@ class CommentViewSet(viewsets.ModelViewSet):
         return this_post.comments.all()
 
 
-class FollowViewSet(BaseGetPostViewSet):
+class FollowViewSet(RowListMixin, BaseGetPostViewSet):
     """
     ViewSet будет:
     o	возвращает все подписки пользователя, сделавшего запрос;
@@ -330,6 +410,8 @@ class FollowViewSet(BaseGetPostViewSet):
     """
 
     serializer_class = FollowSerializer
+    row_serializer_class = FollowRowSerializer
+    pagination_class = FollowKeysetPagination
     # нужно получать не все записи модели Follow, а только
     # относящиеся к id юзера, который делает запрос, показать тех,
     # на кого он подписан
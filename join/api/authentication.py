@@ -0,0 +1,89 @@
+"""Аутентификация по JWT без запроса к таблице пользователей.
+
+Штатная JWTAuthentication после проверки подписи токена читает
+пользователя из БД на каждый запрос. CachedJWTAuthentication держит
+в общем кэше короткоживущий «слепок» пользователя - только поля, нужные
+для проверок доступа, - и собирает из него объект User без запроса.
+Слепок удаляется сигналами при любом сохранении или удалении
+пользователя (api/signals.py), а на случай изменений в обход
+сигналов (QuerySet.update()) живёт недолго - JWT_USER_CACHE_TIMEOUT.
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import (AuthenticationFailed,
+                                                 InvalidToken)
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+User = get_user_model()
+
+# Поля слепка. Пароля здесь нет: остальные поля у собранного объекта
+# отложенные (deferred) - при обращении догрузятся из БД, а save()
+# запишет только загруженные поля и не затрёт пароль
+SNAPSHOT_FIELDS = ('id', 'username', 'email', 'first_name', 'last_name',
+                   'is_active', 'is_staff', 'is_superuser')
+
+
+def snapshot_key(user_id):
+    return f'auth.user.{user_id}'
+
+
+def invalidate_user(user_id):
+    """Удаляет слепок пользователя из кэша."""
+    cache.delete(snapshot_key(user_id))
+
+
+def make_snapshot(user):
+    """Слепок пользователя: значения SNAPSHOT_FIELDS и хэш для отзыва."""
+    snapshot = {field: getattr(user, field) for field in SNAPSHOT_FIELDS}
+    if api_settings.CHECK_REVOKE_TOKEN:
+        snapshot['revoke_hash'] = get_md5_hash_password(user.password)
+    return snapshot
+
+
+def user_from_snapshot(snapshot):
+    """Собирает User из слепка так, как будто его прочитали из БД."""
+    # from_db() ждёт значения в порядке полей модели
+    fields = [field.attname for field in User._meta.concrete_fields
+              if field.attname in SNAPSHOT_FIELDS]
+    return User.from_db(
+        DEFAULT_DB_ALIAS, fields, [snapshot[field] for field in fields])
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication со слепком пользователя в кэше."""
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(
+                _('Token contained no recognizable user identification'))
+
+        key = snapshot_key(user_id)
+        snapshot = cache.get(key)
+        if snapshot is None:
+            try:
+                user = self.user_model.objects.get(
+                    **{api_settings.USER_ID_FIELD: user_id})
+            except self.user_model.DoesNotExist:
+                raise AuthenticationFailed(
+                    _('User not found'), code='user_not_found')
+            snapshot = make_snapshot(user)
+            cache.set(key, snapshot, settings.JWT_USER_CACHE_TIMEOUT)
+
+        if not snapshot['is_active']:
+            raise AuthenticationFailed(
+                _('User is inactive'), code='user_inactive')
+
+        if api_settings.CHECK_REVOKE_TOKEN and validated_token.get(
+                api_settings.REVOKE_TOKEN_CLAIM) != snapshot.get('revoke_hash'):
+            raise AuthenticationFailed(
+                _("The user's password has been changed."),
+                code='password_changed')
+
+        return user_from_snapshot(snapshot)
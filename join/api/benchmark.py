@@ -0,0 +1,111 @@
+"""Замер сериализации списков: ModelSerializer против api/rows.py.
+
+Для каждой модели берётся одна и та же выборка (первые limit записей
+в порядке выдачи API) и сериализуется двумя способами: как раньше -
+объекты модели с select_related/prefetch_related и ModelSerializer,
+и строками .values() через RowSerializer. Время - лучшее из rounds
+прогонов, вместе с чтением из БД; ответы сравниваются на равенство.
+
+run_renderers() так же сравнивает JSONRenderer/JSONParser DRF
+с ORJSONRenderer/ORJSONParser на странице ответа PostSerializer.
+
+Запуск: python manage.py benchmark_serializers [--renderers]
+(данные - seed_benchmark).
+"""
+import io
+import time
+
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from api.parsers import ORJSONParser
+from api.renderers import ORJSONRenderer, orjson
+from api.rows import (CommentRowSerializer, FollowRowSerializer,
+                      GroupRowSerializer, PostRowSerializer)
+from api.serializer import (CommentSerializer, FollowSerializer,
+                            GroupSerializer, PostSerializer)
+from posts.models import Comment, Follow, Group, Post
+
+
+def cases():
+    """Имя -> (queryset, сериализатор модели, сериализатор строк)."""
+    return {
+        'posts': (Post.objects.with_related(),
+                  PostSerializer, PostRowSerializer),
+        'comments': (Comment.objects.select_related('author'),
+                     CommentSerializer, CommentRowSerializer),
+        'groups': (Group.objects.order_by('id'),
+                   GroupSerializer, GroupRowSerializer),
+        'follows': (Follow.objects.select_related('user', 'author'),
+                    FollowSerializer, FollowRowSerializer),
+    }
+
+
+def _best(function, rounds):
+    best, result = None, None
+    for _ in range(rounds):
+        start = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def run(limit=500, rounds=5, names=None, progress=None):
+    """Возвращает {имя: {'rows', 'model_ms', 'rows_ms', 'speedup',
+    'identical'}} по каждой модели."""
+    results = {}
+    for name, (queryset, model_serializer, row_serializer) in cases().items():
+        if names and name not in names:
+            continue
+        page = queryset[:limit]
+        model_time, model_data = _best(
+            lambda: model_serializer(page.all(), many=True).data, rounds)
+        rows = row_serializer()
+        row_time, row_data = _best(
+            lambda: rows.serialize(rows.values(queryset)[:limit]), rounds)
+        results[name] = {
+            'rows': len(row_data),
+            'model_ms': round(model_time * 1000, 3),
+            'rows_ms': round(row_time * 1000, 3),
+            'speedup': round(model_time / row_time, 2) if row_time else None,
+            'identical': [dict(item) for item in model_data] == row_data,
+        }
+        if progress is not None:
+            progress(name, results[name])
+    return results
+
+
+def run_renderers(limit=500, rounds=5):
+    """Рендер и разбор страницы PostSerializer двумя способами.
+
+    Возвращает {'render': {...}, 'parse': {...}} с временем stdlib json
+    и orjson; 'identical' - совпадают ли байты ответа и разобранные
+    данные.
+    """
+    data = PostSerializer(
+        Post.objects.with_related()[:limit], many=True).data
+    json_time, json_bytes = _best(lambda: JSONRenderer().render(data), rounds)
+    orjson_time, orjson_bytes = _best(
+        lambda: ORJSONRenderer().render(data), rounds)
+    parse_json_time, parsed = _best(
+        lambda: JSONParser().parse(io.BytesIO(json_bytes)), rounds)
+    parse_orjson_time, orjson_parsed = _best(
+        lambda: ORJSONParser().parse(io.BytesIO(json_bytes)), rounds)
+
+    def result(stdlib, fast, identical):
+        return {
+            'json_ms': round(stdlib * 1000, 3),
+            'orjson_ms': round(fast * 1000, 3),
+            'speedup': round(stdlib / fast, 2) if fast else None,
+            'identical': identical,
+        }
+
+    return {
+        'rows': len(data),
+        'bytes': len(json_bytes),
+        'orjson_installed': orjson is not None,
+        'render': result(json_time, orjson_time, json_bytes == orjson_bytes),
+        'parse': result(parse_json_time, parse_orjson_time,
+                        parsed == orjson_parsed),
+    }
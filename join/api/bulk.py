@@ -0,0 +1,114 @@
+"""Пакетное создание постов: POST api/v1/posts/bulk/.
+
+Клиент присылает список постов в том же виде, что и для
+POST api/v1/posts/, и получает результат по каждому элементу. Вся пачка
+стоит постоянного числа запросов, а не нескольких запросов на пост:
+- каждый элемент проверяется BulkPostSerializer без обращений к БД;
+- группы всей пачки ищутся одним запросом;
+- тэги - одним запросом, недостающие создаются одной вставкой
+  (posts/tags.py);
+- посты, связи TagPost и поисковые документы пишутся bulk_create
+  пачками по BATCH_SIZE в одной транзакции.
+bulk_create не шлёт сигналов, поэтому то, что при обычном сохранении
+делают posts/signals.py (документы поиска, ленты подписчиков, счётчик
+постов автора, сброс кэша страниц), делается здесь же.
+"""
+from django.conf import settings
+from django.db import transaction
+from rest_framework import serializers, status
+
+from api.serializer import BulkPostSerializer, PostSerializer
+from core.cache.generations import bump_generation
+from posts import search, timeline
+from posts.models import Group, Post, PostSearchDocument, TagPost, UserStats
+from posts.tags import normalize, resolve_tags
+
+# Сколько постов можно прислать одним запросом
+MAX_ITEMS = getattr(settings, 'POSTS_BULK_MAX_ITEMS', 500)
+BATCH_SIZE = 500
+
+
+def _error(index, errors):
+    return {'index': index, 'status': status.HTTP_400_BAD_REQUEST,
+            'errors': errors}
+
+
+def _group_error(slug):
+    # то же сообщение, что отдал бы SlugRelatedField в PostSerializer
+    message = serializers.SlugRelatedField.default_error_messages[
+        'does_not_exist']
+    return {'group': [str(message).format(slug_name='slug', value=slug)]}
+
+
+def create_posts(items, author):
+    """Создаёт посты автора из списка словарей.
+
+    Возвращает список результатов в порядке items: для созданного
+    поста - {'index', 'status': 201, 'id', 'post'}, для отклонённого -
+    {'index', 'status': 400, 'errors'}. Ошибка в одном элементе
+    не мешает создать остальные.
+    """
+    results = [None] * len(items)
+    valid = []
+    for index, item in enumerate(items):
+        serializer = BulkPostSerializer(data=item)
+        if serializer.is_valid():
+            valid.append((index, serializer.validated_data))
+        else:
+            results[index] = _error(index, serializer.errors)
+
+    slugs = {data['group'] for _, data in valid if data.get('group')}
+    groups = dict(
+        Group.objects.filter(slug__in=slugs).values_list('slug', 'id')
+    ) if slugs else {}
+    accepted = []
+    for index, data in valid:
+        slug = data.get('group')
+        if slug and slug not in groups:
+            results[index] = _error(index, _group_error(slug))
+        else:
+            accepted.append((index, data))
+    if not accepted:
+        return results
+
+    with transaction.atomic():
+        names = [normalize(tag['name'] for tag in data.get('tag', []))
+                 for _, data in accepted]
+        tag_ids = resolve_tags(name for post_names in names
+                               for name in post_names)
+        posts = [
+            Post(
+                title=data['title'],
+                anons=data.get('anons', ''),
+                text=data['text'],
+                group_id=groups.get(data.get('group')),
+                author=author,
+            )
+            for _, data in accepted
+        ]
+        # id новых постов bulk_create получает из RETURNING
+        # (PostgreSQL, SQLite 3.35+), они нужны для связей с тэгами
+        Post.objects.bulk_create(posts, batch_size=BATCH_SIZE)
+        TagPost.objects.bulk_create(
+            [TagPost(post=post, tag_id=tag_ids[name])
+             for post, post_names in zip(posts, names)
+             for name in post_names],
+            batch_size=BATCH_SIZE)
+        PostSearchDocument.objects.bulk_create(
+            [search.make_document(post, post_names)
+             for post, post_names in zip(posts, names)],
+            batch_size=BATCH_SIZE)
+        timeline.fan_out_posts(author.pk, [post.pk for post in posts])
+        UserStats.bump(author.pk, 'posts_count', len(posts))
+        UserStats.touch_feed(author.pk)
+        bump_generation('posts')
+
+    created = Post.objects.with_related().in_bulk([post.pk for post in posts])
+    for (index, _), post in zip(accepted, posts):
+        results[index] = {
+            'index': index,
+            'status': status.HTTP_201_CREATED,
+            'id': post.pk,
+            'post': PostSerializer(created[post.pk]).data,
+        }
+    return results
@@ -0,0 +1,38 @@
+"""Ответ 304 для действий DRF-вьюсетов.
+
+Вьюсет объявляет метод <действие>_validators(request, **kwargs),
+возвращающий (etag, last_modified) или None, - и ConditionalMixin
+до вызова сериализатора проверяет If-None-Match/If-Modified-Since.
+Версии ресурсов считает posts/conditional.py.
+"""
+from core.cache.conditional import not_modified, set_validators
+
+
+class ConditionalMixin:
+    """Условные GET для list и retrieve."""
+
+    def representation(self, request):
+        """Часть ETag, зависящая от формата ответа: JSON и HTML
+        браузерного API - разные представления одного ресурса."""
+        renderer = getattr(request, 'accepted_renderer', None)
+        return getattr(renderer, 'format', '')
+
+    def conditional(self, handler, request, *args, **kwargs):
+        validators = getattr(self, f'{self.action}_validators', None)
+        found = validators(request, **kwargs) if validators else None
+        if found is None:
+            return handler(request, *args, **kwargs)
+        etag, last_modified = found
+        response = not_modified(request, etag, last_modified)
+        if response is not None:
+            return response
+        response = handler(request, *args, **kwargs)
+        if response.status_code == 200:
+            set_validators(response, etag, last_modified)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional(super().retrieve, request, *args, **kwargs)
@@ -0,0 +1,19 @@
+from rest_framework import filters
+
+from posts.search import search_posts
+
+
+class FullTextSearchFilter(filters.SearchFilter):
+    """Полнотекстовый поиск по постам через параметр ?search=.
+
+    Вместо регулярных выражений и icontains (полный перебор таблицы)
+    ищет по поисковым документам постов (posts/search.py):
+    по заголовку, анонсу, тексту и тэгам, лучшие совпадения - первыми.
+    search_fields вьюсета здесь только подсказка для browsable API.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, '')
+        if not query.strip():
+            return queryset
+        return search_posts(query, queryset)
@@ -1,4 +1,11 @@
-from rest_framework.pagination import PageNumberPagination, Response
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import (BasePagination, PageNumberPagination,
+                                       Response)
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from core.db.estimates import estimate_count
+from core.paginators.keyset import InvalidCursor, KeysetPaginator
 
 
 class CustomPagination(PageNumberPagination):
@@ -14,3 +21,164 @@ class CustomPagination(PageNumberPagination):
             'count': self.page.paginator.count,
             'response': data,
         })
+
+
+class KeysetPagination(BasePagination):
+    """Паджинация списка по ключу: ?after=<курсор> и ?before=<курсор>.
+
+    В отличие от PageNumberPagination не делает ни COUNT(*) по всей
+    выборке, ни OFFSET: страница выбирается условием по ключам
+    (core/paginators/keyset.py) и стоит одинаково в начале и в конце
+    списка. Последний ключ должен быть уникальным (id).
+
+    count в ответе - null; ?count=estimate просит примерное число
+    записей по статистике планировщика (core/db/estimates.py).
+    Адреса соседних страниц - в полях next/previous и в заголовке Link.
+
+    Если в запросе есть параметр из ranked_query_params (поиск
+    с сортировкой по релевантности, которую нельзя листать по ключу),
+    список разбивается fallback_class по номерам страниц. В остальных
+    случаях ?page=1 по-прежнему означает первую страницу, а номер
+    больше - ошибка 400, а не молча первая страница: иначе клиент,
+    листающий по номерам до пустой страницы, никогда бы не остановился.
+    """
+    keys = ('id',)
+    descending = False
+    page_size = api_settings.PAGE_SIZE
+    after_query_param = 'after'
+    before_query_param = 'before'
+    count_query_param = 'count'
+    page_query_param = 'page'
+    ranked_query_params = ()
+    fallback_class = PageNumberPagination
+    invalid_cursor_message = 'Неверный курсор'
+    page_number_message = ('Номера страниц не поддерживаются: листайте '
+                           'по ссылке next (параметр after)')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.fallback = None
+        if any(request.query_params.get(param, '').strip()
+               for param in self.ranked_query_params):
+            self.fallback = self.fallback_class()
+            return self.fallback.paginate_queryset(queryset, request, view)
+        page_number = request.query_params.get(self.page_query_param, '1')
+        if page_number.strip() not in ('', '1'):
+            raise ValidationError(
+                {self.page_query_param: [self.page_number_message]})
+
+        self.count = None
+        if request.query_params.get(self.count_query_param) == 'estimate':
+            self.count = estimate_count(queryset)
+        paginator = KeysetPaginator(
+            queryset, self.page_size, self.keys, self.descending)
+        try:
+            self.page = paginator.page(
+                after=request.query_params.get(self.after_query_param),
+                before=request.query_params.get(self.before_query_param))
+        except InvalidCursor:
+            raise NotFound(self.invalid_cursor_message)
+        return list(self.page)
+
+    def _link(self, param, cursor):
+        if cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        for other in (self.after_query_param, self.before_query_param,
+                      self.page_query_param):
+            url = remove_query_param(url, other)
+        return replace_query_param(url, param, cursor)
+
+    def get_next_link(self):
+        return self._link(self.after_query_param, self.page.next_cursor)
+
+    def get_previous_link(self):
+        return self._link(self.before_query_param, self.page.previous_cursor)
+
+    def get_envelope(self, data):
+        return {
+            'count': self.count,
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        }
+
+    def get_paginated_response(self, data):
+        if self.fallback is not None:
+            return self.fallback.get_paginated_response(data)
+        links = [f'<{url}>; rel="{rel}"' for rel, url in (
+            ('next', self.get_next_link()),
+            ('prev', self.get_previous_link())) if url]
+        headers = {'Link': ', '.join(links)} if links else None
+        return Response(self.get_envelope(data), headers=headers)
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['count', 'results'],
+            'properties': {
+                'count': {'type': 'integer', 'nullable': True},
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True,
+                             'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        def parameter(name, description):
+            return {'name': name, 'required': False, 'in': 'query',
+                    'description': description, 'schema': {'type': 'string'}}
+
+        return [
+            parameter(self.after_query_param, 'Курсор следующей страницы'),
+            parameter(self.before_query_param, 'Курсор предыдущей страницы'),
+            parameter(self.count_query_param,
+                      'estimate - вернуть примерное число записей'),
+        ]
+
+
+class PostKeysetPagination(KeysetPagination):
+    """Посты от новых к старым по (pub_date, id).
+
+    Ответ - в конверте CustomPagination {'count', 'response'}, к которому
+    добавлены адреса соседних страниц next/previous (они же - в заголовке
+    Link). Поиск (?search=) сортирует по релевантности и листается
+    по номерам страниц через CustomPagination.
+    """
+    keys = ('pub_date', 'id')
+    descending = True
+    ranked_query_params = ('search',)
+    fallback_class = CustomPagination
+
+    def get_envelope(self, data):
+        return {
+            'count': self.count,
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'response': data,
+        }
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['count', 'response'],
+            'properties': {
+                'count': {'type': 'integer', 'nullable': True},
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True,
+                             'format': 'uri'},
+                'response': schema,
+            },
+        }
+
+
+class CommentKeysetPagination(KeysetPagination):
+    """Комментарии поста от новых к старым по (created, id)."""
+    keys = ('created', 'id')
+    descending = True
+
+
+class FollowKeysetPagination(KeysetPagination):
+    """Подписки в порядке оформления (по id, как Follow.Meta.ordering)."""
+    keys = ('id',)
@@ -0,0 +1,32 @@
+"""Быстрый разбор JSON в теле запроса на orjson.
+
+Пара к ORJSONRenderer из api/renderers.py. orjson читает только
+UTF-8, поэтому тело в другой кодировке сначала декодируется;
+NaN и Infinity orjson, как и JSONParser при STRICT_JSON, не принимает.
+Без orjson парсер работает как обычный JSONParser.
+"""
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+
+from api.renderers import ORJSONRenderer, orjson
+
+
+class ORJSONParser(JSONParser):
+    """JSONParser на orjson."""
+    renderer_class = ORJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        if orjson is None or not self.strict:
+            return super().parse(stream, media_type, parser_context)
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        data = stream.read()
+        try:
+            if encoding.lower().replace('_', '-') not in ('utf-8', 'utf8'):
+                data = data.decode(encoding)
+            return orjson.loads(data)
+        except ValueError as exc:
+            # orjson.JSONDecodeError и UnicodeDecodeError - подклассы
+            # ValueError, как и ошибки json.load у JSONParser
+            raise ParseError('JSON parse error - %s' % str(exc))
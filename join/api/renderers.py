@@ -0,0 +1,54 @@
+"""Быстрый JSON-рендерер API на orjson.
+
+JSONRenderer DRF собирает ответ модулем json стандартной библиотеки;
+orjson (расширение на Rust) делает то же в несколько раз быстрее
+и сразу отдаёт bytes. Всё, что orjson не умеет сам, - ленивые строки
+перевода, Decimal, даты, QuerySet - передаётся в тот же
+JSONEncoder.default, что у DRF, поэтому ответ совпадает побайтно:
+даты - как '2024-01-01T10:00:00.123Z', Decimal - числом.
+
+orjson - необязательная зависимость: без него и там, где orjson
+не подходит (отступ не в 2 пробела, UNICODE_JSON = False),
+рендерер работает как обычный JSONRenderer. Подключается
+в REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'] вместе с ORJSONParser
+из api/parsers.py.
+"""
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# \u2028 и \u2029 JSONRenderer экранирует, чтобы JSON оставался
+# подмножеством JavaScript, - здесь так же
+_ESCAPES = (('\u2028'.encode(), b'\\u2028'),
+            ('\u2029'.encode(), b'\\u2029'))
+
+
+class ORJSONRenderer(JSONRenderer):
+    """JSONRenderer на orjson с тем же выводом."""
+
+    if orjson is not None:
+        # даты orjson вывел бы по-своему (микросекунды, +00:00) -
+        # пусть их форматирует JSONEncoder DRF
+        options = (orjson.OPT_PASSTHROUGH_DATETIME
+                   | orjson.OPT_NON_STR_KEYS)
+        default = staticmethod(JSONEncoder().default)
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        # orjson пишет только UTF-8, отступ только в 2 пробела и без
+        # пробелов после ',' и ':' (COMPACT_JSON) - иначе рендерит DRF
+        if (orjson is None or self.ensure_ascii or indent not in (None, 2)
+                or (indent is None and not self.compact)):
+            return super().render(data, accepted_media_type, renderer_context)
+        options = self.options | (orjson.OPT_INDENT_2 if indent else 0)
+        ret = orjson.dumps(data, default=self.default, option=options)
+        for char, escaped in _ESCAPES:
+            if char in ret:
+                ret = ret.replace(char, escaped)
+        return ret
@@ -0,0 +1,198 @@
+"""Быстрое чтение списков API: сериализация из строк .values().
+
+ModelSerializer на каждый объект создаёт экземпляр модели, обходит
+поля сериализатора и вызывает to_representation каждого поля - на
+странице из сотен постов это основное время ответа. Здесь список
+читается плоскими словарями .values() с именами автора и slug группы
+из JOIN, длина текста считается в SQL (Length('text')), а ответ
+собирается простым переименованием ключей.
+
+JSON получается тот же, что у обычных сериализаторов из
+api/serializer.py (это проверяют тесты api/tests/test_rows.py):
+даты выводит тот же DateTimeField DRF, тэги - тем же списком
+{'id', 'name'}. Сериализаторы модели по-прежнему нужны для записи
+и для browsable API.
+"""
+from django.db.models.functions import Length
+from rest_framework import serializers
+from rest_framework.response import Response
+
+from posts.models import TagPost
+
+# DateTimeField без параметров: формат и часовой пояс - из настроек DRF,
+# как у полей ModelSerializer
+_datetime = serializers.DateTimeField()
+
+
+class RowSerializer:
+    """Описание ответа через пути .values().
+
+    fields - пары (ключ ответа, путь для values()) в порядке вывода;
+    annotations - выражения, которые считает БД (путь = имя аннотации);
+    datetime_fields - ключи ответа с датами; attached - пути, которые
+    заполняет attach(); hidden - пути, нужные только attach()
+    и в ответ не попадающие.
+
+    Для выборочных полей (?fields=, ?omit=, см. api/sparse.py):
+    expandable - вложенные ресурсы {имя для ?expand=: ключ ответа},
+    которые при ?fields= выводятся, только если их попросили;
+    requires - поля модели, из которых сериализатор модели считает
+    ключ (для only()); prefetch - prefetch_related под ключ.
+
+    names - ключи ответа, которые нужно вывести, по умолчанию все.
+    """
+    fields = ()
+    annotations = {}
+    datetime_fields = ()
+    hidden = ()
+    attached = ()
+    expandable = {}
+    requires = {}
+    prefetch = {}
+
+    def __init__(self, names=None):
+        self.selected = tuple(
+            (key, path) for key, path in self.fields
+            if names is None or key in names)
+        self.names = {key for key, _ in self.selected}
+
+    def values(self, queryset, extra=()):
+        """QuerySet словарей вместо объектов модели.
+
+        select_related и prefetch_related не нужны: связанные значения
+        приходят JOIN-ом, остальное добавляет attach(). extra - пути,
+        которые нужны вне ответа (ключи курсора паджинации).
+        """
+        skip = set(self.annotations).union(self.attached)
+        paths = [path for _, path in self.selected if path not in skip]
+        annotations = {name: expression
+                       for name, expression in self.annotations.items()
+                       if name in self.names}
+        hidden = [path for path in (*self.hidden, *extra)
+                  if path not in paths]
+        return (queryset.select_related(None).prefetch_related(None)
+                .values(*paths, *dict.fromkeys(hidden), **annotations))
+
+    def prune(self, queryset):
+        """QuerySet объектов модели только с полями выбранных ключей:
+        only() по их полям, JOIN и prefetch - только под них."""
+        paths = []
+        for key, path in self.selected:
+            if key in self.requires:
+                paths.extend(self.requires[key])
+            elif key not in self.prefetch:
+                paths.append(path)
+        related = {path.split('__')[0] for path in paths if '__' in path}
+        queryset = queryset.select_related(None).prefetch_related(None)
+        if related:
+            queryset = queryset.select_related(*sorted(related))
+        lookups = [self.prefetch[key] for key in self.prefetch
+                   if key in self.names]
+        if lookups:
+            queryset = queryset.prefetch_related(*lookups)
+        return queryset.only(*paths)
+
+    def attach(self, rows):
+        """Дополняет строки страницы данными из других таблиц."""
+
+    def to_representation(self, row):
+        data = {key: row[path] for key, path in self.selected}
+        for key in self.datetime_fields:
+            if key in data:
+                data[key] = _datetime.to_representation(data[key])
+        return data
+
+    def serialize(self, rows):
+        rows = list(rows)
+        self.attach(rows)
+        return [self.to_representation(row) for row in rows]
+
+
+class PostRowSerializer(RowSerializer):
+    """Как PostSerializer; тэги страницы - одним запросом к TagPost."""
+    fields = (
+        ('title', 'title'),
+        ('anons', 'anons'),
+        ('text', 'text'),
+        ('publication_date', 'pub_date'),
+        ('group', 'group__slug'),
+        ('author', 'author__username'),
+        ('tag', 'tag'),
+        ('character_quantity', 'character_quantity'),
+    )
+    annotations = {'character_quantity': Length('text')}
+    datetime_fields = ('publication_date',)
+    hidden = ('id',)
+    # values('tag') размножил бы строки по числу тэгов
+    attached = ('tag',)
+    expandable = {'tags': 'tag'}
+    requires = {'character_quantity': ('text',)}
+    prefetch = {'tag': 'tag'}
+
+    def attach(self, rows):
+        if 'tag' not in self.names:
+            return
+        tags = {row['id']: [] for row in rows}
+        if tags:
+            # тэги в порядке добавления к посту
+            for post_id, tag_id, name in (
+                TagPost.objects.filter(post_id__in=tags)
+                .order_by('post_id', 'id')
+                .values_list('post_id', 'tag_id', 'tag__name')
+            ):
+                tags[post_id].append({'id': tag_id, 'name': name})
+        for row in rows:
+            row['tag'] = tags[row['id']]
+
+
+class CommentRowSerializer(RowSerializer):
+    """Как CommentSerializer."""
+    fields = (
+        ('post', 'post'),
+        ('author', 'author__username'),
+        ('text', 'text'),
+        ('created', 'created'),
+    )
+    datetime_fields = ('created',)
+
+
+class GroupRowSerializer(RowSerializer):
+    """Как GroupSerializer."""
+    fields = (
+        ('title', 'title'),
+        ('slug', 'slug'),
+        ('description', 'description'),
+    )
+
+
+class FollowRowSerializer(RowSerializer):
+    """Как FollowSerializer."""
+    fields = (
+        ('user', 'user__username'),
+        ('author', 'author__username'),
+    )
+
+
+class RowListMixin:
+    """list() вьюсета через row_serializer_class.
+
+    Фильтры и пагинация вьюсета работают как обычно, только страница
+    состоит из словарей. Остальные действия используют serializer_class.
+    """
+    row_serializer_class = None
+
+    def get_row_serializer(self):
+        return self.row_serializer_class()
+
+    def list(self, request, *args, **kwargs):
+        if self.row_serializer_class is None:
+            return super().list(request, *args, **kwargs)
+        row_serializer = self.get_row_serializer()
+        # курсор паджинации по ключу собирается из значений ключей
+        queryset = row_serializer.values(
+            self.filter_queryset(self.get_queryset()),
+            extra=getattr(self.paginator, 'keys', ()))
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(row_serializer.serialize(page))
+        return Response(row_serializer.serialize(queryset))
@@ -1,11 +1,29 @@
 
+from djoser.serializers import UserSerializer as DjoserUserSerializer
+from posts import search
 from posts.models import Comment, Follow, Post, Group, Tag, TagPost, User
+from posts.tags import resolve_tags
 from rest_framework import serializers
 
 from rest_framework.validators import UniqueTogetherValidator
 from rest_framework.exceptions import ValidationError
 
 
+class DynamicFieldsMixin:
+    """Сериализатор с параметром fields - какие поля выводить.
+
+    Остальные поля убираются из сериализатора целиком, так что
+    для них не читаются связанные объекты. Имена полей проверяет
+    вьюсет (api/sparse.py).
+    """
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
 class TagSerializer(serializers.ModelSerializer):
     """Serializer for Tag Model.
 
@@ -14,9 +32,12 @@ class TagSerializer(serializers.ModelSerializer):
     class Meta:
         model = Tag
         fields = ['id', 'name']
+        # название тэга уникально, но пост можно создать с уже
+        # существующим тэгом: UniqueValidator тут не нужен
+        extra_kwargs = {'name': {'validators': []}}
 
 
-class PostSerializer(serializers.ModelSerializer):
+class PostSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """Serializer for Post Model.
 
     Converts model`s objects to JSON and back.
@@ -64,40 +85,20 @@ class PostSerializer(serializers.ModelSerializer):
     # переопределим метод create, укажем явным образом, какие
     # записи в каких таблицах нужно создать
     def create(self, validated_data):
-        # Если в исходном запросе не было поля tag
-        # доступ к тем данным, которые были переданы в сериализатор
-        # хранятся в словаре serializer.initial_data
-        if 'tag' not in self.initial_data:
-            # То создаём запись о посте без тэгов используя
-            # словарь с данными прошедшими валидацию
-            post = Post.objects.create(**validated_data)
-            return post
-
-        # Если в исходном запросе было поле tag
-        # Из списка serializer.validated_data извлечь и сохранить
-        # в переменную элемент tags список тэгов
-        # Уберем список достижений из словаря validated_data
-        # и сохраним его
-        tags = validated_data.pop('tag')
-
-        # создадим новый пост пока без тэгов, данных достаточно
-        # тэги пока лежат в сторонке, ждут обработки
+        # Уберем список тэгов из словаря validated_data и сохраним его;
+        # если в запросе не было поля tag - пост создаётся без тэгов
+        tags = validated_data.pop('tag', [])
         post = Post.objects.create(**validated_data)
-
-        # если проверяемый элемент уже есть в базе — в таблицу
-        # связей TagPost добавить связь этого тэга с новым постом;
-        # если проверяемого элемента в базе нет — в базе достижений
-        # создать новую запись и в таблицу связей TagPost добавить
-        # связь этого тэга с новым постом
-
-        # Для каждого тэга из списка тэгов
-        for tag in tags:
-            # Создадим новую запись или получим существующий экземпляр из БД
-            current_tag, status = Post.objects.get_or_create(
-                **tag)
-            # Поместим ссылку на каждый тэг во вспомогательную таблицу
-            # Не забыв указать к какому посту он относится
-            TagPost.objects.create(tag=current_tag, post=post)
+        if not tags:
+            return post
+        # все тэги - одним запросом, недостающие создаются одной вставкой,
+        # связи с постом в TagPost - тоже одной вставкой
+        tag_ids = resolve_tags(tag['name'] for tag in tags)
+        TagPost.objects.bulk_create(
+            [TagPost(post=post, tag_id=tag_id) for tag_id in tag_ids.values()])
+        # bulk_create не шлёт сигналов: тэги в поисковый документ
+        # добавляем сами
+        search.update_document(post)
         # вернуть JSON с объектом свежесозданного поста и списком его тэгов
         return post
 
@@ -116,7 +117,17 @@ class PostSerializer(serializers.ModelSerializer):
     #     instance.save()
     #     return instance
 
-class GroupSerializer(serializers.ModelSerializer):
+class BulkPostSerializer(PostSerializer):
+    """Проверяет один пост из пачки api/v1/posts/bulk/ без запросов к БД.
+
+    Группа здесь - просто slug: SlugRelatedField искал бы группу
+    отдельным запросом на каждый пост, а api/bulk.py ищет группы
+    всей пачки одним запросом.
+    """
+    group = serializers.SlugField(required=False, allow_null=True)
+
+
+class GroupSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """Сериализатор для модели Group.
 
     Группы может создавать только админ сайта, значит доступны только GET запросы.
@@ -129,7 +140,7 @@ class GroupSerializer(serializers.ModelSerializer):
         ]
 
 
-class CommentSerializer(serializers.ModelSerializer):
+class CommentSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """Сериализатор для модели Comment."""
 
     author = serializers.SlugRelatedField(
@@ -203,3 +214,25 @@ class FollowSerializer(serializers.ModelSerializer):
         raise serializers.ValidationError(
             'Нельзя подписаться на себя'
         )
+
+
+class UserSerializer(DjoserUserSerializer):
+    """Сериализатор пользователя для эндпоинтов djoser (auth/users/).
+
+    К стандартным полям добавлены денормализованные счётчики UserStats:
+    они читаются из одной строки, без COUNT(*) по постам и подпискам.
+    """
+    posts_count = serializers.IntegerField(
+        source='stats.posts_count', read_only=True, default=0)
+    comments_count = serializers.IntegerField(
+        source='stats.comments_count', read_only=True, default=0)
+    followers_count = serializers.IntegerField(
+        source='stats.followers_count', read_only=True, default=0)
+    following_count = serializers.IntegerField(
+        source='stats.following_count', read_only=True, default=0)
+
+    class Meta(DjoserUserSerializer.Meta):
+        fields = DjoserUserSerializer.Meta.fields + (
+            'posts_count', 'comments_count',
+            'followers_count', 'following_count',
+        )
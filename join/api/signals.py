@@ -0,0 +1,15 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .authentication import invalidate_user
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user_snapshot(sender, instance, **kwargs):
+    """Изменили, заблокировали или удалили пользователя - слепок
+    для JWT-аутентификации больше не годится."""
+    invalidate_user(instance.pk)
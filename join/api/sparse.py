@@ -0,0 +1,90 @@
+"""Выборочные поля ответа: ?fields=, ?omit= и ?expand=.
+
+    /api/v1/posts/?fields=title,anons,author   только эти поля
+    /api/v1/posts/?omit=text                   все, кроме текста
+    /api/v1/posts/?fields=title&expand=tags    заголовок и тэги
+
+Без параметров ответ прежний. Вложенные ресурсы (тэги поста) при
+?fields= выводятся, только если их назвали в fields или в expand.
+Поля отбираются не только в ответе, но и в SQL: список читает из БД
+лишь нужные столбцы и JOIN-ы (RowSerializer.values), отдельный объект -
+only() и prefetch тэгов только тогда, когда они нужны
+(RowSerializer.prune). Какие поля есть и из чего они берутся,
+описывает row_serializer_class вьюсета (api/rows.py).
+"""
+from rest_framework.exceptions import ValidationError
+
+SPARSE_ACTIONS = ('list', 'retrieve')
+
+
+def _names(value):
+    return [name.strip() for name in (value or '').split(',') if name.strip()]
+
+
+def select_fields(query_params, row_serializer_class):
+    """Ключи ответа по параметрам запроса или None, если параметров нет.
+
+    Неизвестные имена - ошибка 400 с перечнем допустимых.
+    """
+    if not any(param in query_params for param in ('fields', 'omit', 'expand')):
+        return None
+    available = [key for key, _ in row_serializer_class.fields]
+    expandable = row_serializer_class.expandable
+    errors = {}
+
+    def check(param, names, allowed):
+        unknown = [name for name in names if name not in allowed]
+        if unknown:
+            errors[param] = [
+                f'Неизвестные поля: {", ".join(unknown)}. '
+                f'Допустимые: {", ".join(allowed)}']
+
+    requested = _names(query_params.get('fields'))
+    omitted = _names(query_params.get('omit'))
+    expanded = _names(query_params.get('expand'))
+    check('fields', requested, available)
+    check('omit', omitted, available)
+    check('expand', expanded, list(expandable))
+    if errors:
+        raise ValidationError(errors)
+
+    if 'fields' in query_params:
+        selected = set(requested)
+    else:
+        selected = set(available)
+    selected.update(expandable[name] for name in expanded)
+    selected.difference_update(omitted)
+    return tuple(key for key in available if key in selected)
+
+
+class SparseFieldsMixin:
+    """?fields=, ?omit= и ?expand= для list и retrieve вьюсета.
+
+    Ставится перед RowListMixin: список сериализуется RowSerializer
+    с выбранными ключами, отдельный объект - serializer_class
+    с параметром fields (DynamicFieldsMixin из api/serializer.py).
+    """
+
+    def sparse_fields(self):
+        if not hasattr(self, '_sparse_fields'):
+            self._sparse_fields = None
+            if self.action in SPARSE_ACTIONS:
+                self._sparse_fields = select_fields(
+                    self.request.query_params, self.row_serializer_class)
+        return self._sparse_fields
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        names = self.sparse_fields()
+        if names is None:
+            return queryset
+        return self.row_serializer_class(names).prune(queryset)
+
+    def get_row_serializer(self):
+        return self.row_serializer_class(self.sparse_fields())
+
+    def get_serializer(self, *args, **kwargs):
+        names = self.sparse_fields()
+        if names is not None:
+            kwargs.setdefault('fields', names)
+        return super().get_serializer(*args, **kwargs)
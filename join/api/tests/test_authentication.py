@@ -0,0 +1,68 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from api.authentication import snapshot_key
+from core.ratelimit.testing import IsolatedThrottleMixin
+
+User = get_user_model()
+
+
+class TestCachedJWTAuthentication(IsolatedThrottleMixin, TestCase):
+    """Пользователь JWT-запроса берётся из кэша, а не из БД."""
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='jwt_user', password='secret-pass-123')
+        self.client = APIClient()
+        response = self.client.post(
+            '/api/v1/auth/jwt/create/',
+            {'username': 'jwt_user', 'password': 'secret-pass-123'})
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f'Bearer {response.data["access"]}')
+
+    def user_queries(self, url='/api/v1/groups/'):
+        """Выполняет запрос и возвращает обращения к таблице пользователей."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return [query['sql'] for query in queries
+                if User._meta.db_table in query['sql']]
+
+    def test_user_is_cached(self):
+        """Первый запрос читает пользователя, следующие - нет."""
+        self.assertTrue(self.user_queries())
+        self.assertIsNotNone(cache.get(snapshot_key(self.user.pk)))
+        self.assertEqual(self.user_queries(), [])
+
+    def test_user_change_invalidates_snapshot(self):
+        """Изменение пользователя сразу видно в API."""
+        self.user_queries()
+        self.user.username = 'renamed'
+        self.user.save()
+        self.assertIsNone(cache.get(snapshot_key(self.user.pk)))
+        response = self.client.get('/api/v1/auth/users/me/')
+        self.assertEqual(response.data['username'], 'renamed')
+
+    def test_inactive_user_rejected(self):
+        """Заблокированный пользователь теряет доступ без ожидания TTL."""
+        self.user_queries()
+        self.user.is_active = False
+        self.user.save()
+        response = self.client.get('/api/v1/groups/')
+        self.assertEqual(response.status_code, 401)
+
+    def test_snapshot_user_save_keeps_password(self):
+        """Сохранение пользователя из слепка не затирает пароль."""
+        self.user_queries()
+        response = self.client.patch(
+            '/api/v1/auth/users/me/', {'email': 'jwt@example.com'})
+        self.assertEqual(response.status_code, 200)
+        user = User.objects.get(pk=self.user.pk)
+        self.assertEqual(user.email, 'jwt@example.com')
+        self.assertTrue(user.check_password('secret-pass-123'))
@@ -0,0 +1,104 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from core.ratelimit.testing import IsolatedThrottleMixin
+from posts.models import (Follow, Group, Post, PostSearchDocument, Tag,
+                          TagPost, TimelineEntry, UserStats)
+
+User = get_user_model()
+URL = '/api/v1/posts/bulk/'
+
+
+class TestPostsBulk(IsolatedThrottleMixin, TestCase):
+    """POST api/v1/posts/bulk/: пачка постов за постоянное число запросов."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='bulk_author')
+        cls.reader = User.objects.create_user(username='bulk_reader')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        cls.group = Group.objects.create(
+            title='Группа', slug='bulk-group', description='-')
+        Tag.objects.create(name='старый')
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.author)
+
+    def items(self, count):
+        return [
+            {'title': f'Пост {i}', 'text': 'Текст', 'group': 'bulk-group',
+             'tag': [{'name': 'старый'}, {'name': f'новый{i % 3}'}]}
+            for i in range(count)
+        ]
+
+    def test_creates_posts_with_tags(self):
+        response = self.client.post(URL, self.items(5), format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['created'], 5)
+        result = response.data['results'][0]
+        post = Post.objects.get(pk=result['id'])
+        self.assertEqual(result['post']['group'], 'bulk-group')
+        self.assertEqual(post.author, self.author)
+        self.assertEqual(
+            sorted(post.tag.values_list('name', flat=True)),
+            ['новый0', 'старый'])
+        # тэги не задвоились: один старый и три новых
+        self.assertEqual(Tag.objects.count(), 4)
+        self.assertEqual(TagPost.objects.count(), 10)
+        self.assertEqual(PostSearchDocument.objects.count(), 5)
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.reader).count(), 5)
+        self.assertEqual(
+            UserStats.objects.get(user=self.author).posts_count, 5)
+
+    def test_query_count_does_not_grow(self):
+        with CaptureQueriesContext(connection) as small:
+            self.client.post(URL, self.items(2), format='json')
+        with CaptureQueriesContext(connection) as large:
+            self.client.post(URL, self.items(40), format='json')
+        self.assertEqual(len(small), len(large))
+
+    def test_per_item_errors(self):
+        items = self.items(2) + [
+            {'title': 'Без текста'},
+            {'title': 'Чужая группа', 'text': 'Текст', 'group': 'nope'},
+        ]
+        response = self.client.post(URL, items, format='json')
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual(
+            [result['status'] for result in response.data['results']],
+            [201, 201, 400, 400])
+        self.assertIn('text', response.data['results'][2]['errors'])
+        self.assertIn('group', response.data['results'][3]['errors'])
+        self.assertEqual(Post.objects.count(), 2)
+
+    def test_rejects_bad_payload(self):
+        self.assertEqual(
+            self.client.post(URL, {'title': 'x'}, format='json').status_code,
+            400)
+        self.assertEqual(
+            self.client.post(URL, [{'title': 'x'}], format='json').status_code,
+            400)
+        self.client.force_authenticate(None)
+        self.assertEqual(
+            self.client.post(URL, self.items(1), format='json').status_code,
+            401)
+
+    def test_single_create_reuses_existing_tag(self):
+        response = self.client.post('/api/v1/posts/', {
+            'title': 'Один', 'text': 'Текст',
+            'tag': [{'name': 'старый'}, {'name': 'свежий'}]}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            sorted(tag['name'] for tag in response.data['tag']),
+            ['свежий', 'старый'])
+        self.assertEqual(Tag.objects.filter(name='старый').count(), 1)
+        self.assertIn(
+            'свежий', PostSearchDocument.objects.get(post__title='Один').tags)
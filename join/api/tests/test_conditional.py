@@ -0,0 +1,67 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from core.ratelimit.testing import IsolatedThrottleMixin
+from posts.models import Group, Post, Tag, TagPost
+
+User = get_user_model()
+
+
+class TestConditionalApi(IsolatedThrottleMixin, TestCase):
+    """PostViewSet.retrieve и GroupViewSet отвечают 304 по ETag
+    и If-Modified-Since."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='api_etag')
+        cls.group = Group.objects.create(
+            title='Группа', slug='api-etag', description='-')
+        cls.post = Post.objects.create(
+            title='Пост', text='Текст', author=cls.author, group=cls.group)
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.author)
+
+    def test_post_retrieve(self):
+        url = f'/api/v1/posts/{self.post.pk}/'
+        response = self.client.get(url)
+        self.assertIn('Last-Modified', response)
+        with self.assertNumQueries(1):
+            repeat = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(repeat.status_code, 304)
+        self.assertEqual(repeat['ETag'], response['ETag'])
+        # новый тэг меняет представление поста
+        TagPost.objects.create(post=self.post,
+                               tag=Tag.objects.create(name='новый'))
+        self.assertEqual(self.client.get(
+            url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200)
+
+    def test_post_if_modified_since(self):
+        url = f'/api/v1/posts/{self.post.pk}/'
+        last_modified = self.client.get(url)['Last-Modified']
+        self.assertEqual(self.client.get(
+            url, HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304)
+
+    def test_missing_post(self):
+        self.assertEqual(self.client.get('/api/v1/posts/999/').status_code,
+                         404)
+        self.assertEqual(self.client.get('/api/v1/posts/abc/').status_code,
+                         404)
+
+    def test_groups(self):
+        for url in ('/api/v1/groups/', f'/api/v1/groups/{self.group.pk}/'):
+            with self.subTest(url=url):
+                etag = self.client.get(url)['ETag']
+                self.assertEqual(self.client.get(
+                    url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+                Group.objects.create(title='Ещё', slug=f'more-{len(url)}',
+                                     description='-')
+                self.group.description = 'Новое описание'
+                self.group.save()
+                self.assertEqual(self.client.get(
+                    url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
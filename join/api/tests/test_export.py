@@ -0,0 +1,79 @@
+import csv
+import io
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from core.ratelimit.testing import IsolatedThrottleMixin
+from posts.models import Group, Post, Tag, TagPost
+
+User = get_user_model()
+
+
+class TestPostsExport(IsolatedThrottleMixin, TestCase):
+    """Тестирует потоковую выгрузку постов."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='exporter')
+        cls.group = Group.objects.create(
+            title='Группа', slug='export_group', description='-')
+        cls.post = Post.objects.create(
+            title='Первый', anons='Анонс', text='Текст, с запятой',
+            author=cls.user, group=cls.group)
+        cls.tag = Tag.objects.create(name='выгрузка')
+        TagPost.objects.create(post=cls.post, tag=cls.tag)
+        cls.second_post = Post.objects.create(
+            title='Второй', text='Без группы', author=cls.user)
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def read(self, response):
+        return b''.join(response.streaming_content).decode()
+
+    def test_export_ndjson(self):
+        """NDJSON: по объекту на строку, с автором, группой и тэгами."""
+        response = self.client.get(
+            reverse('api:posts_export', kwargs={'export_format': 'ndjson'}))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        rows = [json.loads(line) for line in self.read(response).splitlines()]
+        self.assertEqual([row['id'] for row in rows],
+                         [self.post.id, self.second_post.id])
+        self.assertEqual(rows[0]['author'], self.user.username)
+        self.assertEqual(rows[0]['group'], self.group.slug)
+        self.assertEqual(rows[0]['tags'], [self.tag.name])
+        self.assertIsNone(rows[1]['group'])
+
+    def test_export_csv(self):
+        """CSV: заголовок и строки, текст с запятой не ломает столбцы."""
+        response = self.client.get(
+            reverse('api:posts_export', kwargs={'export_format': 'csv'}))
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        rows = list(csv.DictReader(io.StringIO(self.read(response))))
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[0]['text'], self.post.text)
+        self.assertEqual(rows[0]['tags'], self.tag.name)
+
+    def test_export_requires_auth(self):
+        """Гостю выгрузка недоступна."""
+        response = APIClient().get(
+            reverse('api:posts_export', kwargs={'export_format': 'csv'}))
+        self.assertEqual(response.status_code, 401)
+
+    def test_export_posts_command(self):
+        """manage.py export_posts пишет NDJSON в stdout."""
+        out = io.StringIO()
+        call_command('export_posts', '--chunk-size', '1', stdout=out)
+        rows = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[0]['tags'], [self.tag.name])
@@ -0,0 +1,128 @@
+import datetime
+import re
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from core.ratelimit.testing import IsolatedThrottleMixin
+from posts.models import Comment, Follow, Post
+
+User = get_user_model()
+
+
+def links(response):
+    """Ссылки из заголовка Link: {'next': url, 'prev': url}."""
+    return {rel: url for url, rel in re.findall(
+        r'<([^>]*)>; rel="(\w+)"', response.get('Link', ''))}
+
+
+class TestKeysetPagination(IsolatedThrottleMixin, TestCase):
+    """Списки постов, комментариев и подписок листаются курсором."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='cursor_author')
+        posts = [Post.objects.create(title=f'Пост {i}', text='Текст',
+                                     author=cls.author) for i in range(25)]
+        # одинаковые даты: порядок держится на id
+        same = timezone.now() - datetime.timedelta(days=1)
+        Post.objects.filter(pk__in=[post.pk for post in posts[5:15]]).update(
+            pub_date=same)
+        cls.post = posts[0]
+        for i in range(12):
+            Comment.objects.create(post=cls.post, author=cls.author,
+                                   text=f'Комментарий {i}')
+        for i in range(12):
+            Follow.objects.create(
+                user=cls.author,
+                author=User.objects.create_user(username=f'followed_{i}'))
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.author)
+
+    def walk(self, url, key):
+        """Проходит все страницы по ссылкам next, возвращает записи
+        и ответы."""
+        items, responses = [], []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            responses.append(response)
+            items.extend(response.json()[key])
+            url = links(response).get('next')
+        return items, responses
+
+    def test_posts_envelope_and_order(self):
+        posts, responses = self.walk('/api/v1/posts/', 'response')
+        titles = [post['title'] for post in posts]
+        expected = list(Post.objects.order_by('-pub_date', '-id')
+                        .values_list('title', flat=True))
+        self.assertEqual(titles, expected)
+        self.assertEqual(len(responses), 3)
+        first = responses[0].json()
+        self.assertEqual(set(first),
+                         {'count', 'next', 'previous', 'response'})
+        self.assertIsNone(first['count'])
+        self.assertIsNone(first['previous'])
+        self.assertEqual(first['next'], links(responses[0])['next'])
+        self.assertIsNone(responses[2].json()['next'])
+        # назад с последней страницы - снова вторая
+        previous = links(responses[2])['prev']
+        self.assertEqual(self.client.get(previous).json(),
+                         responses[1].json())
+
+    def test_sparse_fields_keep_cursor(self):
+        titles, _ = self.walk('/api/v1/posts/?fields=title', 'response')
+        self.assertEqual(len(titles), 25)
+        self.assertEqual(set(titles[0]), {'title'})
+
+    def test_estimated_count(self):
+        response = self.client.get('/api/v1/posts/', {'count': 'estimate'})
+        self.assertEqual(response.json()['count'], 25)
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/api/v1/posts/', {'after': 'испорчен'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_page_number_rejected(self):
+        """?page=N без поиска - 400, а не снова первая страница;
+        ?page=1 по-прежнему отдаёт первую."""
+        for url in ('/api/v1/posts/',
+                    f'/api/v1/posts/{self.post.pk}/comments/'):
+            response = self.client.get(url, {'page': 2})
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('page', response.json())
+            self.assertEqual(self.client.get(url, {'page': 1}).json(),
+                             self.client.get(url).json())
+
+    def test_search_pages_by_number(self):
+        # релевантность не листается по ключу: номера страниц
+        # и точный count, как у CustomPagination
+        response = self.client.get('/api/v1/posts/', {'search': 'Пост'})
+        self.assertEqual(response.json()['count'], 25)
+        self.assertNotIn('Link', response)
+        response = self.client.get('/api/v1/posts/',
+                                   {'search': 'Пост', 'page': 3})
+        self.assertEqual(len(response.json()['response']), 5)
+
+    def test_comments(self):
+        comments, responses = self.walk(
+            f'/api/v1/posts/{self.post.pk}/comments/', 'results')
+        self.assertEqual(
+            [comment['text'] for comment in comments],
+            list(Comment.objects.order_by('-created', '-id')
+                 .values_list('text', flat=True)))
+        first = responses[0].json()
+        self.assertEqual(set(first), {'count', 'next', 'previous', 'results'})
+        self.assertEqual(first['next'], links(responses[0])['next'])
+
+    def test_follows(self):
+        follows, _ = self.walk('/api/v1/follow/', 'results')
+        self.assertEqual([follow['author'] for follow in follows],
+                         [f'followed_{i}' for i in range(12)])
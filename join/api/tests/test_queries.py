@@ -0,0 +1,89 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import (APIClient, APIRequestFactory,
+                                 force_authenticate)
+
+from api.api_view import APIGenericPostList, APIPost, api_posts
+from core.ratelimit.testing import IsolatedThrottleMixin
+from posts.models import Group, Post, Tag, TagPost
+
+User = get_user_model()
+
+
+class TestPostListQueries(IsolatedThrottleMixin, TestCase):
+    """Число SQL-запросов списка постов не зависит от числа постов.
+
+    Автор и группа приходят JOIN-ом, тэги - одним запросом через TagPost.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tags = [Tag.objects.create(name=f'тэг{i}') for i in range(3)]
+        cls.create_posts(10)
+
+    @classmethod
+    def create_posts(cls, count):
+        """Создаёт посты разных авторов, в разных группах, с тэгами."""
+        start = Post.objects.count()
+        for i in range(start, start + count):
+            author = User.objects.create_user(username=f'author_{i}')
+            group = Group.objects.create(
+                title=f'Группа {i}', slug=f'group_{i}', description='-')
+            post = Post.objects.create(
+                title=f'Пост {i}', text='Текст', author=author, group=group)
+            for tag in cls.tags[:2]:
+                TagPost.objects.create(post=post, tag=tag)
+
+    def setUp(self):
+        super().setUp()
+        # счётчики троттлинга - в пустом хранилище в памяти
+        # (IsolatedThrottleMixin), запросов к БД они не делают;
+        # кэш чистим ради кэшированных ответов
+        cache.clear()
+        self.client = APIClient()
+        self.factory = APIRequestFactory()
+        self.reader = User.objects.create_user(username='reader')
+
+    def get(self):
+        """GET-запрос авторизованного читателя для вызова view напрямую."""
+        request = self.factory.get('/')
+        force_authenticate(request, user=self.reader)
+        return request
+
+    def assert_constant_queries(self, get_response, num):
+        """Проверяет число запросов до и после добавления постов."""
+        with self.assertNumQueries(num):
+            response = get_response()
+        self.assertEqual(response.status_code, 200)
+        self.create_posts(5)
+        with self.assertNumQueries(num):
+            get_response()
+
+    def test_post_viewset_list(self):
+        """GET /api/v1/posts/: посты и тэги, без COUNT(*) (курсор)."""
+        self.assert_constant_queries(
+            lambda: self.client.get('/api/v1/posts/'), 2)
+
+    def test_post_viewset_retrieve(self):
+        """GET /api/v1/posts/<id>/: версия для ETag, пост и его тэги."""
+        post = Post.objects.first()
+        self.assert_constant_queries(
+            lambda: self.client.get(f'/api/v1/posts/{post.id}/'), 3)
+
+    def test_api_generic_post_list(self):
+        """APIGenericPostList: COUNT, посты, тэги (пагинация по умолчанию)."""
+        view = APIGenericPostList.as_view()
+        self.assert_constant_queries(
+            lambda: view(self.get()), 3)
+
+    def test_api_post(self):
+        """APIPost.get: посты и тэги."""
+        view = APIPost.as_view()
+        self.assert_constant_queries(
+            lambda: view(self.get()), 2)
+
+    def test_api_posts(self):
+        """api_posts: посты и тэги."""
+        self.assert_constant_queries(
+            lambda: api_posts(self.get()), 2)
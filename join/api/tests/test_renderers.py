@@ -0,0 +1,112 @@
+import datetime
+import decimal
+import io
+import uuid
+
+from django.test import SimpleTestCase, TestCase
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.settings import api_settings
+from rest_framework.test import APIClient
+
+from api.benchmark import run_renderers
+from api.parsers import ORJSONParser
+from api.renderers import ORJSONRenderer
+from core.ratelimit.testing import IsolatedThrottleMixin
+from posts.models import Post, User
+
+DATA = {
+    'created': datetime.datetime(2024, 1, 2, 3, 4, 5, 678901,
+                                 tzinfo=datetime.timezone.utc),
+    'naive': datetime.datetime(2024, 1, 2, 3, 4, 5),
+    'day': datetime.date(2024, 1, 2),
+    'time': datetime.time(10, 30),
+    'duration': datetime.timedelta(minutes=90),
+    'price': decimal.Decimal('12.50'),
+    'label': gettext_lazy('Пост'),
+    'uuid': uuid.UUID(int=1),
+    'text': 'строка\u2028с разделителями\u2029',
+    'nested': [{'id': 1, 'tags': ('а', 'б')}, None, True, 1.5],
+    1: 'нестроковый ключ',
+}
+
+
+class TestORJSONRenderer(SimpleTestCase):
+    """ORJSONRenderer выводит те же байты, что JSONRenderer."""
+
+    def test_same_bytes(self):
+        self.assertEqual(ORJSONRenderer().render(DATA),
+                         JSONRenderer().render(DATA))
+
+    def test_indent(self):
+        for media_type in ('application/json; indent=2',
+                           'application/json; indent=4'):
+            with self.subTest(media_type=media_type):
+                self.assertEqual(
+                    ORJSONRenderer().render(DATA, media_type),
+                    JSONRenderer().render(DATA, media_type))
+
+    def test_none(self):
+        self.assertEqual(ORJSONRenderer().render(None), b'')
+
+
+class TestORJSONParser(SimpleTestCase):
+    """ORJSONParser разбирает тело так же, как JSONParser."""
+
+    def parse(self, body, encoding='utf-8'):
+        return ORJSONParser().parse(
+            io.BytesIO(body), parser_context={'encoding': encoding})
+
+    def test_parse(self):
+        body = JSONRenderer().render(DATA)
+        self.assertEqual(self.parse(body),
+                         JSONParser().parse(io.BytesIO(body)))
+
+    def test_other_encoding(self):
+        self.assertEqual(self.parse('{"a": "ё"}'.encode('cp1251'), 'cp1251'),
+                         {'a': 'ё'})
+
+    def test_errors(self):
+        for body in (b'{"a": ', b'{"a": NaN}', b'\xff'):
+            with self.subTest(body=body), self.assertRaises(ParseError):
+                self.parse(body)
+
+
+class TestORJSONApi(IsolatedThrottleMixin, TestCase):
+    """API по умолчанию отвечает и принимает JSON через orjson."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='orjson_author')
+        for i in range(3):
+            Post.objects.create(title=f'Пост {i}', text='Текст',
+                                author=cls.author)
+
+    def test_create_and_list(self):
+        client = APIClient()
+        client.force_authenticate(self.author)
+        response = client.post(
+            '/api/v1/posts/', {'title': 'Новый', 'text': 'Пост\u2028текст'},
+            format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertIsInstance(response.accepted_renderer, ORJSONRenderer)
+        self.assertIn(b'\\u2028', response.content)
+        response = client.get('/api/v1/posts/')
+        self.assertEqual(response.content,
+                         JSONRenderer().render(response.data))
+
+    def test_benchmark(self):
+        result = run_renderers(rounds=1)
+        self.assertEqual(result['rows'], 3)
+        self.assertTrue(result['render']['identical'])
+        self.assertTrue(result['parse']['identical'])
+
+    def test_stdlib_classes_kept_as_fallback(self):
+        """Штатные JSONRenderer и JSONParser остаются в настройках
+        следом за классами orjson."""
+        renderers = api_settings.DEFAULT_RENDERER_CLASSES
+        parsers = api_settings.DEFAULT_PARSER_CLASSES
+        self.assertEqual(renderers[:2], [ORJSONRenderer, JSONRenderer])
+        self.assertEqual(parsers[:2], [ORJSONParser, JSONParser])
@@ -0,0 +1,73 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from api import benchmark
+from api.rows import PostRowSerializer
+from api.serializer import PostSerializer
+from core.ratelimit.testing import IsolatedThrottleMixin
+from posts import search
+from posts.models import Comment, Follow, Group, Post, Tag, TagPost
+
+User = get_user_model()
+
+
+class TestRowSerializers(IsolatedThrottleMixin, TestCase):
+    """Списки из строк .values() совпадают с ответами ModelSerializer."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='rows_author')
+        cls.reader = User.objects.create_user(username='rows_reader')
+        group = Group.objects.create(
+            title='Группа', slug='rows-group', description='Описание')
+        tags = [Tag.objects.create(name=name) for name in ('б', 'а', 'в')]
+        for i in range(4):
+            post = Post.objects.create(
+                title=f'Пост {i}', anons='Анонс', text='Ёж' * (i + 1),
+                author=cls.author, group=group if i % 2 else None)
+            for tag in tags[:i]:
+                TagPost.objects.create(post=post, tag=tag)
+            search.update_document(post)
+            Comment.objects.create(post=post, author=cls.reader, text='!')
+        cls.post = post
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.reader)
+
+    def test_same_output_as_model_serializers(self):
+        for name, result in benchmark.run(rounds=1).items():
+            with self.subTest(name=name):
+                self.assertTrue(result['identical'])
+                self.assertGreater(result['rows'], 0)
+
+    def test_character_quantity_in_sql(self):
+        rows = PostRowSerializer().values(Post.objects.filter(pk=self.post.pk))
+        self.assertEqual(rows.get()['character_quantity'],
+                         len(self.post.text))
+
+    def test_post_list_with_search(self):
+        response = self.client.get('/api/v1/posts/', {'search': 'Пост'})
+        expected = PostSerializer(
+            search.search_posts('Пост', Post.objects.with_related()),
+            many=True).data
+        self.assertEqual(response.json()['response'], expected)
+
+    def test_viewset_lists(self):
+        with self.assertNumQueries(2):  # посты, тэги
+            posts = self.client.get('/api/v1/posts/').json()
+        self.assertEqual(len(posts['response']), 4)
+        # тэги - в порядке добавления к посту
+        self.assertEqual([tag['name'] for tag in posts['response'][0]['tag']],
+                         ['б', 'а', 'в'])
+        comments = self.client.get(
+            f'/api/v1/posts/{self.post.pk}/comments/').json()
+        self.assertEqual(comments['results'][0]['author'], 'rows_reader')
+        follows = self.client.get('/api/v1/follow/').json()
+        self.assertEqual(follows['results'],
+                         [{'user': 'rows_reader', 'author': 'rows_author'}])
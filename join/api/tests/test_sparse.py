@@ -0,0 +1,86 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from core.ratelimit.testing import IsolatedThrottleMixin
+from posts.models import Comment, Group, Post, Tag, TagPost
+
+User = get_user_model()
+
+
+class TestSparseFields(IsolatedThrottleMixin, TestCase):
+    """?fields=, ?omit= и ?expand=tags сокращают ответ и запросы."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='sparse_author')
+        group = Group.objects.create(
+            title='Группа', slug='sparse', description='Описание')
+        tag = Tag.objects.create(name='тэг')
+        for i in range(3):
+            cls.post = Post.objects.create(
+                title=f'Пост {i}', anons='Анонс', text='Длинный текст',
+                author=cls.author, group=group)
+            TagPost.objects.create(post=cls.post, tag=tag)
+            Comment.objects.create(
+                post=cls.post, author=cls.author, text='Комментарий')
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.author)
+
+    def get(self, url, **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def test_post_list_fields(self):
+        # без тэгов нет и запроса за ними: только страница
+        with self.assertNumQueries(1) as context:
+            data = self.get('/api/v1/posts/', fields='title,author')
+        self.assertEqual(data['response'][0],
+                         {'title': 'Пост 2', 'author': 'sparse_author'})
+        self.assertNotIn('"text"', context.captured_queries[0]['sql'])
+
+    def test_post_list_omit_and_expand(self):
+        full = self.get('/api/v1/posts/')['response'][0]
+        data = self.get('/api/v1/posts/', omit='text,anons')['response'][0]
+        self.assertEqual(data, {key: value for key, value in full.items()
+                                if key not in ('text', 'anons')})
+        data = self.get('/api/v1/posts/', fields='title',
+                        expand='tags')['response'][0]
+        self.assertEqual(data, {'title': 'Пост 2', 'tag': full['tag']})
+
+    def test_post_retrieve(self):
+        url = f'/api/v1/posts/{self.post.pk}/'
+        full = self.get(url)
+        # версия для ETag и пост без тэгов
+        with self.assertNumQueries(2) as context:
+            data = self.get(url, fields='title,group,character_quantity')
+        self.assertEqual(data, {'title': full['title'],
+                                'group': full['group'],
+                                'character_quantity': len('Длинный текст')})
+        self.assertNotIn('"anons"', context.captured_queries[1]['sql'])
+        self.assertEqual(self.get(url, fields='author', expand='tags'),
+                         {'author': full['author'], 'tag': full['tag']})
+
+    def test_comments_and_groups(self):
+        data = self.get(f'/api/v1/posts/{self.post.pk}/comments/',
+                        fields='author,text')
+        self.assertEqual(data['results'],
+                         [{'author': 'sparse_author', 'text': 'Комментарий'}])
+        data = self.get('/api/v1/groups/', omit='description')
+        self.assertEqual(data['results'], [{'title': 'Группа',
+                                            'slug': 'sparse'}])
+
+    def test_unknown_fields(self):
+        response = self.client.get('/api/v1/posts/',
+                                   {'fields': 'title,secret',
+                                    'expand': 'comments'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.json()), {'fields', 'expand'})
+        response = self.client.get('/api/v1/groups/', {'expand': 'tags'})
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,133 @@
+import os
+import tempfile
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from api.throttling import SlidingWindowUserRateThrottle
+from core.ratelimit.store import CacheCounterStore, SQLiteCounterStore
+from core.ratelimit.testing import IsolatedThrottleMixin
+from core.ratelimit.window import SlidingWindow
+
+User = get_user_model()
+
+
+class FakeTimer:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class TestSlidingWindow(TestCase):
+    """Тестирует скользящее окно на общем хранилище счётчиков."""
+
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp(suffix='.sqlite3')
+        os.close(handle)
+        self.timer = FakeTimer()
+
+    def tearDown(self):
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(self.path + suffix):
+                os.remove(self.path + suffix)
+
+    def test_limit_and_recovery(self):
+        """Лимит соблюдается, а с течением времени доступ возвращается."""
+        window = SlidingWindow(3, 60, SQLiteCounterStore(self.path),
+                               timer=self.timer)
+        for _ in range(3):
+            self.assertEqual(window.hit('client'), (True, 0))
+        allowed, wait = window.hit('client')
+        self.assertFalse(allowed)
+        self.assertGreater(wait, 0)
+        # через wait секунд оценка опустилась ниже лимита
+        self.timer.now += wait + 0.01
+        self.assertTrue(window.hit('client')[0])
+        # клиенты друг другу не мешают
+        self.assertTrue(window.hit('other')[0])
+
+    def test_previous_window_is_weighted(self):
+        """Запросы конца прошлого окна ещё считаются в начале нового."""
+        window = SlidingWindow(4, 60, SQLiteCounterStore(self.path),
+                               timer=self.timer)
+        self.timer.now = 60 * 100 + 50
+        for _ in range(4):
+            window.hit('client')
+        # начало следующего окна: 4 * (1 - 10/60) > 3, пятый не пройдёт
+        self.timer.now = 60 * 101 + 10
+        self.assertFalse(window.hit('client')[0])
+        # под конец окна вес прошлого почти ноль
+        self.timer.now = 60 * 101 + 55
+        self.assertTrue(window.hit('client')[0])
+
+    def test_store_is_shared_between_processes(self):
+        """Два независимых хранилища на одном файле видят общие счётчики
+        - так же, как разные воркеры gunicorn."""
+        first = SlidingWindow(2, 60, SQLiteCounterStore(self.path),
+                              timer=self.timer)
+        second = SlidingWindow(2, 60, SQLiteCounterStore(self.path),
+                               timer=self.timer)
+        self.assertTrue(first.hit('client')[0])
+        self.assertTrue(second.hit('client')[0])
+        self.assertFalse(first.hit('client')[0])
+        self.assertFalse(second.hit('client')[0])
+
+    def test_decr_does_not_revive_expired_counter(self):
+        """Отмена отказанного запроса не создаёт истёкший счётчик
+        заново и не уводит его в минус."""
+        for store in (SQLiteCounterStore(self.path), CacheCounterStore()):
+            with self.subTest(store=type(store).__name__):
+                store.clear()
+                self.assertEqual(store.decr('missing', 1), 0)
+                self.assertEqual(store.get_many(['missing']), [0])
+                store.incr('client', 1, 60)
+                self.assertEqual(store.decr('client', 5), 0)
+                self.assertEqual(store.incr('client', 1, 60), 1)
+        store = SQLiteCounterStore(self.path)
+        # счётчик, срок которого уже вышел
+        store.incr('expired', 3, -1)
+        self.assertEqual(store.decr('expired', 1), 0)
+        self.assertEqual(store.incr('expired', 1, 60), 1)
+
+    def test_cache_store(self):
+        """Хранилище на кэше Django ведёт себя так же."""
+        store = CacheCounterStore()
+        store.clear()
+        window = SlidingWindow(2, 60, store, timer=self.timer)
+        self.assertTrue(window.hit('client')[0])
+        self.assertTrue(window.hit('client')[0])
+        self.assertFalse(window.hit('client')[0])
+        self.assertEqual(store.get_many(['missing']), [0])
+
+
+class TestApiThrottling(IsolatedThrottleMixin, TestCase):
+    """Лимиты API по умолчанию работают через общее хранилище."""
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(
+            User.objects.create_user(username='throttled'))
+
+    def test_user_rate(self):
+        with mock.patch.object(SlidingWindowUserRateThrottle,
+                               'THROTTLE_RATES', {'user': '2/minute'}):
+            for _ in range(2):
+                self.assertEqual(
+                    self.client.get('/api/v1/groups/').status_code, 200)
+            response = self.client.get('/api/v1/groups/')
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+
+    @override_settings(THROTTLE_ENABLED=False)
+    def test_disabled(self):
+        """THROTTLE_ENABLED=False снимает лимиты (замеры benchmark)."""
+        with mock.patch.object(SlidingWindowUserRateThrottle,
+                               'THROTTLE_RATES', {'user': '1/minute'}):
+            for _ in range(3):
+                self.assertEqual(
+                    self.client.get('/api/v1/groups/').status_code, 200)
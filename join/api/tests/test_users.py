@@ -0,0 +1,30 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from core.ratelimit.testing import IsolatedThrottleMixin
+from posts.models import Follow, Post
+
+User = get_user_model()
+
+
+class TestUserCounters(IsolatedThrottleMixin, TestCase):
+    """Счётчики пользователя в auth/users/me/."""
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.user = User.objects.create_user(username='api_author')
+        reader = User.objects.create_user(username='api_reader')
+        Post.objects.create(title='Пост', text='Текст', author=self.user)
+        Follow.objects.create(user=reader, author=self.user)
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_me_has_counters(self):
+        response = self.client.get('/api/v1/auth/users/me/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['posts_count'], 1)
+        self.assertEqual(response.data['followers_count'], 1)
+        self.assertEqual(response.data['following_count'], 0)
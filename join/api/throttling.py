@@ -1,10 +1,61 @@
+from django.conf import settings
 from rest_framework import throttling
 import datetime as dt
 
+from core.ratelimit.window import SlidingWindow
+
 offset = dt.timedelta(hours=3)  # время смещения часового пояса
 tz = dt.timezone(offset, name='MSC')  # часовая зона Москвы
 
 
+class SlidingWindowThrottleMixin:
+    """Ограничение частоты по скользящему окну в общем хранилище.
+
+    Штатные троттлы DRF хранят в кэше полный список времён запросов
+    клиента и переписывают его на каждый запрос, а с LocMemCache ещё
+    и считают отдельно в каждом воркере. Здесь состояние клиента - два
+    счётчика в хранилище, общем для всех процессов (core/ratelimit).
+    Ключ клиента и лимит берутся из штатного класса DRF.
+    THROTTLE_ENABLED=False снимает все лимиты (замеры benchmark).
+    """
+
+    def allow_request(self, request, view):
+        if not settings.THROTTLE_ENABLED or self.rate is None:
+            return True
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+        window = SlidingWindow(self.num_requests, self.duration)
+        allowed, self.wait_seconds = window.hit(self.key)
+        return allowed
+
+    def wait(self):
+        return self.wait_seconds
+
+
+class SlidingWindowUserRateThrottle(SlidingWindowThrottleMixin,
+                                    throttling.UserRateThrottle):
+    """Лимит 'user' для авторизованных, по IP - для анонимов."""
+
+
+class SlidingWindowAnonRateThrottle(SlidingWindowThrottleMixin,
+                                    throttling.AnonRateThrottle):
+    """Лимит 'anon' для анонимных пользователей."""
+
+
+class SlidingWindowScopedRateThrottle(SlidingWindowThrottleMixin,
+                                      throttling.ScopedRateThrottle):
+    """Лимит по throttle_scope представления."""
+
+    def allow_request(self, request, view):
+        # как в ScopedRateThrottle: лимит известен только после того,
+        # как увидели представление
+        self.scope = getattr(view, self.scope_attr, None)
+        if not self.scope:
+            return True
+        self.rate = self.get_rate()
+        self.num_requests, self.duration = self.parse_rate(self.rate)
+        return super().allow_request(request, view)
 
 
 class LunchBreakThrottle(throttling.BaseThrottle):
@@ -1,9 +1,10 @@
-from django.urls import path, include
+from django.urls import path, re_path, include
 from rest_framework.authtoken import views
 
 from api.api_view import (APIPost, APIPostDetail,
                        APIGenericPostList, APIGenericPostDetail, FollowViewSet,
-                       PostViewSet, GroupViewSet, CommentViewSet)
+                       PostExportView, PostViewSet, GroupViewSet,
+                       CommentViewSet)
 from rest_framework.routers import DefaultRouter
 
 
@@ -32,5 +33,11 @@ urlpatterns = [
     path('auth/', include('djoser.urls')),
     # JWT-эндпоинты, для управления JWT-токенами:
     path('auth/', include('djoser.urls.jwt')),
+    # потоковая выгрузка постов: posts/export.ndjson, posts/export.csv
+    re_path(
+        r'^posts/export\.(?P<export_format>ndjson|csv)$',
+        PostExportView.as_view(),
+        name='posts_export'
+    ),
     path('', include(router.urls))
 ]
@@ -1,6 +1,13 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        from core.db.estimates import install_row_counters
+
+        # счётчики строк для приблизительного COUNT(*) на SQLite
+        post_migrate.connect(install_row_counters, sender=self)
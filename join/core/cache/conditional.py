@@ -0,0 +1,84 @@
+"""Условные GET-запросы: ETag и Last-Modified.
+
+Прежде чем рендерить шаблон или сериализатор, представление одним
+дешёвым запросом узнаёт версию ресурса (время изменения, счётчики)
+и строит из неё ETag и Last-Modified. Если клиент или nginx прислали
+совпадающий If-None-Match (или If-Modified-Since), ответ - 304 без тела.
+
+Работает так же, как django.views.decorators.http.condition, но ETag
+и Last-Modified считаются одной функцией и одним запросом к БД.
+"""
+import hashlib
+from calendar import timegm
+from functools import wraps
+
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+SAFE_METHODS = ('GET', 'HEAD')
+
+
+def make_etag(*parts):
+    """Части версии ресурса -> ETag в кавычках (md5 их строкового вида)."""
+    digest = hashlib.md5(
+        '|'.join(map(str, parts)).encode(), usedforsecurity=False)
+    return quote_etag(digest.hexdigest())
+
+
+def _timestamp(value):
+    return timegm(value.utctimetuple()) if value else None
+
+
+def set_validators(response, etag=None, last_modified=None):
+    """Проставляет ETag и Last-Modified, если их ещё нет в ответе."""
+    if etag and not response.has_header('ETag'):
+        response.headers['ETag'] = etag
+    if last_modified and not response.has_header('Last-Modified'):
+        response.headers['Last-Modified'] = http_date(
+            _timestamp(last_modified))
+    return response
+
+
+def not_modified(request, etag=None, last_modified=None):
+    """Ответ 304 (или 412 для If-Match), если у клиента актуальная
+    версия, иначе None - тогда представление отвечает как обычно."""
+    if request.method not in SAFE_METHODS:
+        return None
+    response = get_conditional_response(
+        request, etag=etag, last_modified=_timestamp(last_modified))
+    if response is not None:
+        set_validators(response, etag, last_modified)
+    return response
+
+
+def conditional_page(validators):
+    """Декоратор HTML-страницы с ответом 304.
+
+    validators(request, *args, **kwargs) возвращает пару
+    (etag, last_modified) или None, если ресурса нет - тогда страница
+    сама ответит 404. Страницы зависят от пользователя (шапка, кнопки),
+    поэтому ответ варьируется по Cookie, а пользователь должен входить
+    в ETag.
+
+    Пример:
+        @conditional_page(conditional.post_detail)
+        def post_detail(request, post_id): ...
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in SAFE_METHODS:
+                return view_func(request, *args, **kwargs)
+            found = validators(request, *args, **kwargs)
+            if found is None:
+                return view_func(request, *args, **kwargs)
+            etag, last_modified = found
+            response = not_modified(request, etag, last_modified)
+            if response is None:
+                response = view_func(request, *args, **kwargs)
+                if response.status_code == 200:
+                    set_validators(response, etag, last_modified)
+            patch_vary_headers(response, ('Cookie',))
+            return response
+        return wrapper
+    return decorator
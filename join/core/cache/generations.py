@@ -0,0 +1,76 @@
+"""Кэш страниц с инвалидацией по поколениям.
+
+У каждого пространства имён (например, 'posts') в общем кэше лежит
+счётчик-поколение. Оно входит в префикс ключей закэшированных страниц,
+поэтому, когда данные меняются, достаточно увеличить счётчик: старые
+страницы больше никто не прочитает, а вытеснит их сам кэш по TTL.
+Благодаря явной инвалидации TTL можно держать длинным.
+"""
+from functools import wraps
+
+from django.core.cache import cache
+from django.views.decorators.cache import cache_page
+
+
+def _generation_key(namespace):
+    return f'generation:{namespace}'
+
+
+def get_generation(namespace):
+    """Возвращает текущее поколение пространства имён."""
+    key = _generation_key(namespace)
+    generation = cache.get(key)
+    if generation is None:
+        # add() не перезапишет значение, если другой воркер успел раньше
+        cache.add(key, 1, timeout=None)
+        generation = cache.get(key, 1)
+    return generation
+
+
+def bump_generation(namespace):
+    """Сбрасывает все страницы пространства имён."""
+    key = _generation_key(namespace)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # счётчика ещё нет (или его вытеснили) - начинаем заново
+        cache.add(key, 1, timeout=None)
+        return cache.incr(key)
+
+
+def cache_page_generation(timeout, namespace):
+    """Как cache_page, но ключ страницы зависит от поколения namespace.
+
+    Кэшируются только страницы для гостей: у них одна общая копия
+    страницы, какие бы cookie (например, csrftoken после формы входа)
+    ни прислал браузер. Авторизованным пользователям страница
+    рендерится каждый раз: в ней их шапка и CSRF-токен формы выхода,
+    которые нельзя отдавать из общего кэша. cache_page для поколения
+    строится один раз, а не на каждый запрос.
+
+    Пример:
+        @cache_page_generation(60 * 15, namespace='posts')
+        def index(request): ...
+    """
+    def decorator(view_func):
+        # {поколение: view под cache_page}; хранится только текущее
+        cached_views = {}
+
+        def cached_view_for(generation):
+            cached_view = cached_views.get(generation)
+            if cached_view is None:
+                cached_view = cache_page(
+                    timeout, key_prefix=f'{namespace}.{generation}'
+                )(view_func)
+                cached_views.clear()
+                cached_views[generation] = cached_view
+            return cached_view
+
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if request.user.is_authenticated:
+                return view_func(request, *args, **kwargs)
+            cached_view = cached_view_for(get_generation(namespace))
+            return cached_view(request, *args, **kwargs)
+        return wrapper
+    return decorator
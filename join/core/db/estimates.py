@@ -0,0 +1,124 @@
+"""Приблизительное число строк вместо COUNT(*).
+
+На больших таблицах точный COUNT(*) PostgreSQL считает полным
+проходом по таблице или индексу - это самый медленный запрос
+страниц со счётчиком. Поэтому:
+- у нефильтрованной выборки число строк берётся из статистики таблицы:
+  pg_class.reltuples на PostgreSQL, таблица RowCount на SQLite
+  (её поддерживают триггеры, см. install_row_counters);
+- у отфильтрованной выборки строки считаются точно, но не больше
+  EXACT_COUNT_LIMIT; если их больше - берётся оценка планировщика
+  из EXPLAIN (на SQLite - сам предел).
+Маленькие таблицы (меньше EXACT_COUNT_LIMIT строк по статистике)
+всегда считаются точно.
+"""
+import json
+
+from django.apps import apps
+from django.conf import settings
+from django.db import connections
+
+# До скольких строк выборка считается точным COUNT(*)
+EXACT_COUNT_LIMIT = getattr(settings, 'EXACT_COUNT_LIMIT', 10_000)
+
+
+def _whole_table(queryset):
+    """Выборка без условий, DISTINCT и срезов: её число строк -
+    число строк таблицы."""
+    query = queryset.query
+    return (not query.where and not query.distinct and not query.combinator
+            and query.low_mark == 0 and query.high_mark is None)
+
+
+def table_estimate(model, using='default'):
+    """Число строк таблицы модели по статистике или None,
+    если статистики нет."""
+    connection = connections[using]
+    table = model._meta.db_table
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples FROM pg_class WHERE oid = to_regclass(%s)',
+                [connection.ops.quote_name(table)])
+            row = cursor.fetchone()
+        # -1 - таблицу ещё ни разу не анализировали
+        if row is None or row[0] is None or row[0] < 0:
+            return None
+        return int(row[0])
+    if connection.vendor == 'sqlite':
+        RowCount = apps.get_model('core', 'RowCount')
+        return (RowCount.objects.using(using).filter(table=table)
+                .values_list('rows', flat=True).first())
+    return None
+
+
+def planner_estimate(queryset):
+    """Оценка числа строк планировщиком PostgreSQL или None."""
+    if connections[queryset.db].vendor != 'postgresql':
+        return None
+    plan = json.loads(queryset.order_by().explain(format='json'))
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+def estimate_count(queryset):
+    """Примерное число строк queryset: статистика таблицы, оценка
+    планировщика или, если их нет, точный COUNT(*)."""
+    estimate = None
+    if _whole_table(queryset):
+        estimate = table_estimate(queryset.model, queryset.db)
+    if estimate is None:
+        estimate = planner_estimate(queryset)
+    return queryset.count() if estimate is None else estimate
+
+
+def approximate_count(queryset, limit=None):
+    """Число строк queryset и признак точности: (число, точно ли).
+
+    Точный COUNT(*) выполняется, только если строк не больше limit
+    (по умолчанию EXACT_COUNT_LIMIT).
+    """
+    limit = EXACT_COUNT_LIMIT if limit is None else limit
+    if _whole_table(queryset):
+        estimate = table_estimate(queryset.model, queryset.db)
+        if estimate is not None and estimate > limit:
+            return estimate, False
+        return queryset.count(), True
+    # COUNT(*) по подзапросу с LIMIT: не дальше limit + 1 строк
+    count = queryset.order_by()[:limit + 1].count()
+    if count <= limit:
+        return count, True
+    return max(planner_estimate(queryset) or 0, limit), False
+
+
+def install_row_counters(using='default', **kwargs):
+    """Создаёт на SQLite триггеры, которые ведут RowCount для моделей
+    из ROW_COUNT_MODELS, и пересчитывает их строки.
+
+    Вызывается после каждого migrate (сигнал post_migrate): SQLite
+    меняет столбцы, пересоздавая таблицу, и её триггеры при этом
+    пропадают.
+    """
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return
+    RowCount = apps.get_model('core', 'RowCount')
+    counter = connection.ops.quote_name(RowCount._meta.db_table)
+    existing = set(connection.introspection.table_names())
+    if RowCount._meta.db_table not in existing:
+        return
+    with connection.cursor() as cursor:
+        for label in getattr(settings, 'ROW_COUNT_MODELS', ()):
+            table = apps.get_model(label)._meta.db_table
+            if table not in existing:
+                continue
+            quoted = connection.ops.quote_name(table)
+            for event, delta in (('INSERT', '+ 1'), ('DELETE', '- 1')):
+                cursor.execute(
+                    f'CREATE TRIGGER IF NOT EXISTS '
+                    f'"core_rowcount_{table}_{event.lower()}" '
+                    f'AFTER {event} ON {quoted} BEGIN '
+                    f'UPDATE {counter} SET "rows" = "rows" {delta} '
+                    f"WHERE \"table\" = '{table}'; END")
+            cursor.execute(
+                f'INSERT OR REPLACE INTO {counter} ("table", "rows") '
+                f'SELECT %s, COUNT(*) FROM {quoted}', [table])
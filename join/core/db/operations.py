@@ -0,0 +1,32 @@
+from django.db.migrations.operations import AddIndex
+
+
+class AddIndexConcurrently(AddIndex):
+    """Создаёт индекс, не блокируя запись в таблицу.
+
+    На PostgreSQL выполняет CREATE INDEX CONCURRENTLY: таблица постов
+    остаётся доступной на запись всё время, пока строится индекс. На
+    остальных БД (SQLite при локальном запуске) это обычный AddIndex.
+    CONCURRENTLY нельзя выполнять внутри транзакции, поэтому миграция
+    с этой операцией должна объявлять atomic = False.
+    """
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor != 'postgresql':
+            return super().database_forwards(
+                app_label, schema_editor, from_state, to_state)
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            schema_editor.add_index(model, self.index, concurrently=True)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor != 'postgresql':
+            return super().database_backwards(
+                app_label, schema_editor, from_state, to_state)
+        model = from_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            schema_editor.remove_index(model, self.index, concurrently=True)
+
+    def describe(self):
+        return 'Concurrently ' + super().describe()
+
@@ -1,7 +1,18 @@
 from functools import wraps
 from django.shortcuts import redirect
+import logging
 import time
 
+from core.metrics.registry import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+FUNCTION_DURATION = REGISTRY.histogram(
+    'join_function_duration_seconds',
+    'Время выполнения функций, помеченных @time_check',
+    ('function',)
+)
+
 
 def authorized_only(func):
     """Декоратор проверки авторизации пользователя.
@@ -25,12 +36,34 @@ def authorized_only(func):
 
 
 def time_check(func):
-    """Декоратор для замера времени выполнения функции."""
+    """Декоратор для замера времени выполнения функции.
+
+    Время пишется в лог и в гистограмму join_function_duration_seconds
+    с меткой function - её видно на странице /metrics.
+    """
+    name = f'{func.__module__}.{func.__qualname__}'
+
     @wraps(func)
     def wrapper(*args, **kwargs):
-        start_time = time.time()
-        result = func(*args, **kwargs)  # результат работы ф-ии сохраним в переменной
-        execution_time = round((time.time() - start_time()), 1)
-        print(f'Время выполнения программы: {execution_time} с.')
-        return result
+        start_time = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            execution_time = time.perf_counter() - start_time
+            FUNCTION_DURATION.observe((name,), execution_time)
+            logger.debug('Время выполнения %s: %.3f с.', name, execution_time)
     return wrapper
+
+
+def query_budget(budget):
+    """Заявляет, сколько запросов к БД может сделать представление.
+
+    Бюджет проверяет core.nplusone.middleware.NPlusOneMiddleware:
+    в разработке пишет превышение в лог, в тестах (QueryBudgetMixin)
+    валит тест. Для классов представлений то же задаётся атрибутом
+    класса query_budget.
+    """
+    def decorator(func):
+        func.query_budget = budget
+        return func
+    return decorator
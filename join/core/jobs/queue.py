@@ -0,0 +1,141 @@
+"""Фоновая очередь задач на пуле процессов.
+
+Тяжёлая по CPU работа (например, декодирование и масштабирование
+картинок в Pillow) не должна выполняться в воркере gunicorn, который
+отвечает на запрос. enqueue() отдаёт задачу в ProcessPoolExecutor и
+сразу возвращается.
+
+Процессы пула запускаются методом spawn: форк воркера с открытыми
+соединениями к БД и потоками небезопасен. Каждый процесс пула сам
+настраивает Django (django.setup()) и открывает свои соединения.
+
+JOB_QUEUE_WORKERS - размер пула. При 0 задачи выполняются сразу в
+вызывающем процессе (удобно для тестов и management-команд).
+
+Пул не должен жить в каждом воркере gunicorn: это JOB_QUEUE_WORKERS
+процессов с django.setup() на воркер, а задачи в памяти пула теряются
+при каждом перезапуске воркера. Поэтому с JOB_QUEUE_EXTERNAL веб-процессы
+задач не ставят (enqueue_on_commit ничего не делает): работа отмечена
+в БД самой записью (например, Post.thumbnails_pending), а один процесс
+на хост - manage.py run_jobs - опрашивает отметки функциями из
+register_recovery() и выполняет задачи на своём пуле. Так же после
+перезапуска подбирается работа, потерянная вместе с пулом.
+"""
+import atexit
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+
+from django.conf import settings
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_lock = threading.Lock()
+_recovery = []
+
+
+def _init_worker():
+    """Готовит процесс пула: настраивает Django."""
+    import django
+    django.setup()
+
+
+def _run(func, args, kwargs):
+    """Выполняет задачу в процессе пула.
+
+    Соединения с БД закрываются до и после задачи, как это делает
+    Django на границах запроса, чтобы долгоживущий процесс не держал
+    оборванные соединения.
+    """
+    from django.db import close_old_connections, connections
+    close_old_connections()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        connections.close_all()
+
+
+def get_executor():
+    """Возвращает пул процессов, создавая его при первом обращении."""
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=settings.JOB_QUEUE_WORKERS,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+            )
+        return _executor
+
+
+def shutdown(wait=True):
+    """Останавливает пул (при выходе из процесса вызывается сам)."""
+    global _executor
+    with _lock:
+        if _executor is not None:
+            _executor.shutdown(wait=wait)
+            _executor = None
+
+
+atexit.register(shutdown)
+
+
+def _log_failure(future):
+    exc = future.exception()
+    if exc is not None:
+        logger.error('Фоновая задача завершилась ошибкой',
+                     exc_info=(type(exc), exc, exc.__traceback__))
+
+
+def enqueue(func, *args, **kwargs):
+    """Ставит задачу func(*args, **kwargs) в очередь и возвращает Future.
+
+    func должна быть функцией уровня модуля, а аргументы - простыми
+    значениями (id, имена файлов): они передаются в другой процесс
+    через pickle. Модели передавать не нужно - задача сама прочитает
+    из БД свежую версию.
+    """
+    if not settings.JOB_QUEUE_WORKERS:
+        future = Future()
+        try:
+            future.set_result(func(*args, **kwargs))
+        except Exception as exc:
+            future.set_exception(exc)
+        _log_failure(future)
+        return future
+    future = get_executor().submit(_run, func, args, kwargs)
+    future.add_done_callback(_log_failure)
+    return future
+
+
+def enqueue_on_commit(func, *args, **kwargs):
+    """Ставит задачу после коммита текущей транзакции, чтобы процесс
+    пула точно увидел записанные данные.
+
+    С JOB_QUEUE_EXTERNAL ничего не делает: задачу выполнит run_jobs,
+    найдя отметку в БД, поэтому работа, поставленная так, обязательно
+    должна быть отмечена и иметь функцию в register_recovery().
+    """
+    if settings.JOB_QUEUE_EXTERNAL:
+        return
+    transaction.on_commit(lambda: enqueue(func, *args, **kwargs))
+
+
+def register_recovery(func):
+    """Регистрирует функцию, которая находит в БД отмеченную,
+    но не сделанную работу, ставит её задачи через enqueue()
+    и возвращает их Future."""
+    if func not in _recovery:
+        _recovery.append(func)
+    return func
+
+
+def recover():
+    """Ставит в очередь всю отмеченную в БД работу, возвращает Future."""
+    futures = []
+    for func in _recovery:
+        futures.extend(func())
+    return futures
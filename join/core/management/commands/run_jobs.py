@@ -0,0 +1,43 @@
+import time
+from concurrent.futures import wait
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.jobs import queue
+
+
+class Command(BaseCommand):
+    """Выполняет фоновые задачи на пуле процессов - один процесс на хост.
+
+    Веб-процессы с JOB_QUEUE_EXTERNAL только отмечают работу в БД,
+    а эта команда раз в JOB_QUEUE_POLL_INTERVAL секунд собирает отметки
+    (queue.recover()) и выполняет задачи на пуле из JOB_QUEUE_WORKERS
+    процессов. Задачи, не доделанные к перезапуску, остаются отмеченными
+    и подбираются снова.
+
+    Пример:
+        python manage.py run_jobs
+    """
+    help = 'Выполняет фоновые задачи, отмеченные в БД'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Выполнить найденные задачи и выйти')
+
+    def handle(self, *args, **options):
+        while True:
+            futures = queue.recover()
+            wait(futures)
+            failed = sum(future.exception() is not None
+                         for future in futures)
+            if futures:
+                self.stdout.write(
+                    f'Выполнено задач: {len(futures)}, с ошибкой: {failed}')
+            if options['once']:
+                return
+            # без пауз - пока есть работа; ошибки (задача останется
+            # отмеченной) повторяем не чаще раза за интервал
+            if not futures or failed:
+                time.sleep(settings.JOB_QUEUE_POLL_INTERVAL)
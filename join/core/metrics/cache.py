@@ -0,0 +1,51 @@
+"""Кэш-бэкенды, которые считают попадания и промахи.
+
+Те же бэкенды Django, что и раньше (Redis или файловый), с подмешанным
+CacheMetricsMixin: результат каждого get()/get_many() учитывается
+в счётчиках текущего запроса (core/metrics/middleware.py).
+"""
+from django.core.cache.backends import filebased, locmem, redis
+
+from .middleware import current_request
+
+_MISSING = object()
+
+
+class CacheMetricsMixin:
+
+    def get(self, key, default=None, version=None):
+        value = super().get(key, _MISSING, version)
+        stats = current_request.get()
+        if stats is not None:
+            if value is _MISSING:
+                stats.cache_misses += 1
+            else:
+                stats.cache_hits += 1
+        return default if value is _MISSING else value
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        stats = current_request.get()
+        # часть бэкендов реализует get_many() через get() -
+        # вложенные вызовы не считаем второй раз
+        token = current_request.set(None)
+        try:
+            values = super().get_many(keys, version)
+        finally:
+            current_request.reset(token)
+        if stats is not None:
+            stats.cache_hits += len(values)
+            stats.cache_misses += len(keys) - len(values)
+        return values
+
+
+class RedisCache(CacheMetricsMixin, redis.RedisCache):
+    pass
+
+
+class FileBasedCache(CacheMetricsMixin, filebased.FileBasedCache):
+    pass
+
+
+class LocMemCache(CacheMetricsMixin, locmem.LocMemCache):
+    pass
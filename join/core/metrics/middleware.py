@@ -0,0 +1,103 @@
+"""Замеры каждого запроса: время, SQL, кэш и размер ответа.
+
+MetricsMiddleware стоит первой в MIDDLEWARE, чтобы в замер попадало
+всё: сессии, аутентификация, представление и шаблон. Запросы к БД
+считаются через connection.execute_wrapper (работает и с DEBUG=False),
+обращения к кэшу - через кэш-бэкенды из core/metrics/cache.py.
+"""
+import contextvars
+import time
+from contextlib import ExitStack
+
+from django.db import connections
+
+from .registry import COUNT_BUCKETS, REGISTRY, SIZE_BUCKETS
+
+# Счётчики текущего запроса; None вне запроса
+current_request = contextvars.ContextVar('metrics_request', default=None)
+
+LABELS = ('view', 'method')
+
+REQUESTS = REGISTRY.counter(
+    'join_http_requests_total', 'Число запросов', ('view', 'method', 'status'))
+DURATION = REGISTRY.histogram(
+    'join_http_request_duration_seconds', 'Время обработки запроса', LABELS)
+SQL_QUERIES = REGISTRY.histogram(
+    'join_http_request_sql_queries', 'Запросов к БД на один запрос', LABELS,
+    buckets=COUNT_BUCKETS)
+SQL_DURATION = REGISTRY.histogram(
+    'join_http_request_sql_duration_seconds',
+    'Суммарное время запросов к БД на один запрос', LABELS)
+RESPONSE_SIZE = REGISTRY.histogram(
+    'join_http_response_size_bytes', 'Размер тела ответа', LABELS,
+    buckets=SIZE_BUCKETS)
+CACHE_HITS = REGISTRY.counter(
+    'join_cache_hits_total', 'Попадания в кэш', LABELS)
+CACHE_MISSES = REGISTRY.counter(
+    'join_cache_misses_total', 'Промахи кэша', LABELS)
+
+
+class RequestStats:
+    """Счётчики одного запроса."""
+
+    __slots__ = ('sql_queries', 'sql_duration', 'cache_hits', 'cache_misses')
+
+    def __init__(self):
+        self.sql_queries = 0
+        self.sql_duration = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+
+def _sql_wrapper(execute, sql, params, many, context):
+    stats = current_request.get()
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        if stats is not None:
+            stats.sql_queries += 1
+            stats.sql_duration += time.perf_counter() - start
+
+
+def view_label(request):
+    """Имя представления для меток: posts:index, api:post-list и т. п."""
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return '<unresolved>'
+    # у вида без имени - шаблон адреса: меток столько же, сколько адресов
+    return match.view_name or match.route
+
+
+class MetricsMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        stats = RequestStats()
+        token = current_request.set(stats)
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(_sql_wrapper))
+                response = self.get_response(request)
+        finally:
+            current_request.reset(token)
+        duration = time.perf_counter() - start
+
+        labels = (view_label(request), request.method)
+        REQUESTS.inc((*labels, str(response.status_code)))
+        DURATION.observe(labels, duration)
+        SQL_QUERIES.observe(labels, stats.sql_queries)
+        SQL_DURATION.observe(labels, stats.sql_duration)
+        if stats.cache_hits:
+            CACHE_HITS.inc(labels, stats.cache_hits)
+        if stats.cache_misses:
+            CACHE_MISSES.inc(labels, stats.cache_misses)
+        # у потокового ответа размер заранее неизвестен
+        if not response.streaming:
+            RESPONSE_SIZE.observe(labels, len(response.content))
+        REGISTRY.flush()
+        return response
@@ -0,0 +1,348 @@
+"""Метрики процесса: счётчики и гистограммы в формате Prometheus.
+
+Каждый воркер gunicorn копит метрики в своей памяти (REGISTRY). Чтобы
+при опросе любого воркера получать сумму по всем, воркеры раз
+в METRICS_FLUSH_INTERVAL секунд сбрасывают снимок своих метрик
+в METRICS_DIR (файл <pid>.json), а страница метрик складывает снимки
+всех процессов (см. collect()). Без METRICS_DIR отдаются метрики
+только текущего процесса.
+
+Счётчики и гистограммы не должны уменьшаться: иначе Prometheus увидит
+сброс счётчика и rate() даст всплеск. Поэтому снимок завершившегося
+воркера не просто удаляется, а сначала складывается в архив
+(archive.json), который collect() читает наравне со снимками живых
+процессов. Это делает мастер gunicorn, когда воркер выходит
+(gunicorn.conf.py: mark_process_dead), а collect() - для файлов
+процессов, которых уже нет, на случай запуска без этого хука.
+Архив и все снимки удаляются только при старте мастера
+(clear_snapshots): новый запуск начинает счётчики с нуля.
+"""
+import contextlib
+import fcntl
+import json
+import os
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+
+# Границы корзин гистограмм
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5,
+                    5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+SIZE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+class Counter:
+    """Монотонный счётчик с метками."""
+
+    type = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels=(), amount=1):
+        labels = tuple(labels)
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self):
+        """Снимок значений: [[метки, значение], ...]."""
+        with self._lock:
+            return [[list(labels), value]
+                    for labels, value in self._values.items()]
+
+
+class Histogram:
+    """Гистограмма с фиксированными корзинами и метками.
+
+    Для каждого набора меток хранится число наблюдений в каждой корзине
+    (не накопительно), сумма и количество - наблюдение стоит O(корзин).
+    """
+
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(),
+                 buckets=DURATION_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        labels = tuple(labels)
+        # последняя корзина - +Inf
+        index = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                index = i
+                break
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                state = self._values[labels] = {
+                    'buckets': [0] * (len(self.buckets) + 1),
+                    'sum': 0.0,
+                    'count': 0,
+                }
+            state['buckets'][index] += 1
+            state['sum'] += value
+            state['count'] += 1
+
+    def samples(self):
+        """Снимок значений: [[метки, {buckets, sum, count}], ...]."""
+        with self._lock:
+            return [[list(labels), {**state, 'buckets': list(state['buckets'])}]
+                    for labels, state in self._values.items()]
+
+
+class Registry:
+    """Набор метрик процесса."""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+        self._last_flush = 0.0
+
+    def register(self, metric):
+        """Регистрирует метрику; повторная регистрация возвращает первую."""
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(),
+                  buckets=DURATION_BUCKETS):
+        return self.register(
+            Histogram(name, documentation, labelnames, buckets))
+
+    def snapshot(self):
+        """Состояние всех метрик в виде, пригодном для JSON."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        snapshot = {}
+        for metric in metrics:
+            entry = {
+                'type': metric.type,
+                'help': metric.documentation,
+                'labelnames': list(metric.labelnames),
+                'samples': metric.samples(),
+            }
+            if metric.type == 'histogram':
+                entry['buckets'] = list(metric.buckets)
+            snapshot[metric.name] = entry
+        return snapshot
+
+    def flush(self, force=False):
+        """Сбрасывает снимок метрик процесса в METRICS_DIR.
+
+        Без force не чаще раза в METRICS_FLUSH_INTERVAL секунд; запись
+        атомарная (временный файл и rename), чтобы страница метрик
+        не прочитала половину файла.
+        """
+        directory = getattr(settings, 'METRICS_DIR', None)
+        if not directory:
+            return
+        now = time.monotonic()
+        if not force and now - self._last_flush < settings.METRICS_FLUSH_INTERVAL:
+            return
+        self._last_flush = now
+        os.makedirs(directory, exist_ok=True)
+        _write(_snapshot_path(directory, os.getpid()), self.snapshot())
+
+
+REGISTRY = Registry()
+
+
+def merge(snapshots):
+    """Складывает снимки метрик нескольких процессов."""
+    merged = {}
+    for snapshot in snapshots:
+        for name, entry in snapshot.items():
+            target = merged.setdefault(name, {**entry, 'samples': {}})
+            for labels, value in entry['samples']:
+                key = tuple(labels)
+                current = target['samples'].get(key)
+                if current is None:
+                    target['samples'][key] = value
+                elif entry['type'] == 'histogram':
+                    target['samples'][key] = {
+                        'buckets': [a + b for a, b in zip(current['buckets'],
+                                                          value['buckets'])],
+                        'sum': current['sum'] + value['sum'],
+                        'count': current['count'] + value['count'],
+                    }
+                else:
+                    target['samples'][key] = current + value
+    for entry in merged.values():
+        entry['samples'] = [[list(key), value]
+                            for key, value in entry['samples'].items()]
+    return merged
+
+
+ARCHIVE_NAME = 'archive.json'
+LOCK_NAME = 'metrics.lock'
+
+
+def _snapshot_path(directory, pid):
+    return os.path.join(directory, f'{pid}.json')
+
+
+def _read(path):
+    """Снимок из файла или None, если файла нет или он испорчен."""
+    try:
+        with open(path) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+
+def _write(path, snapshot):
+    """Атомарная запись: временный файл и rename, чтобы читатель
+    не увидел половину файла."""
+    handle, temp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    with os.fdopen(handle, 'w') as file:
+        json.dump(snapshot, file)
+    os.replace(temp, path)
+
+
+@contextlib.contextmanager
+def _locked(directory):
+    """Блокировка каталога: перенос снимка в архив и чтение всех
+    снимков не должны пересекаться, иначе метрики умершего процесса
+    посчитаются дважды или не посчитаются вовсе."""
+    with open(os.path.join(directory, LOCK_NAME), 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def _archive(directory, pid):
+    """Складывает снимок процесса в архив и удаляет его файл
+    (под блокировкой каталога)."""
+    path = _snapshot_path(directory, pid)
+    snapshot = _read(path)
+    if snapshot is not None:
+        archive_path = os.path.join(directory, ARCHIVE_NAME)
+        _write(archive_path, merge([_read(archive_path) or {}, snapshot]))
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        # процесс есть, но чужой (PermissionError)
+        return True
+    return True
+
+
+def mark_process_dead(pid, directory=None):
+    """Переносит снимок завершившегося процесса в архив."""
+    directory = directory or getattr(settings, 'METRICS_DIR', None)
+    if not directory or not os.path.isdir(directory):
+        return
+    with _locked(directory):
+        _archive(directory, pid)
+
+
+def clear_snapshots(directory=None):
+    """Удаляет снимки всех процессов и архив - при старте сервера,
+    чтобы не складывать метрики прошлых запусков."""
+    directory = directory or getattr(settings, 'METRICS_DIR', None)
+    if not directory or not os.path.isdir(directory):
+        return
+    for name in os.listdir(directory):
+        if name.endswith(('.json', '.tmp')):
+            try:
+                os.remove(os.path.join(directory, name))
+            except FileNotFoundError:
+                pass
+
+
+def collect():
+    """Метрики всех процессов (или только текущего без METRICS_DIR)."""
+    directory = getattr(settings, 'METRICS_DIR', None)
+    if not directory:
+        return REGISTRY.snapshot()
+    REGISTRY.flush(force=True)
+    snapshots = []
+    with _locked(directory):
+        for name in os.listdir(directory):
+            pid = name[:-len('.json')]
+            if not name.endswith('.json') or not pid.isdigit():
+                continue
+            if not _pid_alive(int(pid)):
+                # процесс умер, а мастер не успел перенести его снимок
+                _archive(directory, pid)
+                continue
+            snapshot = _read(os.path.join(directory, name))
+            # файл успели удалить - пропускаем
+            if snapshot is not None:
+                snapshots.append(snapshot)
+        # архив читается после переноса, чтобы попали и только что умершие
+        archive = _read(os.path.join(directory, ARCHIVE_NAME))
+    if archive is not None:
+        snapshots.append(archive)
+    return merge(snapshots)
+
+
+def _escape(value):
+    return (str(value).replace('\\', r'\\').replace('\n', r'\n')
+            .replace('"', r'\"'))
+
+
+def _labels(names, values, extra=()):
+    pairs = [*zip(names, values), *extra]
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"'
+                          for name, value in pairs) + '}'
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return repr(value)
+    return str(value)
+
+
+def render(snapshot):
+    """Текстовый формат Prometheus (text/plain; version=0.0.4)."""
+    lines = []
+    for name in sorted(snapshot):
+        entry = snapshot[name]
+        names = entry['labelnames']
+        lines.append(f'# HELP {name} {_escape(entry["help"])}')
+        lines.append(f'# TYPE {name} {entry["type"]}')
+        for labels, value in sorted(entry['samples'], key=lambda s: s[0]):
+            if entry['type'] != 'histogram':
+                lines.append(f'{name}{_labels(names, labels)} {_number(value)}')
+                continue
+            cumulative = 0
+            bounds = [*entry['buckets'], float('inf')]
+            for bound, count in zip(bounds, value['buckets']):
+                cumulative += count
+                le = _labels(names, labels, [('le', _number(float(bound)))])
+                lines.append(f'{name}_bucket{le} {cumulative}')
+            lines.append(
+                f'{name}_sum{_labels(names, labels)} {_number(value["sum"])}')
+            lines.append(
+                f'{name}_count{_labels(names, labels)} {value["count"]}')
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,26 @@
+# Generated by Django 5.0.2 on 2026-10-18 16:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RowCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('table', models.CharField(max_length=100, unique=True, verbose_name='Таблица')),
+                ('rows', models.BigIntegerField(default=0, verbose_name='Строк')),
+            ],
+            options={
+                'verbose_name': 'Число строк таблицы',
+                'verbose_name_plural': 'Число строк таблиц',
+            },
+        ),
+    ]
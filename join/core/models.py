@@ -0,0 +1,19 @@
+from django.db import models
+
+
+class RowCount(models.Model):
+    """Число строк большой таблицы для приблизительных счётчиков.
+
+    Нужна только на SQLite, где нет статистики планировщика: строку
+    поддерживают триггеры на вставку и удаление (core/db/estimates.py).
+    На PostgreSQL число строк берётся из pg_class.reltuples.
+    """
+    table = models.CharField('Таблица', max_length=100, unique=True)
+    rows = models.BigIntegerField('Строк', default=0)
+
+    class Meta:
+        verbose_name = 'Число строк таблицы'
+        verbose_name_plural = 'Число строк таблиц'
+
+    def __str__(self):
+        return f'{self.table}: {self.rows}'
@@ -0,0 +1,158 @@
+"""Поиск N+1 запросов.
+
+QueryRecorder перехватывает все запросы к БД (connection.execute_wrapper)
+и группирует их по «отпечатку» - тексту SQL без конкретных значений.
+Если запрос одной формы повторился NPLUSONE_THRESHOLD раз и больше,
+это почти всегда обращение к связанному объекту в цикле: шаблон
+берёт post.author.username у каждого поста, сериализатор - тэги каждого
+поста. Для таких запросов запоминается, откуда они пришли: строка
+шаблона, поле сериализатора и строки кода проекта.
+"""
+import os
+import re
+import sys
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+_STRING_RE = re.compile(r"'(?:''|[^'])*'")
+_NUMBER_RE = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER_RE = re.compile(r'%s|\?')
+_IN_LIST_RE = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+_SPACE_RE = re.compile(r'\s+')
+# кадры самого детектора и замеров (core/metrics) в происхождение
+# запроса не попадают
+_CORE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_SKIP_DIRS = tuple(os.path.join(_CORE_DIR, name) + os.sep
+                   for name in ('nplusone', 'metrics'))
+
+# Сколько строк происхождения запроса показывать
+STACK_LIMIT = 8
+
+
+def fingerprint(sql):
+    """Форма запроса: значения заменены на ?, списки IN (...) схлопнуты.
+
+    SELECT ... WHERE id = 1 и SELECT ... WHERE id = 2 дают один отпечаток.
+    """
+    sql = _STRING_RE.sub('?', sql)
+    sql = _NUMBER_RE.sub('?', sql)
+    sql = _PLACEHOLDER_RE.sub('?', sql)
+    sql = _IN_LIST_RE.sub('(...)', sql)
+    return _SPACE_RE.sub(' ', sql).strip()
+
+
+def _describe_frame(frame):
+    """Строка происхождения запроса для кадра стека или None."""
+    code = frame.f_code
+    node = frame.f_locals.get('self')
+    # узел шаблона Django: имя шаблона, строка и сам тег/переменная
+    if code.co_name == 'render_annotated' and hasattr(node, 'token'):
+        origin = getattr(node, 'origin', None)
+        name = getattr(origin, 'template_name', None) or getattr(
+            origin, 'name', '?')
+        contents = node.token.contents
+        tag = (f'{{{{ {contents} }}}}' if type(node).__name__ == 'VariableNode'
+               else f'{{% {contents} %}}')
+        return f'шаблон {name}, строка {node.token.lineno}: {tag}'
+    # сериализатор DRF: класс и поле
+    if code.co_name == 'to_representation' and 'rest_framework' in (
+            type(node).__module__ if node is not None else ''):
+        field = getattr(node, 'field_name', None) or ''
+        parent = getattr(node, 'parent', None)
+        owner = type(parent).__name__ if parent is not None else ''
+        return (f'сериализатор {owner}.{field} ({type(node).__name__})'
+                if owner else f'сериализатор {type(node).__name__}')
+    filename = code.co_filename
+    if (filename.startswith(str(settings.BASE_DIR))
+            and 'site-packages' not in filename
+            and not filename.startswith(_SKIP_DIRS)):
+        return f'{filename}:{frame.f_lineno} в {code.co_name}'
+    return None
+
+
+def trigger_stack(limit=STACK_LIMIT):
+    """Откуда пришёл запрос: от ближайшего кадра к дальнему."""
+    lines = []
+    frame = sys._getframe(1)
+    while frame is not None and len(lines) < limit:
+        line = _describe_frame(frame)
+        if line and line not in lines:
+            lines.append(line)
+        frame = frame.f_back
+    return lines
+
+
+class QueryShape:
+    """Запросы одной формы за время записи."""
+
+    __slots__ = ('fingerprint', 'sql', 'count', 'duration', 'stack')
+
+    def __init__(self, fingerprint, sql):
+        self.fingerprint = fingerprint
+        self.sql = sql
+        self.count = 0
+        self.duration = 0.0
+        self.stack = []
+
+
+class QueryRecorder:
+    """Контекстный менеджер, который записывает запросы ко всем БД.
+
+    Стек вызова снимается один раз на форму - при первом повторе,
+    поэтому запись почти ничего не стоит, пока повторов нет.
+    """
+
+    def __init__(self, threshold=None):
+        if threshold is None:
+            threshold = settings.NPLUSONE_THRESHOLD
+        self.threshold = threshold
+        self.shapes = {}
+        self.total = 0
+        self._stack = None
+
+    def __enter__(self):
+        self._stack = ExitStack()
+        for connection in connections.all():
+            self._stack.enter_context(connection.execute_wrapper(self))
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stack.close()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            key = fingerprint(sql)
+            shape = self.shapes.get(key)
+            if shape is None:
+                shape = self.shapes[key] = QueryShape(key, sql)
+            shape.count += 1
+            shape.duration += time.perf_counter() - start
+            self.total += 1
+            if shape.count == 2:
+                shape.stack = trigger_stack()
+
+    def repeated(self):
+        """Формы запросов, повторившиеся threshold раз и больше."""
+        return sorted(
+            (shape for shape in self.shapes.values()
+             if shape.count >= self.threshold),
+            key=lambda shape: shape.count, reverse=True)
+
+    def report(self, budget=None):
+        """Текст отчёта о повторах и превышении бюджета (или '')."""
+        lines = []
+        if budget is not None and self.total > budget:
+            lines.append(
+                f'Запросов к БД: {self.total}, а бюджет - {budget}.')
+        for shape in self.repeated():
+            lines.append(
+                f'{shape.count} запросов одной формы '
+                f'({shape.duration * 1000:.1f} мс): {shape.sql[:300]}')
+            lines.extend(f'    {line}' for line in shape.stack)
+        return '\n'.join(lines)
@@ -0,0 +1,54 @@
+import logging
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from .detector import QueryRecorder
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetExceeded(Exception):
+    """Представление сделало больше запросов, чем заявлено,
+    или повторяет запросы одной формы (N+1)."""
+
+
+def view_budget(view_func):
+    """Бюджет запросов, заявленный @query_budget или атрибутом класса."""
+    budget = getattr(view_func, 'query_budget', None)
+    if budget is None:
+        view_class = (getattr(view_func, 'view_class', None)
+                      or getattr(view_func, 'cls', None))
+        budget = getattr(view_class, 'query_budget', None)
+    return budget
+
+
+class NPlusOneMiddleware:
+    """Ищет N+1 запросы в каждом запросе (включается NPLUSONE_ENABLED).
+
+    Повторы запросов одной формы и превышение бюджета представления
+    пишутся в лог 'core.nplusone.middleware'. С NPLUSONE_RAISE = True
+    вместо этого поднимается QueryBudgetExceeded - так тесты падают
+    на первом же N+1.
+    """
+
+    def __init__(self, get_response):
+        if not settings.NPLUSONE_ENABLED:
+            # выключенный детектор не стоит ничего
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with QueryRecorder() as recorder:
+            response = self.get_response(request)
+        budget = getattr(request, '_query_budget', None)
+        report = recorder.report(budget)
+        if report:
+            message = f'{request.method} {request.path}:\n{report}'
+            if settings.NPLUSONE_RAISE:
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._query_budget = view_budget(view_func)
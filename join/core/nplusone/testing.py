@@ -0,0 +1,43 @@
+from django.test import override_settings
+
+from .detector import QueryRecorder
+
+
+class QueryBudgetMixin:
+    """Примесь к TestCase: N+1 и превышение бюджета валят тест.
+
+    Детектор включается для всех запросов тестового клиента, а
+    assertQueryBudget() проверяет любой кусок кода:
+
+        with self.assertQueryBudget(3):
+            list(PostSerializer(posts, many=True).data)
+    """
+
+    def setUp(self):
+        override = override_settings(NPLUSONE_ENABLED=True,
+                                     NPLUSONE_RAISE=True)
+        override.enable()
+        self.addCleanup(override.disable)
+        super().setUp()
+
+    def assertQueryBudget(self, budget=None, threshold=None):
+        return _BudgetContext(self, budget, threshold)
+
+
+class _BudgetContext:
+    def __init__(self, test_case, budget, threshold):
+        self.test_case = test_case
+        self.budget = budget
+        self.recorder = QueryRecorder(threshold)
+
+    def __enter__(self):
+        self.recorder.__enter__()
+        return self.recorder
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.recorder.__exit__(exc_type, exc_value, traceback)
+        if exc_type is not None:
+            return
+        report = self.recorder.report(self.budget)
+        if report:
+            self.test_case.fail(report)
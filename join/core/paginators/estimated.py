@@ -0,0 +1,40 @@
+from django.core.paginator import Page, Paginator
+from django.utils.functional import cached_property
+
+from core.db.estimates import approximate_count
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator с приблизительным числом записей.
+
+    Вместо COUNT(*) по всей выборке берёт approximate_count()
+    (core/db/estimates.py): статистику таблицы для нефильтрованной
+    выборки и точный подсчёт не дальше EXACT_COUNT_LIMIT строк
+    для отфильтрованной. count_is_exact говорит, точно ли число
+    записей; в шаблоне неточное число выводится как «около N».
+    Страницы за концом настоящих данных просто пустые.
+
+    У страниц есть elided_page_range - номера вокруг текущей
+    с многоточиями: на миллионах записей полный page_range
+    вывел бы сотни тысяч ссылок.
+    """
+
+    count_is_exact = True
+
+    @cached_property
+    def count(self):
+        if not hasattr(self.object_list, 'query'):
+            return super().count
+        count, self.count_is_exact = approximate_count(self.object_list)
+        return count
+
+    def _get_page(self, *args, **kwargs):
+        return EstimatedPage(*args, **kwargs)
+
+
+class EstimatedPage(Page):
+    """Страница EstimatedCountPaginator."""
+
+    @property
+    def elided_page_range(self):
+        return self.paginator.get_elided_page_range(self.number)
@@ -0,0 +1,183 @@
+import base64
+import binascii
+import collections.abc
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+
+class InvalidCursor(Exception):
+    """Курсор повреждён или не соответствует ключам паджинатора."""
+    pass
+
+
+class KeysetPaginator:
+    """Паджинатор по ключу (keyset/cursor pagination).
+
+    В отличие от django.core.paginator.Paginator не делает COUNT(*)
+    и OFFSET: следующая страница выбирается условием
+    WHERE (pub_date, id) < (последняя дата, последний id),
+    поэтому страница N стоит столько же, сколько первая.
+    Ключи по умолчанию - (pub_date, id) по убыванию, последний ключ
+    должен быть уникальным (id), чтобы порядок был строгим.
+    """
+
+    def __init__(self, object_list, per_page, keys=('pub_date', 'id'),
+                 descending=True):
+        self.object_list = object_list
+        self.per_page = int(per_page)
+        self.keys = tuple(keys)
+        self.descending = descending
+
+    def _ordering(self, reverse=False):
+        descending = self.descending != reverse
+        prefix = '-' if descending else ''
+        return [prefix + key for key in self.keys]
+
+    def encode_cursor(self, obj):
+        """Упаковывает значения ключей объекта (или словаря из
+        .values()) в непрозрачную строку."""
+        values = []
+        for key in self.keys:
+            value = obj[key] if isinstance(obj, dict) else getattr(obj, key)
+            # DjangoJSONEncoder обрезает микросекунды до миллисекунд,
+            # а для сравнения по ключу нужна полная точность
+            if hasattr(value, 'isoformat'):
+                value = value.isoformat()
+            values.append(value)
+        raw = json.dumps(values, separators=(',', ':'))
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        """Распаковывает курсор обратно в значения ключей."""
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        except (ValueError, TypeError, binascii.Error):
+            raise InvalidCursor(cursor)
+        if not isinstance(values, list) or len(values) != len(self.keys):
+            raise InvalidCursor(cursor)
+        opts = self.object_list.model._meta
+        try:
+            return [
+                opts.get_field(key).to_python(value)
+                for key, value in zip(self.keys, values)
+            ]
+        except ValidationError:
+            raise InvalidCursor(cursor)
+
+    def _seek_filter(self, values, forward):
+        """Строит условие «строго после курсора» для составного ключа.
+
+        Для ключей (a, b) по убыванию и направления вперёд получаем
+        a < x OR (a = x AND b < y).
+        """
+        # при движении назад сравнение меняется на противоположное
+        less = self.descending == forward
+        lookup = 'lt' if less else 'gt'
+        condition = Q()
+        for i, key in enumerate(self.keys):
+            term = Q(**{f'{key}__{lookup}': values[i]})
+            for prev_key, prev_value in zip(self.keys[:i], values[:i]):
+                term &= Q(**{prev_key: prev_value})
+            condition |= term
+        return condition
+
+    def page(self, after=None, before=None):
+        """Возвращает страницу после курсора after или перед курсором before.
+
+        Испорченный курсор - исключение InvalidCursor.
+        """
+        if before:
+            return self._page_before(self.decode_cursor(before))
+        if after:
+            return self._page_after(self.decode_cursor(after))
+        return self._page_after(None)
+
+    def get_page(self, after=None, before=None):
+        """То же, что page(), но испорченный курсор молча даёт первую
+        страницу - так же ведёт себя Paginator.get_page() с неправильным
+        номером страницы.
+        """
+        try:
+            return self.page(after, before)
+        except InvalidCursor:
+            return self._page_after(None)
+
+    def _page_after(self, values):
+        queryset = self.object_list.order_by(*self._ordering())
+        if values is not None:
+            queryset = queryset.filter(self._seek_filter(values, forward=True))
+        # берём на одну запись больше, чтобы узнать, есть ли следующая страница
+        rows = list(queryset[:self.per_page + 1])
+        has_next = len(rows) > self.per_page
+        return KeysetPage(
+            rows[:self.per_page], self,
+            has_next=has_next,
+            has_previous=values is not None,
+        )
+
+    def _page_before(self, values):
+        queryset = self.object_list.order_by(*self._ordering(reverse=True))
+        queryset = queryset.filter(self._seek_filter(values, forward=False))
+        rows = list(queryset[:self.per_page + 1])
+        has_previous = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        rows.reverse()
+        if not has_previous:
+            # дошли до начала ленты - отдаём честную первую страницу,
+            # чтобы на ней всегда было per_page записей
+            return self._page_after(None)
+        return KeysetPage(
+            rows, self,
+            has_next=True,
+            has_previous=has_previous,
+        )
+
+
+class KeysetPage(collections.abc.Sequence):
+    """Страница KeysetPaginator.
+
+    Повторяет интерфейс django.core.paginator.Page там, где это возможно
+    (итерация, len, has_next, has_previous, has_other_pages), но вместо
+    номеров страниц отдаёт курсоры next_cursor и previous_cursor.
+    """
+
+    is_keyset = True
+
+    def __init__(self, object_list, paginator, has_next, has_previous):
+        self.object_list = object_list
+        self.paginator = paginator
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __repr__(self):
+        return f'<KeysetPage of {len(self.object_list)} objects>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self._has_next and bool(self.object_list)
+
+    def has_previous(self):
+        return self._has_previous and bool(self.object_list)
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    @property
+    def next_cursor(self):
+        if not self.has_next():
+            return None
+        return self.paginator.encode_cursor(self.object_list[-1])
+
+    @property
+    def previous_cursor(self):
+        if not self.has_previous():
+            return None
+        return self.paginator.encode_cursor(self.object_list[0])
@@ -0,0 +1,159 @@
+"""Хранилища счётчиков для ограничения частоты запросов.
+
+Счётчики должны быть общими для всех воркеров gunicorn, иначе
+при N воркерах лимит фактически в N раз мягче. Оба хранилища
+увеличивают счётчик атомарно и одной операцией:
+- CacheCounterStore - общий кэш Django; атомарен на Redis (INCR),
+  используется, когда задан REDIS_URL;
+- SQLiteCounterStore - файл SQLite на диске контейнера, общий для всех
+  процессов; атомарность обеспечивает блокировка записи SQLite.
+Хранилище выбирает get_store() по настройке THROTTLE_STORE. Тесты API
+получают своё хранилище в памяти процесса через IsolatedThrottleMixin
+(core/ratelimit/testing.py).
+"""
+import os
+import random
+import sqlite3
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+class CacheCounterStore:
+    """Счётчики в кэше Django (для Redis - атомарный INCR)."""
+
+    def __init__(self, alias='default'):
+        self.cache = caches[alias]
+
+    def incr(self, key, delta, ttl):
+        """Увеличивает счётчик на delta и возвращает новое значение."""
+        # add() создаёт ключ со сроком жизни, только если его ещё нет
+        self.cache.add(key, 0, ttl)
+        try:
+            return self.cache.incr(key, delta)
+        except ValueError:
+            # ключ успел истечь между add() и incr()
+            self.cache.add(key, delta, ttl)
+            return delta
+
+    def decr(self, key, delta):
+        """Уменьшает существующий счётчик на delta, не ниже нуля;
+        истёкший ключ не создаёт заново. Возвращает новое значение."""
+        try:
+            value = self.cache.decr(key, delta)
+        except ValueError:
+            # ключ уже истёк - уменьшать нечего
+            return 0
+        if value < 0:
+            self.cache.incr(key, -value)
+            return 0
+        return value
+
+    def get_many(self, keys):
+        values = self.cache.get_many(keys)
+        return [values.get(key, 0) for key in keys]
+
+    def clear(self):
+        self.cache.clear()
+
+
+class SQLiteCounterStore:
+    """Счётчики в файле SQLite, общем для всех процессов.
+
+    Увеличение - один запрос INSERT ... ON CONFLICT DO UPDATE ...
+    RETURNING, SQLite выполняет его под блокировкой записи, так что
+    параллельные процессы не теряют обновлений. Просроченные строки
+    изредка вычищаются.
+    """
+
+    # доля запросов, после которых удаляются просроченные счётчики
+    PURGE_PROBABILITY = 0.01
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+
+    @property
+    def connection(self):
+        # соединение SQLite нельзя делить между потоками
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(
+                self.path, timeout=5, isolation_level=None)
+            # счётчики временные: журнал WAL и без fsync на каждую запись
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=OFF')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS counters ('
+                'key TEXT PRIMARY KEY, value INTEGER NOT NULL, '
+                'expires REAL NOT NULL)')
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def incr(self, key, delta, ttl):
+        """Увеличивает счётчик на delta и возвращает новое значение."""
+        now = time.time()
+        # просроченный счётчик начинается заново
+        row = self.connection.execute(
+            'INSERT INTO counters (key, value, expires) VALUES (?, ?, ?) '
+            'ON CONFLICT (key) DO UPDATE SET '
+            'value = CASE WHEN expires < ? THEN excluded.value '
+            'ELSE value + excluded.value END, '
+            'expires = CASE WHEN expires < ? THEN excluded.expires '
+            'ELSE expires END '
+            'RETURNING value',
+            (key, delta, now + ttl, now, now)
+        ).fetchone()
+        if random.random() < self.PURGE_PROBABILITY:
+            self.connection.execute(
+                'DELETE FROM counters WHERE expires < ?', (now,))
+        return row[0]
+
+    def decr(self, key, delta):
+        """Уменьшает существующий счётчик на delta, не ниже нуля;
+        истёкший ключ не создаёт заново. Возвращает новое значение."""
+        row = self.connection.execute(
+            'UPDATE counters SET value = MAX(value - ?, 0) '
+            'WHERE key = ? AND expires >= ? RETURNING value',
+            (delta, key, time.time())
+        ).fetchone()
+        return row[0] if row else 0
+
+    def get_many(self, keys):
+        placeholders = ', '.join('?' * len(keys))
+        rows = dict(self.connection.execute(
+            f'SELECT key, value FROM counters WHERE key IN ({placeholders}) '
+            f'AND expires >= ?',
+            (*keys, time.time())
+        ).fetchall())
+        return [rows.get(key, 0) for key in keys]
+
+    def clear(self):
+        self.connection.execute('DELETE FROM counters')
+
+
+_store = None
+_lock = threading.Lock()
+
+
+def get_store():
+    """Возвращает хранилище счётчиков, заданное в THROTTLE_STORE."""
+    global _store
+    with _lock:
+        if _store is None:
+            if settings.THROTTLE_STORE == 'cache':
+                _store = CacheCounterStore()
+            else:
+                _store = SQLiteCounterStore(settings.THROTTLE_SQLITE_PATH)
+        return _store
+
+
+def reset_store():
+    """Забывает созданное хранилище: следующий get_store() создаст
+    новое по текущим настройкам (нужно тестам)."""
+    global _store
+    with _lock:
+        _store = None
@@ -0,0 +1,22 @@
+from django.test import override_settings
+
+from .store import reset_store
+
+
+class IsolatedThrottleMixin:
+    """Примесь к TestCase: у каждого теста своё пустое хранилище
+    счётчиков троттлинга в памяти процесса.
+
+    Иначе тесты делят счётчики с запущенным рядом сервером разработки
+    (файл THROTTLE_SQLITE_PATH) и друг с другом и упираются в лимит
+    анонимных запросов в зависимости от того, как быстро идут.
+    """
+
+    def setUp(self):
+        override = override_settings(THROTTLE_STORE='sqlite',
+                                     THROTTLE_SQLITE_PATH=':memory:')
+        override.enable()
+        self.addCleanup(override.disable)
+        reset_store()
+        self.addCleanup(reset_store)
+        super().setUp()
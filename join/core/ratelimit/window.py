@@ -0,0 +1,61 @@
+"""Скользящее окно на двух счётчиках (sliding window counter).
+
+Вместо полной истории запросов хранится по одному счётчику на текущее
+и предыдущее фиксированное окно. Число запросов за последние window
+секунд оценивается как
+
+    предыдущее * (доля предыдущего окна, ещё попадающая в скользящее)
+    + текущее
+
+Состояние клиента - два целых числа, проверка - одно атомарное
+увеличение и одно чтение, сколько бы запросов ни было разрешено.
+"""
+import time
+
+from .store import get_store
+
+
+class SlidingWindow:
+    """Лимит limit запросов за window секунд для ключа."""
+
+    def __init__(self, limit, window, store=None, timer=time.time):
+        self.limit = limit
+        self.window = window
+        self.store = store or get_store()
+        self.timer = timer
+
+    def _keys(self, key, now):
+        index = int(now // self.window)
+        return f'{key}:{index}', f'{key}:{index - 1}'
+
+    def hit(self, key):
+        """Учитывает запрос. Возвращает (разрешён ли, сколько ждать секунд)."""
+        now = self.timer()
+        current_key, previous_key = self._keys(key, now)
+        elapsed = now % self.window
+        weight = 1 - elapsed / self.window
+        # счётчик живёт два окна: следующее окно читает его как предыдущий
+        current = self.store.incr(current_key, 1, 2 * self.window)
+        previous, = self.store.get_many([previous_key])
+        if previous * weight + current <= self.limit:
+            return True, 0
+        # отказанные запросы не учитываем, иначе клиент, который
+        # продолжает стучаться, не дождётся разблокировки никогда
+        # decr не создаёт счётчик заново, если он как раз истёк,
+        # и не уводит его в минус
+        current = self.store.decr(current_key, 1)
+        return False, self._wait(previous, current, elapsed)
+
+    def _wait(self, previous, current, elapsed):
+        """Через сколько секунд оценка опустится ниже лимита."""
+        free = self.limit - current
+        if free >= 1 and previous:
+            # ждём, пока вес предыдущего окна не уменьшится достаточно
+            needed = self.window * (1 - (free - 1) / previous)
+            return max(needed - elapsed, 0)
+        # текущее окно уже заполнено: в следующем оно станет
+        # предыдущим и будет «утекать» так же
+        rest = self.window - elapsed
+        if current <= 0:
+            return rest
+        return rest + self.window * max(1 - (self.limit - 1) / current, 0)
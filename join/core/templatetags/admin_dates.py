@@ -0,0 +1,141 @@
+"""Навигация по датам в админке без DISTINCT по всей таблице.
+
+Стандартный тег {% date_hierarchy cl %} строит ссылки на годы, месяцы
+и дни запросом queryset.datetimes(...) - это SELECT DISTINCT по
+усечённой дате, то есть чтение и сортировка всех строк выборки.
+Здесь ссылки строятся по первой и последней дате выборки: MIN и MAX
+по индексированному полю - два коротких прохода по индексу, а сам
+фильтр по году/месяцу/дню админка и так превращает в диапазон
+field >= начало AND field < конец.
+
+Цена - в списке могут оказаться месяцы и дни без записей между
+первой и последней датой: при переходе по такой ссылке список просто
+пуст.
+
+Подключается в шаблоне списка модели вместо стандартного тега:
+    {% load admin_dates %}
+    {% block date_hierarchy %}{% indexed_date_hierarchy cl %}{% endblock %}
+"""
+import datetime
+
+from django import template
+from django.contrib.admin.templatetags.base import InclusionAdminNode
+from django.db import models
+from django.utils import formats, timezone
+from django.utils.text import capfirst
+from django.utils.translation import gettext as _
+
+register = template.Library()
+
+
+def _date_range(cl):
+    """Первая и последняя дата выборки списка (локальное время)
+    или (None, None) для пустой выборки."""
+    field_name = cl.date_hierarchy
+    date_range = cl.queryset.order_by().aggregate(
+        first=models.Min(field_name), last=models.Max(field_name))
+    first, last = date_range['first'], date_range['last']
+    if first is None or last is None:
+        return None, None
+    if isinstance(first, datetime.datetime):
+        first, last = (timezone.localtime(value)
+                       if timezone.is_aware(value) else value
+                       for value in (first, last))
+        first, last = first.date(), last.date()
+    return first, last
+
+
+def indexed_date_hierarchy(cl):
+    """Контекст для admin/date_hierarchy.html, как у date_hierarchy."""
+    if not cl.date_hierarchy:
+        return {'show': False}
+    field_name = cl.date_hierarchy
+    year_field = f'{field_name}__year'
+    month_field = f'{field_name}__month'
+    day_field = f'{field_name}__day'
+    year_lookup = cl.params.get(year_field)
+    month_lookup = cl.params.get(month_field)
+    day_lookup = cl.params.get(day_field)
+
+    def link(filters):
+        return cl.get_query_string(filters, [f'{field_name}__'])
+
+    if year_lookup and month_lookup and day_lookup:
+        # день выбран - запрашивать нечего
+        day = datetime.date(
+            int(year_lookup), int(month_lookup), int(day_lookup))
+        return {
+            'show': True,
+            'back': {
+                'link': link({year_field: year_lookup,
+                              month_field: month_lookup}),
+                'title': capfirst(formats.date_format(
+                    day, 'YEAR_MONTH_FORMAT')),
+            },
+            'choices': [{'title': capfirst(formats.date_format(
+                day, 'MONTH_DAY_FORMAT'))}],
+        }
+
+    first, last = _date_range(cl)
+    if not (year_lookup or month_lookup) and first:
+        # как и стандартный тег, сразу открываем единственный год/месяц
+        if first.year == last.year:
+            year_lookup = first.year
+            if first.month == last.month:
+                month_lookup = first.month
+
+    if year_lookup and month_lookup:
+        year, month = int(year_lookup), int(month_lookup)
+        days = range(first.day, last.day + 1) if first else ()
+        return {
+            'show': True,
+            'back': {'link': link({year_field: year_lookup}),
+                     'title': str(year_lookup)},
+            'choices': [
+                {
+                    'link': link({year_field: year_lookup,
+                                  month_field: month_lookup,
+                                  day_field: day}),
+                    'title': capfirst(formats.date_format(
+                        datetime.date(year, month, day),
+                        'MONTH_DAY_FORMAT')),
+                }
+                for day in days
+            ],
+        }
+    if year_lookup:
+        year = int(year_lookup)
+        months = range(first.month, last.month + 1) if first else ()
+        return {
+            'show': True,
+            'back': {'link': link({}), 'title': _('All dates')},
+            'choices': [
+                {
+                    'link': link({year_field: year_lookup,
+                                  month_field: month}),
+                    'title': capfirst(formats.date_format(
+                        datetime.date(year, month, 1), 'YEAR_MONTH_FORMAT')),
+                }
+                for month in months
+            ],
+        }
+    years = range(first.year, last.year + 1) if first else ()
+    return {
+        'show': True,
+        'back': None,
+        'choices': [
+            {'link': link({year_field: str(year)}), 'title': str(year)}
+            for year in years
+        ],
+    }
+
+
+@register.tag(name='indexed_date_hierarchy')
+def indexed_date_hierarchy_tag(parser, token):
+    return InclusionAdminNode(
+        parser,
+        token,
+        func=indexed_date_hierarchy,
+        template_name='date_hierarchy.html',
+        takes_context=False,
+    )
@@ -0,0 +1,25 @@
+"""Тег {% querystring %}: текущая строка запроса с заменой параметров.
+
+Ссылки листания не должны терять остальные параметры адреса
+(например, ?q= на главной): тег берёт request.GET, заменяет
+переданные параметры, а со значением None - убирает их:
+    {% load querystring %}
+    <a href="{% querystring after=page_obj.next_cursor before=None %}">
+
+Повторяет встроенный тег Django 5.1, после обновления Django этот
+модуль можно удалить вместе с {% load querystring %} в шаблонах.
+"""
+from django import template
+
+register = template.Library()
+
+
+@register.simple_tag(name='querystring', takes_context=True)
+def querystring(context, **kwargs):
+    params = context['request'].GET.copy()
+    for key, value in kwargs.items():
+        if value is None:
+            params.pop(key, None)
+        else:
+            params[key] = value
+    return f'?{params.urlencode()}'
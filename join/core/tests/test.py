@@ -1,4 +1,22 @@
-from django.test import TestCase, Client
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, Client, override_settings
+from django.urls import reverse
+
+from core.db.estimates import approximate_count, estimate_count
+from core.decorators.craft_decorators import FUNCTION_DURATION, time_check
+from core.models import RowCount
+from core.paginators.estimated import EstimatedCountPaginator
+from core.jobs import queue
+from core.metrics import registry
+from core.metrics.registry import REGISTRY, Histogram, render
 
 
 class TestCastomErrorPages(TestCase):
@@ -18,3 +36,247 @@ class TestCastomErrorPages(TestCase):
         self.assertTemplateUsed(response, 'core/404.html')
 
 
+
+
+class TestJobQueue(TestCase):
+    """Тестирует фоновую очередь задач на пуле процессов."""
+
+    @override_settings(JOB_QUEUE_WORKERS=0)
+    def test_inline_mode(self):
+        """Без пула задача выполняется сразу."""
+        self.assertEqual(queue.enqueue(pow, 2, 10).result(), 1024)
+
+    @override_settings(JOB_QUEUE_WORKERS=0)
+    def test_enqueue_on_commit(self):
+        """Задача ставится после коммита, а с внешним пулом - никогда."""
+        calls = []
+        with self.captureOnCommitCallbacks(execute=True):
+            queue.enqueue_on_commit(calls.append, 1)
+            self.assertEqual(calls, [])
+        self.assertEqual(calls, [1])
+        with override_settings(JOB_QUEUE_EXTERNAL=True):
+            with self.captureOnCommitCallbacks(execute=True) as callbacks:
+                queue.enqueue_on_commit(calls.append, 2)
+        self.assertEqual(callbacks, [])
+        self.assertEqual(calls, [1])
+
+    @override_settings(JOB_QUEUE_WORKERS=1)
+    def test_process_pool(self):
+        """Задача выполняется в отдельном процессе."""
+        try:
+            future = queue.enqueue(os.getpid)
+            self.assertNotEqual(future.result(timeout=60), os.getpid())
+        finally:
+            queue.shutdown()
+
+
+class TestMetrics(TestCase):
+    """Тестирует замеры запросов и страницу /metrics."""
+
+    def setUp(self):
+        cache.clear()
+        self.metrics_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.metrics_dir, ignore_errors=True)
+        override = override_settings(METRICS_DIR=self.metrics_dir)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.client = Client()
+
+    def sample(self, name, labels):
+        """Значение метрики процесса с заданными метками (или None)."""
+        for sample_labels, value in REGISTRY.snapshot()[name]['samples']:
+            if tuple(sample_labels) == labels:
+                return value
+        return None
+
+    def test_request_is_measured(self):
+        """Время, SQL, кэш и размер ответа попадают в метрики вида."""
+        labels = ('posts:index', 'GET')
+        before = self.sample('join_http_request_duration_seconds', labels)
+        before_count = before['count'] if before else 0
+        before_hits = self.sample('join_cache_hits_total', labels) or 0
+        self.client.get(reverse('posts:index'))
+        # вторая страница отдаётся из кэша
+        self.client.get(reverse('posts:index'))
+        duration = self.sample('join_http_request_duration_seconds', labels)
+        self.assertEqual(duration['count'], before_count + 2)
+        self.assertGreater(
+            self.sample('join_http_request_sql_queries', labels)['sum'], 0)
+        self.assertGreater(
+            self.sample('join_http_response_size_bytes', labels)['sum'], 0)
+        self.assertGreater(
+            self.sample('join_cache_hits_total', labels), before_hits)
+
+    def test_metrics_page(self):
+        """/metrics складывает метрики всех воркеров."""
+        self.client.get(reverse('posts:index'))
+        # снимок «другого воркера»
+        other = {
+            'join_http_requests_total': {
+                'type': 'counter', 'help': 'Число запросов',
+                'labelnames': ['view', 'method', 'status'],
+                'samples': [[['fake:view', 'GET', '200'], 5]],
+            }
+        }
+        # снимок живого процесса: родителя тестов
+        path = os.path.join(self.metrics_dir, f'{os.getppid()}.json')
+        with open(path, 'w') as file:
+            json.dump(other, file)
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        content = response.content.decode()
+        self.assertIn('# TYPE join_http_request_duration_seconds histogram',
+                      content)
+        self.assertIn('join_http_requests_total{view="fake:view",'
+                      'method="GET",status="200"} 5', content)
+        self.assertIn('join_http_request_duration_seconds_bucket{'
+                      'view="posts:index",method="GET",le="+Inf"}', content)
+
+    def test_metrics_page_is_local(self):
+        """Снаружи страницы метрик нет."""
+        response = self.client.get('/metrics', REMOTE_ADDR='10.0.0.1')
+        self.assertEqual(response.status_code, 404)
+
+    def test_metrics_page_token(self):
+        """С токеном страница открыта с любого адреса."""
+        with override_settings(METRICS_TOKEN='secret'):
+            response = self.client.get(
+                '/metrics', REMOTE_ADDR='10.0.0.1',
+                HTTP_AUTHORIZATION='Bearer secret')
+            self.assertEqual(response.status_code, 200)
+            response = self.client.get(
+                '/metrics', REMOTE_ADDR='10.0.0.1',
+                HTTP_AUTHORIZATION='Bearer wrong')
+            self.assertEqual(response.status_code, 404)
+
+    @override_settings(METRICS_ALLOWED_IPS=['127.0.0.1', '10.0.0.0/8'])
+    def test_metrics_page_allowed_network(self):
+        """В METRICS_ALLOWED_IPS можно указать подсеть."""
+        response = self.client.get('/metrics', REMOTE_ADDR='10.0.0.1')
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get('/metrics', REMOTE_ADDR='192.168.0.1')
+        self.assertEqual(response.status_code, 404)
+
+    def test_dead_process_snapshots_archived(self):
+        """Снимки умерших процессов переносятся в архив: их счётчики
+        остаются в сумме и не идут назад."""
+        process = subprocess.Popen([sys.executable, '-c', ''])
+        process.wait()
+        dead = os.path.join(self.metrics_dir, f'{process.pid}.json')
+        with open(dead, 'w') as file:
+            json.dump({'join_fake_total': {
+                'type': 'counter', 'help': 'Тест', 'labelnames': [],
+                'samples': [[[], 3]],
+            }}, file)
+        fake = registry.collect()['join_fake_total']['samples']
+        self.assertEqual(fake, [[[], 3]])
+        self.assertFalse(os.path.exists(dead))
+        # повторное чтение архив не задваивает
+        fake = registry.collect()['join_fake_total']['samples']
+        self.assertEqual(fake, [[[], 3]])
+
+        # воркер вышел - мастер переносит его снимок в архив
+        exited = os.path.join(self.metrics_dir, '999999.json')
+        with open(exited, 'w') as file:
+            json.dump({'join_fake_total': {
+                'type': 'counter', 'help': 'Тест', 'labelnames': [],
+                'samples': [[[], 2]],
+            }}, file)
+        registry.mark_process_dead(999999)
+        self.assertFalse(os.path.exists(exited))
+        fake = registry.collect()['join_fake_total']['samples']
+        self.assertEqual(fake, [[[], 5]])
+
+        registry.clear_snapshots()
+        self.assertEqual(
+            [name for name in os.listdir(self.metrics_dir)
+             if name.endswith('.json')], [])
+
+    def test_histogram_render(self):
+        """Корзины в выводе накопительные."""
+        histogram = Histogram('test_seconds', 'Тест', ('name',),
+                              buckets=(1, 2))
+        for value in (0.5, 1.5, 3):
+            histogram.observe(('a',), value)
+        content = render({'test_seconds': {
+            'type': 'histogram', 'help': 'Тест', 'labelnames': ['name'],
+            'buckets': [1, 2], 'samples': histogram.samples(),
+        }})
+        self.assertIn('test_seconds_bucket{name="a",le="1.0"} 1', content)
+        self.assertIn('test_seconds_bucket{name="a",le="2.0"} 2', content)
+        self.assertIn('test_seconds_bucket{name="a",le="+Inf"} 3', content)
+        self.assertIn('test_seconds_count{name="a"} 3', content)
+
+    def test_time_check(self):
+        """@time_check возвращает результат и пишет время в гистограмму."""
+        @time_check
+        def answer():
+            return 42
+
+        self.assertEqual(answer(), 42)
+        name = f'{answer.__module__}.{answer.__qualname__}'
+        counts = {tuple(labels): value['count']
+                  for labels, value in FUNCTION_DURATION.samples()}
+        self.assertEqual(counts[(name,)], 1)
+
+
+class TestEstimatedCounts(TestCase):
+    """Счётчики строк на триггерах SQLite и приблизительный COUNT(*)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        from posts.models import Post
+        cls.Post = Post
+        cls.user = get_user_model().objects.create_user(username='counted')
+        Post.objects.bulk_create(
+            [Post(title=str(i), text='Текст', author=cls.user)
+             for i in range(30)])
+
+    def rows(self):
+        return RowCount.objects.get(table=self.Post._meta.db_table).rows
+
+    def test_triggers_follow_inserts_and_deletes(self):
+        # bulk_create и DELETE мимо сигналов - триггеры всё равно видят
+        self.assertEqual(self.rows(), 30)
+        self.Post.objects.filter(title__in=['0', '1']).delete()
+        self.assertEqual(self.rows(), 28)
+
+    def test_approximate_count(self):
+        posts = self.Post.objects.all()
+        self.assertEqual(approximate_count(posts), (30, True))
+        # большая таблица по счётчику - без COUNT(*)
+        RowCount.objects.filter(table=self.Post._meta.db_table).update(
+            rows=5_000_000)
+        with self.assertNumQueries(1):
+            self.assertEqual(approximate_count(posts), (5_000_000, False))
+        self.assertEqual(estimate_count(posts), 5_000_000)
+        # фильтр считается точно, но не дальше предела
+        filtered = posts.filter(text='Текст')
+        self.assertEqual(approximate_count(filtered, limit=100), (30, True))
+        self.assertEqual(approximate_count(filtered, limit=10), (10, False))
+
+    def test_paginator(self):
+        paginator = EstimatedCountPaginator(
+            self.Post.objects.filter(text='Текст').order_by('id'), 10)
+        self.assertEqual(paginator.num_pages, 3)
+        self.assertTrue(paginator.count_is_exact)
+        RowCount.objects.update(rows=1_000_000)
+        paginator = EstimatedCountPaginator(
+            self.Post.objects.order_by('id'), 10)
+        page = paginator.get_page(50_000)
+        self.assertFalse(paginator.count_is_exact)
+        self.assertEqual(len(page), 0)
+        self.assertIn(paginator.ELLIPSIS, list(page.elided_page_range))
+
+    def test_admin_changelist(self):
+        admin = get_user_model().objects.create_superuser(
+            username='admin_counts', password='x', email='a@example.com')
+        client = Client()
+        client.force_login(admin)
+        RowCount.objects.update(rows=1_000_000)
+        response = client.get(reverse('admin:posts_post_changelist'))
+        self.assertContains(response, 'около 1000000')
+        response = client.get(reverse('admin:posts_post_changelist'),
+                              {'q': '1'})
+        self.assertNotContains(response, 'около')
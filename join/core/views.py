@@ -1,5 +1,13 @@
+import hmac
+import ipaddress
+
+from django.conf import settings
+from django.http import Http404, HttpResponse
 from django.shortcuts import render
 
+from core.metrics.registry import collect as collect_metrics
+from core.metrics.registry import render as render_metrics
+
 
 def page_not_found(request, exception):
     """Создаёт кастомную страницу 404."""
@@ -25,3 +33,34 @@ def csrf_failure(request, reason=''):
     но переопределяется не хандлер, а константа CSRF_FAILURE_VIEW в settings.py.
     """
     return render(request, 'core/403csrf.html')
+
+def _metrics_allowed(request):
+    """Запрос с токеном METRICS_TOKEN или с адреса из METRICS_ALLOWED_IPS."""
+    token = settings.METRICS_TOKEN
+    if token:
+        header = request.META.get('HTTP_AUTHORIZATION', '')
+        if hmac.compare_digest(header.encode(), f'Bearer {token}'.encode()):
+            return True
+    try:
+        address = ipaddress.ip_address(request.META.get('REMOTE_ADDR', ''))
+    except ValueError:
+        return False
+    return any(
+        address in ipaddress.ip_network(network.strip(), strict=False)
+        for network in settings.METRICS_ALLOWED_IPS if network.strip()
+    )
+
+
+def metrics(request):
+    """Метрики всех воркеров в текстовом формате Prometheus.
+
+    Страница доступна с адресов и подсетей из METRICS_ALLOWED_IPS
+    (по умолчанию - с самого сервера) или с заголовком
+    Authorization: Bearer <METRICS_TOKEN>; для остальных её как будто нет.
+    """
+    if not _metrics_allowed(request):
+        raise Http404
+    return HttpResponse(
+        render_metrics(collect_metrics()),
+        content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
@@ -0,0 +1,21 @@
+"""Настройки gunicorn: файл читается из рабочего каталога (/app)
+автоматически, достаточно запустить gunicorn join.wsgi:application.
+
+Хуки мастера следят за снимками метрик воркеров (core/metrics):
+при старте удаляются снимки и архив прошлого запуска, а снимок
+вышедшего воркера переносится в архив - его счётчики остаются
+в сумме /metrics и не идут назад при перезапуске воркеров.
+"""
+import os
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'join.settings')
+
+
+def on_starting(server):
+    from core.metrics import registry
+    registry.clear_snapshots()
+
+
+def child_exit(server, worker):
+    from core.metrics import registry
+    registry.mark_process_dead(worker.pid)
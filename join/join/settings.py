@@ -13,6 +13,7 @@ https://docs.djangoproject.com/en/5.0/ref/settings/
 from pathlib import Path
 from datetime import timedelta
 import os
+import tempfile
 #from dotenv import load_dotenv
 
 
@@ -52,6 +53,7 @@ INSTALLED_APPS = [
     'core.apps.CoreConfig',
     'users.apps.UsersConfig',
     'posts.apps.PostsConfig',
+    'api.apps.ApiConfig',
     'django.contrib.admin',
     'django.contrib.auth',  # Приложение для регистрация и авторизация пользователей
     'django.contrib.contenttypes',  # Django контент-типовая система (даёт разрешения, связанные с моделями).
@@ -68,6 +70,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # первой: замеряет весь запрос (core/metrics/middleware.py)
+    'core.metrics.middleware.MetricsMiddleware',
+    # поиск N+1 запросов, включается NPLUSONE_ENABLED
+    'core.nplusone.middleware.NPlusOneMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',  # Управление сессиями между запросами
     'corsheaders.middleware.CorsMiddleware',  # обработчик для разрешения доступа к api CORS
@@ -209,12 +215,94 @@ MEDIA_URL = '/media/'
 # будет загружать медиафайлы.
 MEDIA_ROOT = BASE_DIR / 'mediafiles'
 
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-        # для разработки, для боевого сервера Memcached или Redis
+# Бэкенды кэша из core/metrics/cache.py - штатные бэкенды Django,
+# которые вдобавок считают попадания и промахи для метрик.
+# Кэш должен быть общим для всех воркеров gunicorn: у LocMemCache
+# в каждом процессе своя копия. Если задан REDIS_URL - используем Redis,
+# иначе файловый кэш, который видят все процессы контейнера.
+if os.getenv('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'core.metrics.cache.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'core.metrics.cache.FileBasedCache',
+            'LOCATION': os.getenv(
+                'CACHE_LOCATION',
+                os.path.join(tempfile.gettempdir(), 'join_cache')
+            ),
+        }
     }
-}
+
+# Сколько секунд хранить закэшированные страницы ленты. Устаревшими они
+# не будут: изменения постов, комментариев и групп сбрасывают кэш сразу
+POSTS_PAGE_CACHE_TIMEOUT = 60 * 15
+
+# Лента подписок (posts/timeline.py): посты авторов, у которых подписчиков
+# больше TIMELINE_FANOUT_LIMIT, не раскладываются по лентам при публикации,
+# а подмешиваются при чтении. TIMELINE_BACKFILL_SIZE - сколько последних
+# постов автора попадает в ленту сразу после подписки.
+TIMELINE_FANOUT_LIMIT = 5000
+TIMELINE_BACKFILL_SIZE = 200
+
+# Сколько постов можно создать одним запросом api/v1/posts/bulk/
+POSTS_BULK_MAX_ITEMS = 500
+
+# Приблизительные счётчики страниц и админки (core/db/estimates.py):
+# выборка считается точным COUNT(*), только если в ней не больше
+# EXACT_COUNT_LIMIT строк, иначе выводится «около N» по статистике
+# таблицы. Для таблиц ROW_COUNT_MODELS на SQLite число строк ведут
+# триггеры (на PostgreSQL - pg_class.reltuples)
+EXACT_COUNT_LIMIT = 10000
+ROW_COUNT_MODELS = ['posts.Post', 'posts.Comment']
+
+# Размер пула процессов фоновой очереди (core/jobs/queue.py), в которой
+# строятся миниатюры картинок. 0 - выполнять задачи сразу, без пула
+JOB_QUEUE_WORKERS = int(os.getenv('JOB_QUEUE_WORKERS', 2))
+# JOB_QUEUE_EXTERNAL=True - пул держит отдельный процесс manage.py run_jobs
+# (сервис worker в docker-compose), а веб-процессы только отмечают работу
+# в БД; run_jobs опрашивает отметки раз в JOB_QUEUE_POLL_INTERVAL секунд
+JOB_QUEUE_EXTERNAL = os.getenv('JOB_QUEUE_EXTERNAL', 'False') == 'True'
+JOB_QUEUE_POLL_INTERVAL = float(os.getenv('JOB_QUEUE_POLL_INTERVAL', 2))
+
+# False отключает лимиты частоты запросов к API: замеры
+# posts/benchmark.py должны мерить эндпоинты, а не ограничитель
+THROTTLE_ENABLED = True
+# Хранилище счётчиков для ограничения частоты запросов к API
+# (core/ratelimit/store.py): 'cache' - общий кэш (атомарный INCR в Redis),
+# 'sqlite' - файл SQLite, общий для всех процессов контейнера
+THROTTLE_STORE = os.getenv(
+    'THROTTLE_STORE', 'cache' if os.getenv('REDIS_URL') else 'sqlite')
+# (тесты берут своё хранилище в памяти: core/ratelimit/testing.py)
+THROTTLE_SQLITE_PATH = os.getenv(
+    'THROTTLE_SQLITE_PATH',
+    os.path.join(tempfile.gettempdir(), 'join_throttle.sqlite3'))
+
+# Метрики (core/metrics): каждый воркер раз в METRICS_FLUSH_INTERVAL
+# секунд сбрасывает свои метрики в METRICS_DIR, страница /metrics
+# складывает их по всем воркерам. Страница открыта для адресов и подсетей
+# METRICS_ALLOWED_IPS (через запятую, например 127.0.0.1,10.0.0.0/8)
+# и для запросов с заголовком Authorization: Bearer <METRICS_TOKEN>.
+# В docker-compose все запросы приходят в gunicorn от nginx, поэтому
+# подсеть compose в METRICS_ALLOWED_IPS добавлять нельзя - страница
+# открылась бы всем; Prometheus опрашивает её с токеном из .env
+METRICS_DIR = os.getenv(
+    'METRICS_DIR', os.path.join(tempfile.gettempdir(), 'join_metrics'))
+METRICS_FLUSH_INTERVAL = 5
+METRICS_ALLOWED_IPS = os.getenv(
+    'METRICS_ALLOWED_IPS', '127.0.0.1,::1').split(',')
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
+# Поиск N+1 запросов (core/nplusone): запросы одной формы, повторившиеся
+# NPLUSONE_THRESHOLD раз за запрос, и превышение @query_budget пишутся
+# в лог, а с NPLUSONE_RAISE - роняют запрос (так работают тесты)
+NPLUSONE_ENABLED = os.getenv('NPLUSONE_ENABLED', 'False') == 'True'
+NPLUSONE_THRESHOLD = 3
+NPLUSONE_RAISE = False
 
 
 # REST_FRAMEWORK = {
@@ -237,7 +325,8 @@ REST_FRAMEWORK = {
     # TokenAuthentication
     'DEFAULT_AUTHENTICATION_CLASSES': [
         #'rest_framework.authentication.TokenAuthentication',
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        # JWT, но пользователь берётся из кэша, а не из БД
+        'api.authentication.CachedJWTAuthentication',
     ],
 
     #В параметре DEFAULT_THROTTLE_CLASSES мы регистрируем классы
@@ -246,10 +335,12 @@ REST_FRAMEWORK = {
     # в формате количество_запросов/период_времени.Количество
     # запросов указывается целым числом, период времени указывается
     # как second, minute, hour или day
+    # Классы из api/throttling.py считают запросы скользящим окном
+    # в хранилище, общем для всех воркеров (см. THROTTLE_STORE)
     'DEFAULT_THROTTLE_CLASSES': [
-        'rest_framework.throttling.UserRateThrottle',
-        'rest_framework.throttling.AnonRateThrottle',
-        'rest_framework.throttling.ScopedRateThrottle',  # для крафтовых ограничений
+        'api.throttling.SlidingWindowUserRateThrottle',
+        'api.throttling.SlidingWindowAnonRateThrottle',
+        'api.throttling.SlidingWindowScopedRateThrottle',  # для крафтовых ограничений
     ],
 
     'DEFAULT_THROTTLE_RATES': {
@@ -265,6 +356,24 @@ REST_FRAMEWORK = {
     #'DEFAUT_PAGINATION_CLASS': 'api.pagination.CustomPagination',
     'PAGE_SIZE': 10,
 
+    # JSON ответов и запросов через orjson (api/renderers.py,
+    # api/parsers.py), без него - обычные JSONRenderer и JSONParser.
+    # Штатные классы DRF стоят в списках следом как запасные: у них тот же
+    # тип application/json, и ими пользуются представления, у которых
+    # классы orjson убраны; чтобы вернуть их везде, достаточно убрать
+    # первые элементы списков
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.ORJSONRenderer',
+        'rest_framework.renderers.JSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'api.parsers.ORJSONParser',
+        'rest_framework.parsers.JSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+
     # Схема для автоматической генерации API-документации OpenAPI
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
 }
@@ -275,6 +384,19 @@ SIMPLE_JWT = {
     'AUTH_HEADER_TYPES': ('Bearer',), # это слово будет стоять перед токеном, вместо стандартного Token
 }
 
+# Сколько секунд живёт в кэше слепок пользователя для JWT-аутентификации
+# (api/authentication.py). Изменения пользователя сбрасывают его сразу
+JWT_USER_CACHE_TIMEOUT = 60
+
+DJOSER = {
+    # пользователь в auth/users/ и auth/users/me/ отдаётся вместе
+    # со счётчиками постов, комментариев и подписок
+    'SERIALIZERS': {
+        'user': 'api.serializer.UserSerializer',
+        'current_user': 'api.serializer.UserSerializer',
+    },
+}
+
 CORS_ORIGIN_ALLOW_ALL = True  # разрешить доступ к api всем
 CORS_URLS_REGEX = r'^/api/.*$'  # а именно к адресам вида,
 # начинаются с api далее любые (.) символы повторяющиеся сколько угодно раз (*)
@@ -19,6 +19,7 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 import debug_toolbar
+from core.views import metrics
 # подключаем плагин для генерации документации
 from drf_spectacular.views import SpectacularAPIView, SpectacularRedocView, SpectacularSwaggerView
 
@@ -32,6 +33,8 @@ urlpatterns = [
     path('group/', include('posts.urls', namespace='posts')),
     path('about/', include('about.urls', namespace='about')),
     path('admin/', admin.site.urls),
+    # метрики для Prometheus, только с METRICS_ALLOWED_IPS
+    path('metrics', metrics, name='metrics'),
     path('auth/', include('users.urls', namespace='users')),
     path('auth/', include('django.contrib.auth.urls')),
     path('api-auth/', include('rest_framework.urls', namespace='rest_framework')),
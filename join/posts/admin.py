@@ -1,28 +1,134 @@
-from django.contrib import admin
-from .models import Post, Group
+from django import forms
+from django.contrib import admin, messages
+from django.contrib.admin.helpers import ActionForm
+from django.contrib.admin.views.main import ChangeList
+from django.db.models.functions import Substr
+from django.utils import timezone
+
+from core.cache.generations import bump_generation
+from core.paginators.estimated import EstimatedCountPaginator
+from . import search
+from .models import Comment, Post, Group, UserStats
+
+# сколько символов текста поста показывать в списке
+TEXT_PREVIEW_LENGTH = 100
+
+
+class PostActionForm(ActionForm):
+    """Форма действий над выбранными постами: к списку действий
+    добавлена группа, в которую их переносит move_to_group."""
+    group = forms.ModelChoiceField(
+        Group.objects.order_by('title'), required=False, label='Группа')
+
+
+class PostChangeList(ChangeList):
+    """Список постов читает не весь текст, а только его начало:
+    подстроку режет БД, сам столбец text не выбирается."""
+
+    def get_queryset(self, request, exclude_parameters=None):
+        return super().get_queryset(request, exclude_parameters).defer(
+            'text').annotate(
+                text_preview=Substr('text', 1, TEXT_PREVIEW_LENGTH))
+
 
 # класс ModelAdmin связывается с моделью и конфигурирует 
 # отображение данных этой модели. В этом классе можно настроить 
 # параметры отображения.
 class PostAdmin(admin.ModelAdmin):
-    list_display = ('pk', 'title', 'anons', 'text', 'pub_date',
+    list_display = ('pk', 'title', 'anons', 'text_preview', 'pub_date',
                     'author', 'group',)
-    list_editable = ('group',)
     # Перечислили поля, которые должны отображаться в админке
-    search_fields = ('title', 'anons', 'text')
-    # Добавляем интерфейс для поиска по тексту постов, заголовку и анонсу
+    # автор и группа строки приходят JOIN-ом, а не запросом на строку
+    list_select_related = ('author', 'group')
+    # в форме поста автор и группа выбираются поиском, а не <select>
+    # со всеми пользователями и группами
+    autocomplete_fields = ('author', 'group')
+    # Поиск по тексту постов, заголовку и тэгам - полнотекстовый,
+    # по индексу (posts/search.py, см. get_search_results);
+    # search_fields нужен, чтобы админка показала строку поиска
+    search_fields = ('title',)
+    search_help_text = 'Полнотекстовый поиск по заголовку, тексту и тэгам'
     list_filter = ('pub_date',)
     # Добавляем возможность фильтрации по дате
+    # переходы по годам, месяцам и дням - диапазоны по индексу
+    # (pub_date, id); ссылки строит тег indexed_date_hierarchy
+    # из admin/posts/post/change_list.html
+    date_hierarchy = 'pub_date'
     empty_value_display = 'Нет записи'
     # Это свойство сработает для всех колонок: 
     # где пусто — там будет эта строка
-    
+    # число постов - по статистике таблицы, а не COUNT(*) по всей
+    # таблице; в списке выводится «около N» (admin/posts/pagination.html)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    # вместо list_editable (<select> всех групп в каждой строке) -
+    # действия над выбранными постами одним UPDATE
+    action_form = PostActionForm
+    actions = ('move_to_group', 'remove_from_group')
+
+    def get_changelist(self, request, **kwargs):
+        return PostChangeList
+
+    @admin.display(description='Текст поста')
+    def text_preview(self, obj):
+        return obj.text_preview
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term.strip():
+            return queryset, False
+        # search_posts фильтрует по id из поискового индекса,
+        # дубликатов строк не бывает
+        return search.search_posts(search_term, queryset), False
+
+    def _set_group(self, request, queryset, group):
+        """Меняет группу постов одним UPDATE.
+
+        update() не вызывает save() и сигналов, поэтому то, что
+        делают сигналы при сохранении поста, делаем здесь сами:
+        новая версия постов и лент авторов, сброс кэша страниц.
+        """
+        now = timezone.now()
+        # ленты авторов - до UPDATE: выборка может фильтроваться
+        # по группе и после него уже не найти эти посты
+        UserStats.objects.filter(
+            user__in=queryset.values('author')).update(feed_updated=now)
+        count = queryset.update(group=group, updated=now)
+        bump_generation('posts')
+        self.message_user(request, f'Изменено постов: {count}',
+                          messages.SUCCESS)
+
+    @admin.action(description='Перенести в выбранную группу')
+    def move_to_group(self, request, queryset):
+        form = self.action_form(request.POST)
+        form.fields['action'].choices = self.get_action_choices(request)
+        if not form.is_valid() or form.cleaned_data['group'] is None:
+            self.message_user(request, 'Выберите группу для переноса.',
+                              messages.WARNING)
+            return
+        self._set_group(request, queryset, form.cleaned_data['group'])
+
+    @admin.action(description='Убрать из группы')
+    def remove_from_group(self, request, queryset):
+        self._set_group(request, queryset, None)
+
+
+class CommentAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'post', 'author', 'created')
+    list_select_related = ('post', 'author')
+    raw_id_fields = ('post', 'author')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
 class GroupAdmin(admin.ModelAdmin):
     list_display = ('pk', 'title', 'description')
     search_fields = ('title', 'description')
     prepopulated_fields = {'slug': ('title',)}
+    # поиск группы в autocomplete-поле поста листается по страницам
+    ordering = ('title',)
 
 admin.site.register(Post, PostAdmin)
 # При регистрации модели Post источником конфигурации для неё назначаем
 # класс PostAdmin
-admin.site.register(Group)
+admin.site.register(Group, GroupAdmin)
+admin.site.register(Comment, CommentAdmin)
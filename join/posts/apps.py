@@ -5,3 +5,12 @@ class PostsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'posts'
     verbose_name = 'Posts publishing'
+
+    def ready(self):
+        # подключаем обработчики сигналов моделей
+        from . import signals  # noqa: F401
+        # работа, которую run_jobs подбирает по отметкам в БД
+        from core.jobs.queue import register_recovery
+        from . import thumbnails, timeline
+        register_recovery(thumbnails.enqueue_pending)
+        register_recovery(timeline.enqueue_catch_up_pending)
@@ -0,0 +1,496 @@
+"""Нагрузочные замеры страниц и API на синтетических данных.
+
+seed() заполняет БД данными нужного размера (пользователи, группы,
+тэги, посты, комментарии, подписки) пачками через bulk_create, минуя
+сигналы, а производные таблицы - поисковые документы, счётчики
+пользователей, ленты подписок - досчитывает одним проходом в конце.
+
+run() прогоняет каждую страницу и каждый GET-эндпоинт api/v1/ через
+тестовый клиент Django (весь стек: middleware, представление, шаблон
+или сериализатор, без сети) и считает p50/p95/p99, среднее, пропускную
+способность и число запросов к БД. Результат - словарь, который
+команда benchmark сохраняет в JSON; compare() сравнивает два таких
+файла, чтобы видеть регрессии между коммитами.
+
+Запуск: python manage.py seed_benchmark, затем python manage.py benchmark.
+"""
+import contextlib
+import datetime
+import platform
+import random
+import statistics
+import subprocess
+import time
+from contextlib import ExitStack
+
+import django
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection, connections, transaction
+from django.db.models import Max
+from django.test import Client, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from core.cache.generations import bump_generation
+
+from . import stats, timeline
+from .models import Comment, Follow, Group, Post, Tag, TagPost, TimelineEntry
+
+User = get_user_model()
+
+# Размер набора данных по умолчанию - то, что у нас в продакшене
+# через год. Для быстрой проверки на SQLite хватит --scale 0.01
+DEFAULT_SIZES = {
+    'users': 100_000,
+    'groups': 200,
+    'tags': 2_000,
+    'posts': 5_000_000,
+    'comments': 20_000_000,
+    'follows': 2_000_000,
+}
+BATCH_SIZE = 5_000
+USER_PREFIX = 'bench_'
+# За сколько дней назад разбросаны даты постов и комментариев
+DATE_SPREAD_DAYS = 3 * 365
+# Скольким пользователям собирать ленту подписок
+TIMELINE_USERS = 1_000
+
+WORDS = (
+    'город', 'погода', 'новости', 'музыка', 'концерт', 'выставка', 'книга',
+    'фильм', 'путешествие', 'горы', 'море', 'река', 'лес', 'поход', 'кофе',
+    'завтрак', 'рецепт', 'работа', 'проект', 'код', 'питон', 'джанго',
+    'база', 'данных', 'запрос', 'индекс', 'скорость', 'сервер', 'утро',
+    'вечер', 'выходные', 'праздник', 'друзья', 'семья', 'кошка', 'собака',
+    'велосипед', 'бег', 'футбол', 'шахматы', 'театр', 'музей', 'парк',
+)
+
+
+def _text(rng, low, high):
+    return ' '.join(rng.choices(WORDS, k=rng.randint(low, high)))
+
+
+@contextlib.contextmanager
+def explicit_dates(*fields):
+    """Даёт bulk_create записать свои даты в поля с auto_now_add.
+
+    Иначе у всех пяти миллионов постов была бы одна и та же дата.
+    """
+    saved = [field.auto_now_add for field in fields]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, value in zip(fields, saved):
+            field.auto_now_add = value
+
+
+def _random_date(rng, now):
+    return now - datetime.timedelta(
+        seconds=rng.randint(0, DATE_SPREAD_DAYS * 24 * 3600))
+
+
+def _bulk(model, objects, progress=None, label='', **kwargs):
+    """bulk_create из генератора пачками по BATCH_SIZE."""
+    batch = []
+    total = 0
+    for obj in objects:
+        batch.append(obj)
+        if len(batch) >= BATCH_SIZE:
+            model.objects.bulk_create(batch, **kwargs)
+            total += len(batch)
+            batch = []
+            if progress is not None:
+                progress(label, total)
+    if batch:
+        model.objects.bulk_create(batch, **kwargs)
+        total += len(batch)
+        if progress is not None:
+            progress(label, total)
+    return total
+
+
+def _next_id(model):
+    return (model.objects.aggregate(last=Max('id'))['last'] or 0) + 1
+
+
+def _id_range(model, first_id):
+    last = model.objects.aggregate(last=Max('id'))['last'] or 0
+    return first_id, last
+
+
+def fill_search_documents(first_id, last_id, batch_size=50_000):
+    """Поисковые документы для постов с id из диапазона одним SQL на пачку.
+
+    Тэги в документы синтетических постов не попадают - для замеров
+    поиска достаточно заголовка и текста.
+    """
+    with connection.cursor() as cursor:
+        for start in range(first_id, last_id + 1, batch_size):
+            cursor.execute(
+                "INSERT INTO posts_postsearchdocument "
+                "(post_id, title, body, tags) "
+                "SELECT id, title, anons || ' ' || text, '' "
+                "FROM posts_post WHERE id BETWEEN %s AND %s",
+                [start, min(start + batch_size - 1, last_id)]
+            )
+
+
+def seed(sizes, random_seed=0, progress=None):
+    """Заполняет БД синтетическими данными размера sizes.
+
+    Возвращает словарь с фактическим числом созданных строк.
+    """
+    rng = random.Random(random_seed)
+    now = timezone.now()
+    created = {}
+
+    start = User.objects.filter(username__startswith=USER_PREFIX).count()
+    first_user = _next_id(User)
+    created['users'] = _bulk(User, (
+        # пароль-заглушка: make_password на сотню тысяч пользователей
+        # считался бы дольше, чем весь остальной набор
+        User(username=f'{USER_PREFIX}{start + i}', password='!')
+        for i in range(sizes['users'])
+    ), progress, 'users')
+    user_ids = list(User.objects.filter(id__gte=first_user).values_list(
+        'id', flat=True))
+    if not user_ids:
+        return created
+
+    first_group = _next_id(Group)
+    created['groups'] = _bulk(Group, (
+        Group(title=f'Группа {first_group + i}',
+              slug=f'{USER_PREFIX}group-{first_group + i}',
+              description=_text(rng, 5, 20))
+        for i in range(sizes['groups'])
+    ), progress, 'groups')
+    group_ids = list(Group.objects.filter(id__gte=first_group).values_list(
+        'id', flat=True))
+
+    first_tag = _next_id(Tag)
+    created['tags'] = _bulk(Tag, (
+        Tag(name=f'{rng.choice(WORDS)}_{first_tag + i}')
+        for i in range(sizes['tags'])
+    ), progress, 'tags')
+    tag_ids = list(Tag.objects.filter(id__gte=first_tag).values_list(
+        'id', flat=True))
+
+    post_fields = (Post._meta.get_field('pub_date'),
+                   Comment._meta.get_field('created'))
+    with explicit_dates(*post_fields):
+        first_post = _next_id(Post)
+        created['posts'] = _bulk(Post, (
+            Post(
+                title=_text(rng, 1, 4)[:50],
+                anons=_text(rng, 3, 10),
+                text=_text(rng, 30, 120),
+                author_id=rng.choice(user_ids),
+                # каждый пятый пост - без группы
+                group_id=(rng.choice(group_ids)
+                          if group_ids and rng.random() > 0.2 else None),
+                pub_date=_random_date(rng, now),
+            )
+            for _ in range(sizes['posts'])
+        ), progress, 'posts')
+        first_post, last_post = _id_range(Post, first_post)
+
+        if tag_ids and last_post >= first_post:
+            created['tagposts'] = _bulk(TagPost, (
+                TagPost(post_id=post_id, tag_id=tag_id)
+                for post_id in range(first_post, last_post + 1)
+                for tag_id in rng.sample(tag_ids,
+                                         min(rng.randint(0, 2), len(tag_ids)))
+            ), progress, 'tagposts')
+
+        if last_post >= first_post:
+            created['comments'] = _bulk(Comment, (
+                Comment(
+                    post_id=rng.randint(first_post, last_post),
+                    author_id=rng.choice(user_ids),
+                    text=_text(rng, 3, 30),
+                    created=_random_date(rng, now),
+                )
+                for _ in range(sizes['comments'])
+            ), progress, 'comments')
+
+    def follow_pairs():
+        seen = set()
+        if len(user_ids) < 2:
+            return
+        for _ in range(sizes['follows']):
+            pair = tuple(rng.sample(user_ids, 2))
+            if pair in seen:
+                continue
+            seen.add(pair)
+            yield Follow(user_id=pair[0], author_id=pair[1])
+
+    created['follows'] = _bulk(Follow, follow_pairs(), progress, 'follows',
+                               ignore_conflicts=True)
+
+    # производные таблицы, которые в обычной работе ведут сигналы
+    if last_post >= first_post:
+        fill_search_documents(first_post, last_post)
+        if progress is not None:
+            progress('search documents', last_post - first_post + 1)
+    stats.recount_all(
+        progress=(lambda total: progress('user stats', total))
+        if progress is not None else None)
+    stats.recount_comments_all(
+        progress=(lambda total: progress('comment counts', total))
+        if progress is not None else None)
+    readers = list(
+        Follow.objects.filter(user_id__in=user_ids)
+        .values_list('user_id', flat=True).distinct()[:TIMELINE_USERS])
+    for count, user_id in enumerate(readers, 1):
+        with transaction.atomic():
+            for author_id in Follow.objects.filter(
+                    user_id=user_id).values_list('author_id', flat=True):
+                timeline.backfill(user_id, author_id)
+        if progress is not None and count % 100 == 0:
+            progress('timelines', count)
+    created['timelines'] = len(readers)
+    bump_generation('posts')
+    return created
+
+
+class Sample:
+    """Случайные, но существующие объекты для адресов эндпоинтов."""
+
+    def __init__(self, rng):
+        self.rng = rng
+        bounds = Post.objects.aggregate(last=Max('id'))
+        self.last_post = bounds['last'] or 0
+        self.group_slugs = list(
+            Group.objects.values_list('slug', flat=True)[:1000])
+        self.group_ids = list(Group.objects.values_list('id', flat=True)[:1000])
+        self.authors = list(
+            User.objects.filter(stats__posts_count__gt=0)
+            .values_list('username', flat=True)[:1000])
+        self.readers = list(
+            TimelineEntry.objects.values_list('user_id', flat=True)
+            .distinct()[:1000]) or list(
+            User.objects.values_list('id', flat=True)[:1000])
+        self.comments = list(
+            Comment.objects.values_list('post_id', 'id')[:1000])
+
+    def post_id(self):
+        # id постов идут почти подряд: промахи по удалённым постам
+        # дают 404, это видно в status_codes
+        return self.rng.randint(1, max(self.last_post, 1))
+
+    def group_slug(self):
+        return self.rng.choice(self.group_slugs)
+
+    def group_id(self):
+        return self.rng.choice(self.group_ids)
+
+    def author(self):
+        return self.rng.choice(self.authors)
+
+    def reader(self):
+        return self.rng.choice(self.readers)
+
+    def comment(self):
+        return self.rng.choice(self.comments)
+
+    def word(self):
+        return self.rng.choice(WORDS)
+
+
+def endpoints(sample):
+    """Имя замера -> (клиент: 'html' или 'api', функция адреса).
+
+    Только GET: замеры не должны менять данные между прогонами.
+    Выгрузка posts/export.* не включена - она читает всю таблицу
+    постов, её меряют отдельно: --endpoints api:posts_export.
+    """
+    comment = sample.comment
+    return {
+        'posts:index': ('html', lambda: reverse('posts:index')),
+        'posts:index_search': ('html', lambda: reverse('posts:index')
+                               + f'?q={sample.word()}'),
+        'posts:group_list': ('html', lambda: reverse(
+            'posts:group_list', args=[sample.group_slug()])),
+        'posts:profile': ('html', lambda: reverse(
+            'posts:profile', args=[sample.author()])),
+        'posts:post_detail': ('html', lambda: reverse(
+            'posts:post_detail', args=[sample.post_id()])),
+        'posts:follow_index': ('html', lambda: reverse('posts:follow_index')),
+        'posts:search': ('html', lambda: reverse('posts:search')
+                         + f'?q={sample.word()}'),
+        'api:post-list': ('api', lambda: '/api/v1/posts/'),
+        'api:post-detail': ('api', lambda: f'/api/v1/posts/{sample.post_id()}/'),
+        'api:post-search': ('api', lambda: '/api/v1/posts/'
+                            f'?search={sample.word()}'),
+        'api:group-list': ('api', lambda: '/api/v1/groups/'),
+        'api:group-detail': ('api', lambda: f'/api/v1/groups/{sample.group_id()}/'),
+        'api:comment-list': ('api', lambda: '/api/v1/posts/'
+                             f'{comment()[0]}/comments/'),
+        'api:comment-detail': ('api', lambda: '/api/v1/posts/{}/comments/{}/'
+                               .format(*comment())),
+        'api:follow-list': ('api', lambda: '/api/v1/follow/'),
+        'api:user-me': ('api', lambda: '/api/v1/auth/users/me/'),
+        'api:posts_export': ('api', lambda: '/api/v1/posts/export.ndjson'),
+    }
+
+
+DEFAULT_EXCLUDE = ('api:posts_export',)
+
+
+class _QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def percentile(sorted_values, fraction):
+    """Перцентиль по уже отсортированным значениям (ближайший ранг)."""
+    if not sorted_values:
+        return None
+    index = max(0, min(len(sorted_values) - 1,
+                       round(fraction * len(sorted_values) + 0.5) - 1))
+    return sorted_values[index]
+
+
+def _summary(timings, queries, statuses, wall):
+    timings = sorted(timings)
+    return {
+        'requests': len(timings),
+        'status_codes': statuses,
+        'p50_ms': round(percentile(timings, 0.50) * 1000, 3),
+        'p95_ms': round(percentile(timings, 0.95) * 1000, 3),
+        'p99_ms': round(percentile(timings, 0.99) * 1000, 3),
+        'mean_ms': round(statistics.fmean(timings) * 1000, 3),
+        'max_ms': round(timings[-1] * 1000, 3),
+        'throughput_rps': round(len(timings) / wall, 2) if wall else None,
+        'queries_mean': round(statistics.fmean(queries), 2),
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, timeout=5, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def dataset_counts():
+    return {
+        'users': User.objects.count(),
+        'groups': Group.objects.count(),
+        'posts': Post.objects.count(),
+        'comments': Comment.objects.count(),
+        'follows': Follow.objects.count(),
+    }
+
+
+def run(requests=200, warmup=10, names=None, random_seed=0, cold=False,
+        progress=None):
+    """Прогоняет эндпоинты и возвращает результаты замеров.
+
+    cold=True сбрасывает кэш страниц перед каждым запросом (вне замера),
+    иначе главная страница почти всегда отдаётся из кэша.
+    """
+    rng = random.Random(random_seed)
+    sample = Sample(rng)
+    reader = User.objects.get(pk=sample.reader())
+    html = Client()
+    html.force_login(reader)
+    api = APIClient()
+    api.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(reader)}')
+    clients = {'html': html, 'api': api}
+
+    table = endpoints(sample)
+    if names:
+        table = {name: table[name] for name in names}
+    else:
+        table = {name: value for name, value in table.items()
+                 if name not in DEFAULT_EXCLUDE}
+
+    results = {}
+    # лимиты частоты мерили бы ограничитель, а не эндпоинт
+    with override_settings(THROTTLE_ENABLED=False):
+        for name, (client_name, url) in table.items():
+            client = clients[client_name]
+            for _ in range(warmup):
+                _consume(client.get(url()))
+            timings, queries, statuses = [], [], {}
+            started = time.perf_counter()
+            for _ in range(requests):
+                path = url()
+                if cold:
+                    bump_generation('posts')
+                counter = _QueryCounter()
+                with ExitStack() as stack:
+                    for conn in connections.all():
+                        stack.enter_context(conn.execute_wrapper(counter))
+                    start = time.perf_counter()
+                    response = client.get(path)
+                    _consume(response)
+                    timings.append(time.perf_counter() - start)
+                queries.append(counter.count)
+                code = str(response.status_code)
+                statuses[code] = statuses.get(code, 0) + 1
+            results[name] = _summary(
+                timings, queries, statuses, time.perf_counter() - started)
+            if progress is not None:
+                progress(name, results[name])
+
+    return {
+        'meta': {
+            'commit': _git_commit(),
+            'timestamp': timezone.now().isoformat(),
+            'database': connection.vendor,
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'requests_per_endpoint': requests,
+            'warmup': warmup,
+            'cold_cache': cold,
+            'dataset': dataset_counts(),
+        },
+        'results': results,
+    }
+
+
+def _consume(response):
+    """Дочитывает потоковый ответ, чтобы в замер попала вся выгрузка."""
+    if response.streaming:
+        for _ in response.streaming_content:
+            pass
+    return response
+
+
+def compare(old, new, threshold=0.1):
+    """Сравнивает два прогона: список строк по эндпоинтам.
+
+    Регрессией считается рост p95 больше чем на threshold (10%).
+    Возвращает (строки, число регрессий).
+    """
+    lines = []
+    regressions = 0
+    for name, result in new['results'].items():
+        before = old['results'].get(name)
+        if before is None:
+            lines.append(f'{name}: новый эндпоинт, p95 {result["p95_ms"]} мс')
+            continue
+        change = (result['p95_ms'] - before['p95_ms']) / before['p95_ms'] \
+            if before['p95_ms'] else 0
+        mark = ''
+        if change > threshold:
+            mark = '  <-- регрессия'
+            regressions += 1
+        lines.append(
+            f'{name}: p95 {before["p95_ms"]} -> {result["p95_ms"]} мс '
+            f'({change:+.0%}), запросов к БД {before["queries_mean"]} -> '
+            f'{result["queries_mean"]}{mark}')
+    return lines, regressions
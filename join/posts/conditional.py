@@ -0,0 +1,114 @@
+"""Версии страниц и ресурсов API для условных запросов.
+
+Каждая функция одним запросом читает то, от чего зависит
+представление (время изменения, счётчики, slug группы, имя автора),
+и возвращает (etag, last_modified) или None, если объекта нет.
+Сами 304 отдают core/cache/conditional.py (HTML) и
+api/conditional.py (DRF).
+
+Last-Modified у HTML-страниц не выставляется: они зависят ещё и от
+счётчиков и от пользователя, и сравнения по одному времени мало.
+"""
+from django.db.models import Count, Exists, Max, OuterRef, Subquery
+
+from core.cache.conditional import make_etag
+
+from .models import Follow, Group, Post, User
+
+
+def _pk(value):
+    # pk из адреса API - строка, «abc» должен дать 404, а не ошибку
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _latest(*values):
+    return max((value for value in values if value), default=None)
+
+
+def _post_row(post_id):
+    return (
+        Post.objects.filter(pk=post_id)
+        .values_list('updated', 'group_id', 'group__updated',
+                     'author__username', 'author__stats__posts_count')
+        .first()
+    )
+
+
+def post_detail(request, post_id):
+    """Страница поста: пост с комментариями, группа, счётчик автора."""
+    row = _post_row(post_id)
+    if row is None:
+        return None
+    return make_etag('post_detail', post_id, *row, request.user.pk), None
+
+
+def post_comments(request, post_id):
+    """Фрагмент «Показать ещё»: комментарии поста после курсора."""
+    updated = (Post.objects.filter(pk=post_id)
+               .values_list('updated', flat=True).first())
+    if updated is None:
+        return None
+    return make_etag('post_comments', post_id, updated,
+                     request.GET.get('after', '')), None
+
+
+def post_resource(post_id, representation=''):
+    """api/v1/posts/<id>/: пост, тэги, группа и автор."""
+    post_id = _pk(post_id)
+    row = _post_row(post_id) if post_id is not None else None
+    if row is None:
+        return None
+    updated, group_id, group_updated, username, _ = row
+    return (
+        make_etag('post', post_id, updated, group_id, group_updated,
+                  username, representation),
+        _latest(updated, group_updated),
+    )
+
+
+def profile(request, username):
+    """Страница профиля: лента автора, его счётчики, кнопка подписки."""
+    row = (
+        User.objects.filter(username=username)
+        .annotate(
+            is_following=Exists(Follow.objects.filter(
+                author=OuterRef('pk'), user_id=request.user.pk)),
+            # название группы выводится у каждого поста ленты
+            groups_updated=Subquery(
+                Group.objects.order_by('-updated').values('updated')[:1]),
+        )
+        .values_list(
+            'pk', 'first_name', 'last_name', 'stats__feed_updated',
+            'stats__posts_count', 'stats__followers_count',
+            'stats__following_count', 'is_following', 'groups_updated')
+        .first()
+    )
+    if row is None:
+        return None
+    return make_etag('profile', *row, request.user.pk), None
+
+
+def group_resource(group_id, representation=''):
+    """api/v1/groups/<id>/."""
+    group_id = _pk(group_id)
+    if group_id is None:
+        return None
+    updated = (Group.objects.filter(pk=group_id)
+               .values_list('updated', flat=True).first())
+    if updated is None:
+        return None
+    return make_etag('group', group_id, updated, representation), updated
+
+
+def group_list(representation=''):
+    """api/v1/groups/: число групп ловит удаление, время - изменения."""
+    summary = Group.objects.aggregate(count=Count('id'),
+                                      updated=Max('updated'))
+    return (
+        make_etag('groups', summary['count'], summary['updated'],
+                  representation),
+        summary['updated'],
+    )
@@ -0,0 +1,79 @@
+"""Потоковая выгрузка постов в NDJSON и CSV.
+
+Посты читаются с сервера пачками (.iterator(chunk_size=...), на PostgreSQL -
+серверный курсор) и сразу превращаются в строки, поэтому память не
+зависит от размера таблицы. Используется API (api/api_view.py)
+и командой manage.py export_posts.
+"""
+import csv
+import json
+
+from .models import Post
+
+EXPORT_FORMATS = ('ndjson', 'csv')
+CONTENT_TYPES = {
+    'ndjson': 'application/x-ndjson; charset=utf-8',
+    'csv': 'text/csv; charset=utf-8',
+}
+CSV_FIELDS = ['id', 'title', 'anons', 'text', 'publication_date',
+              'group', 'author', 'tags']
+CHUNK_SIZE = 2000
+
+
+def iter_posts(queryset=None, chunk_size=CHUNK_SIZE):
+    """Отдаёт посты по одному в виде словарей.
+
+    Сортировка по id (первичный ключ) вместо -pub_date из Meta, чтобы
+    БД не сортировала всю таблицу перед выдачей первой строки.
+    """
+    if queryset is None:
+        queryset = Post.objects.all()
+    posts = queryset.with_related().order_by('id').iterator(
+        chunk_size=chunk_size)
+    for post in posts:
+        yield {
+            'id': post.id,
+            'title': post.title,
+            'anons': post.anons,
+            'text': post.text,
+            'publication_date': post.pub_date.isoformat(),
+            'group': post.group.slug if post.group else None,
+            'author': post.author.username,
+            # тэги уже в кэше prefetch_related, .all() не делает запроса
+            'tags': [tag.name for tag in post.tag.all()],
+        }
+
+
+def ndjson_lines(rows):
+    """Строки NDJSON: один JSON-объект на строку."""
+    for row in rows:
+        yield json.dumps(row, ensure_ascii=False) + '\n'
+
+
+class _Echo:
+    """Файлоподобный объект: write() просто возвращает строку.
+
+    Позволяет csv.writer отдавать строки по одной, ничего не копя.
+    """
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(rows):
+    """Строки CSV с заголовком; тэги через запятую."""
+    writer = csv.writer(_Echo())
+    yield writer.writerow(CSV_FIELDS)
+    for row in rows:
+        row = dict(row, tags=','.join(row['tags']))
+        yield writer.writerow([
+            '' if row[field] is None else row[field] for field in CSV_FIELDS
+        ])
+
+
+def export_lines(export_format, queryset=None, chunk_size=CHUNK_SIZE):
+    """Строки выгрузки в нужном формате."""
+    rows = iter_posts(queryset, chunk_size=chunk_size)
+    if export_format == 'csv':
+        return csv_lines(rows)
+    return ndjson_lines(rows)
@@ -0,0 +1,484 @@
+"""Массовая загрузка пользователей, групп, тэгов, постов, комментариев
+и подписок из JSONL и CSV.
+
+Строки читаются пачками (BATCH_SIZE) и пишутся одной вставкой на пачку:
+на PostgreSQL - через COPY во временную таблицу и INSERT ... ON CONFLICT
+DO NOTHING, на остальных БД - через executemany одного INSERT с
+игнорированием конфликтов. Компилятор запросов ORM (bulk_create) не
+используется: на сотнях тысяч строк в секунду его разбор каждого
+значения обходится дороже самой вставки. Сигналы не срабатывают, поэтому то, что обычно делают они
+(поисковые документы, ленты подписок, счётчики UserStats), загрузка
+делает сама: документы и ленты - по ходу, пачками, счётчики - одним
+пересчётом в конце (finish()).
+
+Формат строк совпадает с выгрузкой posts/export.py, так что выгрузку
+export_posts можно загрузить обратно. Ссылки - по натуральным ключам:
+автор и подписчик - username, группа - slug, тэги - названия (списком
+или через запятую), пост у комментария - id.
+
+Запуск: python manage.py import_data --users users.csv --posts posts.jsonl
+"""
+import contextlib
+import csv
+import datetime
+import io
+import json
+import os
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.color import no_style
+from django.db import connection, connections, transaction
+from django.db.models import Max
+from django.db.models.constants import OnConflict
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from core.cache.generations import bump_generation
+
+from . import search, stats, timeline
+from .models import (Comment, Follow, Group, Post, PostSearchDocument, Tag,
+                     TagPost)
+from .tags import resolve_tags
+
+User = get_user_model()
+
+# Порядок загрузки: каждый вид ссылается только на предыдущие
+IMPORT_KINDS = ('users', 'groups', 'tags', 'posts', 'comments', 'follows')
+FILE_FORMATS = ('jsonl', 'csv')
+BATCH_SIZE = 10_000
+# Сколько ключей искать одним запросом: старые сборки SQLite
+# не принимают больше 999 параметров
+LOOKUP_CHUNK = 900
+# Пароль, под которым нельзя войти. Хэшировать пароли при загрузке
+# слишком долго (сотни миллисекунд на каждый), поэтому поле password
+# во входных данных должно быть уже хэшем, как в dumpdata
+UNUSABLE_PASSWORD = '!'
+COPY_NULL = r'\N'
+
+
+def detect_format(path):
+    """Формат файла по расширению: .jsonl/.ndjson или .csv."""
+    extension = os.path.splitext(path)[1].lower().lstrip('.')
+    if extension in ('jsonl', 'ndjson'):
+        return 'jsonl'
+    if extension == 'csv':
+        return 'csv'
+    raise ValueError(f'Не удалось определить формат файла {path}')
+
+
+def read_rows(path, file_format=None):
+    """Читает строки файла по одной в виде словарей."""
+    file_format = file_format or detect_format(path)
+    with open(path, encoding='utf-8', newline='') as file:
+        if file_format == 'csv':
+            yield from csv.DictReader(file)
+            return
+        for line in file:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def parse_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_tags(value):
+    """Тэги списком или строкой через запятую, без повторов."""
+    if not value:
+        return []
+    if isinstance(value, str):
+        value = value.split(',')
+    return list(dict.fromkeys(
+        name.strip() for name in value if name and name.strip()))
+
+
+@contextlib.contextmanager
+def deferred_indexes(models):
+    """Снимает индексы Meta.indexes на время загрузки и строит заново.
+
+    Один CREATE INDEX по заполненной таблице быстрее, чем обновлять
+    индекс на каждой вставке. Уникальные ограничения и первичные ключи
+    остаются: на них держится ON CONFLICT. Внешние ключи Django
+    на PostgreSQL и так создаёт DEFERRABLE INITIALLY DEFERRED - они
+    проверяются один раз при коммите пачки.
+    """
+    if not models:
+        yield
+        return
+    dropped = []
+    with connection.schema_editor() as editor:
+        for model in models:
+            for index in model._meta.indexes:
+                editor.remove_index(model, index)
+                dropped.append((model, index))
+    try:
+        yield
+    finally:
+        with connection.schema_editor() as editor:
+            for model, index in dropped:
+                editor.add_index(model, index)
+
+
+def existing_values(model, values, field='id'):
+    """Какие из values есть в столбце field таблицы model."""
+    values = list({value for value in values if value is not None})
+    found = set()
+    for start in range(0, len(values), LOOKUP_CHUNK):
+        found.update(model.objects.filter(
+            **{f'{field}__in': values[start:start + LOOKUP_CHUNK]}
+        ).order_by().values_list(field, flat=True))
+    return found
+
+
+class KeyMap:
+    """Натуральный ключ (username, slug, название тэга) -> id.
+
+    Ключи, которых ещё нет в словаре, достаются одним запросом
+    на пачку и запоминаются до конца загрузки.
+    """
+
+    def __init__(self, model, field):
+        self.model = model
+        self.field = field
+        self.ids = {}
+
+    def load(self, values):
+        missing = list({
+            value for value in values if value and value not in self.ids})
+        for start in range(0, len(missing), LOOKUP_CHUNK):
+            rows = (
+                self.model.objects
+                .filter(**{f'{self.field}__in':
+                           missing[start:start + LOOKUP_CHUNK]})
+                .values_list(self.field, 'id')
+            )
+            self.ids.update(rows)
+
+    def get(self, value):
+        return self.ids.get(value)
+
+
+def _copy_value(value):
+    if value is None:
+        return COPY_NULL
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False)
+    if isinstance(value, datetime.datetime):
+        return value.isoformat()
+    return value
+
+
+def _columns(model, objects):
+    # id передаётся, только если он задан у объектов пачки
+    with_pk = objects[0].pk is not None
+    return [field for field in model._meta.concrete_fields
+            if with_pk or not field.primary_key]
+
+
+def copy_objects(model, objects):
+    """Пишет объекты через COPY (только PostgreSQL).
+
+    COPY не умеет ON CONFLICT, поэтому строки сначала копируются
+    во временную таблицу без ограничений и переносятся из неё одним
+    INSERT ... SELECT. Вызывается внутри транзакции: временная
+    таблица удаляется при коммите. Возвращает число вставленных
+    строк - без пропущенных из-за конфликтов.
+    """
+    quote = connection.ops.quote_name
+    fields = _columns(model, objects)
+    columns = ', '.join(quote(field.column) for field in fields)
+    table = quote(model._meta.db_table)
+    staging = quote(f'import_{model._meta.db_table}')
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for obj in objects:
+        writer.writerow([
+            _copy_value(field.get_prep_value(getattr(obj, field.attname)))
+            for field in fields
+        ])
+    buffer.seek(0)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'CREATE TEMP TABLE {staging} ON COMMIT DROP AS '
+            f'SELECT {columns} FROM {table} WITH NO DATA')
+        cursor.copy_expert(
+            f"COPY {staging} ({columns}) FROM STDIN "
+            f"WITH (FORMAT csv, NULL '{COPY_NULL}')", buffer)
+        cursor.execute(
+            f'INSERT INTO {table} ({columns}) SELECT {columns} '
+            f'FROM {staging} ON CONFLICT DO NOTHING')
+        return cursor.rowcount
+
+
+def insert_objects(model, objects):
+    """Пишет объекты одним executemany с игнорированием конфликтов.
+
+    Значения готовит сам столбец (get_db_prep_save), как и в
+    bulk_create, но без pre_save: даты, в том числе auto_now,
+    проставляются явно при создании объектов. Возвращает число
+    вставленных строк: rowcount executemany - сумма по всем строкам.
+    """
+    # настоящее подключение, а не прокси: к нему обращаемся
+    # на каждое значение
+    db = connections[connection.alias]
+    quote = db.ops.quote_name
+    fields = _columns(model, objects)
+    sql = '{} {} ({}) VALUES ({}) {}'.format(
+        db.ops.insert_statement(on_conflict=OnConflict.IGNORE),
+        quote(model._meta.db_table),
+        ', '.join(quote(field.column) for field in fields),
+        ', '.join(['%s'] * len(fields)),
+        db.ops.on_conflict_suffix_sql(fields, OnConflict.IGNORE, None, None),
+    ).rstrip()
+    rows = [
+        [field.get_db_prep_save(getattr(obj, field.attname), db)
+         for field in fields]
+        for obj in objects
+    ]
+    with db.cursor() as cursor:
+        cursor.executemany(sql, rows)
+        return cursor.rowcount
+
+
+def allocate_ids(model, count, above=0):
+    """Заранее выдаёт id для count новых строк, все больше above.
+
+    Id постов нужны до вставки: по ним пишутся связи с тэгами и
+    поисковые документы, а ни COPY, ни INSERT с игнорированием
+    конфликтов id не возвращают. above - наибольший явный id из той же пачки.
+    """
+    if connection.vendor == 'postgresql':
+        table = model._meta.db_table
+        with connection.cursor() as cursor:
+            if above:
+                cursor.execute(
+                    "SELECT setval(pg_get_serial_sequence(%s, 'id'), "
+                    "GREATEST(%s, nextval(pg_get_serial_sequence(%s, 'id'))))",
+                    [table, above, table])
+            cursor.execute(
+                "SELECT nextval(pg_get_serial_sequence(%s, 'id')) "
+                "FROM generate_series(1, %s)",
+                [table, count])
+            return [row[0] for row in cursor.fetchall()]
+    # SQLite: загрузка идёт в одну транзакцию на пачку, а запись
+    # в SQLite и так последовательная
+    last = max(model.objects.aggregate(last=Max('id'))['last'] or 0, above)
+    return list(range(last + 1, last + 1 + count))
+
+
+class Importer:
+    """Загружает файлы по видам и ведёт счёт строк.
+
+    use_copy=None - COPY там, где он есть (PostgreSQL).
+    timelines=False отключает пополнение лент подписок - его стоит
+    отключать, если ленты потом всё равно будут пересобраны.
+    """
+
+    def __init__(self, batch_size=BATCH_SIZE, use_copy=None, timelines=True,
+                 progress=None):
+        self.batch_size = batch_size
+        self.use_copy = (connection.vendor == 'postgresql'
+                         if use_copy is None else use_copy)
+        self.timelines = timelines
+        self.progress = progress
+        self.now = timezone.now()
+        self.users = KeyMap(User, 'username')
+        self.groups = KeyMap(Group, 'slug')
+        self.tags = KeyMap(Tag, 'name')
+        self.imported = dict.fromkeys(IMPORT_KINDS, 0)
+        self.skipped = dict.fromkeys(IMPORT_KINDS, 0)
+        self.models = set()
+
+    def import_file(self, kind, path, file_format=None):
+        """Загружает файл одного вида, возвращает число записанных строк."""
+        handler = getattr(self, f'_import_{kind}')
+        started = time.perf_counter()
+        batch = []
+        for row in read_rows(path, file_format):
+            batch.append(row)
+            if len(batch) >= self.batch_size:
+                self._flush(kind, handler, batch, started)
+                batch = []
+        if batch:
+            self._flush(kind, handler, batch, started)
+        return self.imported[kind]
+
+    def _flush(self, kind, handler, rows, started):
+        # транзакция на пачку: при ошибке теряется только она,
+        # а прогресс до неё уже сохранён
+        with transaction.atomic():
+            written = handler(rows)
+        self.imported[kind] += written
+        self.skipped[kind] += len(rows) - written
+        if self.progress is not None:
+            elapsed = time.perf_counter() - started
+            self.progress(kind, self.imported[kind],
+                          self.imported[kind] / elapsed if elapsed else 0)
+
+    def _write(self, model, objects):
+        """Пишет объекты, возвращает число действительно вставленных."""
+        if not objects:
+            return 0
+        self.models.add(model)
+        if self.use_copy:
+            return copy_objects(model, objects)
+        return insert_objects(model, objects)
+
+    def _date(self, value):
+        if isinstance(value, datetime.datetime):
+            parsed = value
+        else:
+            parsed = parse_datetime(value) if value else None
+        if parsed is None:
+            return self.now
+        if timezone.is_naive(parsed):
+            parsed = timezone.make_aware(parsed)
+        return parsed
+
+    def _ensure_tags(self, names):
+        """Создаёт тэги, которых ещё нет, и запоминает id всех."""
+        self.tags.load(names)
+        missing = [name for name in dict.fromkeys(names)
+                   if self.tags.get(name) is None]
+        if missing:
+            self.tags.ids.update(resolve_tags(missing))
+            self.models.add(Tag)
+        return len(missing)
+
+    def _import_users(self, rows):
+        users = [
+            User(
+                username=row['username'],
+                email=row.get('email') or '',
+                first_name=row.get('first_name') or '',
+                last_name=row.get('last_name') or '',
+                password=row.get('password') or UNUSABLE_PASSWORD,
+                date_joined=self._date(row.get('date_joined')),
+            )
+            for row in rows if row.get('username')
+        ]
+        return self._write(User, users)
+
+    def _import_groups(self, rows):
+        groups = [
+            Group(slug=row['slug'], title=row.get('title') or row['slug'],
+                  description=row.get('description') or '',
+                  updated=self.now)
+            for row in rows if row.get('slug')
+        ]
+        return self._write(Group, groups)
+
+    def _import_tags(self, rows):
+        names = [row['name'].strip() for row in rows
+                 if (row.get('name') or '').strip()]
+        return self._ensure_tags(names)
+
+    def _import_posts(self, rows):
+        self.users.load(row.get('author') for row in rows)
+        self.groups.load(row.get('group') for row in rows)
+        valid = [
+            row for row in rows
+            if self.users.get(row.get('author')) is not None
+            and row.get('title') and row.get('text')
+        ]
+        # посты с id, который уже занят, пропускаем: иначе их тэги
+        # и документы достались бы чужому посту
+        taken = existing_values(
+            Post, (parse_int(row.get('id')) for row in valid))
+        valid = [row for row in valid if parse_int(row.get('id')) not in taken]
+        explicit = [parse_int(row.get('id')) for row in valid]
+        new_ids = iter(allocate_ids(
+            Post, explicit.count(None),
+            above=max(filter(None, explicit), default=0)))
+        posts, tag_names = [], []
+        for row, post_id in zip(valid, explicit):
+            posts.append(Post(
+                id=post_id if post_id is not None else next(new_ids),
+                title=row['title'],
+                anons=row.get('anons') or '',
+                text=row['text'],
+                pub_date=self._date(
+                    row.get('publication_date') or row.get('pub_date')),
+                updated=self.now,
+                group_id=self.groups.get(row.get('group')),
+                author_id=self.users.get(row['author']),
+            ))
+            tag_names.append(parse_tags(row.get('tags')))
+        written = self._write(Post, posts)
+        self._ensure_tags([name for names in tag_names for name in names])
+        self._write(TagPost, [
+            TagPost(post_id=post.id, tag_id=self.tags.get(name))
+            for post, names in zip(posts, tag_names) for name in names
+        ])
+        self._write(PostSearchDocument, [
+            search.make_document(post, names)
+            for post, names in zip(posts, tag_names)
+        ])
+        if self.timelines:
+            # раскладываем по лентам только посты авторов, у которых
+            # уже есть подписчики; на пустой базе это ноль запросов
+            followed = existing_values(
+                Follow, {post.author_id for post in posts}, 'author_id')
+            by_author = {}
+            for post in posts:
+                if post.author_id in followed:
+                    by_author.setdefault(post.author_id, []).append(post.id)
+            for author_id, post_ids in by_author.items():
+                timeline.fan_out_posts(author_id, post_ids)
+        return written
+
+    def _import_comments(self, rows):
+        self.users.load(row.get('author') for row in rows)
+        posts = existing_values(Post, (parse_int(row.get('post'))
+                                       for row in rows))
+        comments = [
+            Comment(
+                post_id=parse_int(row.get('post')),
+                author_id=self.users.get(row.get('author')),
+                text=row['text'],
+                created=self._date(row.get('created')),
+            )
+            for row in rows
+            if parse_int(row.get('post')) in posts
+            and self.users.get(row.get('author')) is not None
+            and row.get('text')
+        ]
+        return self._write(Comment, comments)
+
+    def _import_follows(self, rows):
+        self.users.load(row.get(field) for row in rows
+                        for field in ('user', 'author'))
+        pairs = dict.fromkeys(
+            (self.users.get(row.get('user')), self.users.get(row.get('author')))
+            for row in rows
+        )
+        pairs = [(user_id, author_id) for user_id, author_id in pairs
+                 if user_id is not None and author_id is not None
+                 and user_id != author_id]
+        written = self._write(
+            Follow, [Follow(user_id=user_id, author_id=author_id)
+                     for user_id, author_id in pairs])
+        if self.timelines:
+            for user_id, author_id in pairs:
+                timeline.backfill(user_id, author_id)
+        return written
+
+    def finish(self):
+        """Доводит базу до состояния, как после обычных сохранений."""
+        # строки с явными id не двигают последовательности PostgreSQL
+        statements = connection.ops.sequence_reset_sql(
+            no_style(), list(self.models))
+        if statements:
+            with connection.cursor() as cursor:
+                for sql in statements:
+                    cursor.execute(sql)
+        stats.recount_all()
+        stats.recount_comments_all()
+        bump_generation('posts')
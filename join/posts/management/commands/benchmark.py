@@ -0,0 +1,72 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.benchmark import compare, run
+
+
+class Command(BaseCommand):
+    """Замеры задержек и пропускной способности страниц и API.
+
+    Данные готовит seed_benchmark. Результат пишется в JSON (--output),
+    а --compare сравнивает его с прошлым прогоном, например с
+    результатом на предыдущем коммите:
+
+        python manage.py benchmark --output bench/new.json \\
+            --compare bench/old.json
+    """
+    help = 'Меряет p50/p95/p99 и пропускную способность эндпоинтов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests', type=int, default=200,
+            help='Сколько запросов к каждому эндпоинту')
+        parser.add_argument(
+            '--warmup', type=int, default=10,
+            help='Сколько запросов сделать до замера')
+        parser.add_argument(
+            '--endpoints', nargs='+', default=None,
+            help='Имена замеров, например posts:index api:post-list')
+        parser.add_argument(
+            '--cold', action='store_true',
+            help='Сбрасывать кэш страниц перед каждым запросом')
+        parser.add_argument(
+            '--seed', type=int, default=0,
+            help='Зерно генератора адресов')
+        parser.add_argument(
+            '--output', default=None,
+            help='Куда сохранить результат в JSON')
+        parser.add_argument(
+            '--compare', default=None,
+            help='JSON прошлого прогона для сравнения')
+        parser.add_argument(
+            '--fail-on-regression', action='store_true',
+            help='Завершиться с ошибкой, если p95 вырос больше чем на 10%%')
+
+    def handle(self, *args, **options):
+        try:
+            report = run(
+                requests=options['requests'],
+                warmup=options['warmup'],
+                names=options['endpoints'],
+                random_seed=options['seed'],
+                cold=options['cold'],
+                progress=lambda name, result: self.stderr.write(
+                    f'{name}: p50 {result["p50_ms"]} мс, '
+                    f'p95 {result["p95_ms"]} мс, p99 {result["p99_ms"]} мс, '
+                    f'{result["throughput_rps"]} запросов/с')
+            )
+        except KeyError as error:
+            raise CommandError(f'Неизвестный эндпоинт: {error}')
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump(report, file, ensure_ascii=False, indent=2)
+        else:
+            self.stdout.write(json.dumps(report, ensure_ascii=False, indent=2))
+        if options['compare']:
+            with open(options['compare'], encoding='utf-8') as file:
+                lines, regressions = compare(json.load(file), report)
+            for line in lines:
+                self.stderr.write(line)
+            if regressions and options['fail_on_regression']:
+                raise CommandError(f'Регрессий: {regressions}')
@@ -0,0 +1,66 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.benchmark import cases, run, run_renderers
+
+
+class Command(BaseCommand):
+    """Сравнивает ModelSerializer и сериализацию строк .values()
+    (api/rows.py) на списках постов, комментариев, групп и подписок.
+
+    С --renderers вместо этого сравнивает JSON-рендерер и парсер DRF
+    с orjson (api/renderers.py) на странице постов.
+
+    Данные готовит seed_benchmark. Завершается с ошибкой, если ответы
+    двух способов различаются.
+    """
+    help = 'Меряет скорость сериализации списков API двумя способами'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--limit', type=int, default=500,
+            help='Сколько записей сериализовать за раз')
+        parser.add_argument(
+            '--rounds', type=int, default=5,
+            help='Сколько прогонов, берётся лучший')
+        parser.add_argument(
+            '--models', nargs='+', default=None, choices=list(cases()),
+            help='Какие списки мерить')
+        parser.add_argument(
+            '--renderers', action='store_true',
+            help='Мерить рендер и разбор JSON, а не сериализаторы')
+
+    def handle(self, *args, **options):
+        if options['renderers']:
+            return self.handle_renderers(options)
+        results = run(
+            limit=options['limit'],
+            rounds=options['rounds'],
+            names=options['models'],
+            progress=lambda name, result: self.stderr.write(
+                f'{name}: {result["rows"]} строк, ModelSerializer '
+                f'{result["model_ms"]} мс, .values() {result["rows_ms"]} мс, '
+                f'x{result["speedup"]}')
+        )
+        self.stdout.write(json.dumps(results, ensure_ascii=False, indent=2))
+        different = [name for name, result in results.items()
+                     if not result['identical']]
+        if different:
+            raise CommandError(f'Ответы различаются: {", ".join(different)}')
+
+    def handle_renderers(self, options):
+        result = run_renderers(
+            limit=options['limit'], rounds=options['rounds'])
+        if not result['orjson_installed']:
+            self.stderr.write('orjson не установлен: оба способа - stdlib json')
+        for name in ('render', 'parse'):
+            self.stderr.write(
+                f'{name}: json {result[name]["json_ms"]} мс, '
+                f'orjson {result[name]["orjson_ms"]} мс, '
+                f'x{result[name]["speedup"]}')
+        self.stdout.write(json.dumps(result, ensure_ascii=False, indent=2))
+        different = [name for name in ('render', 'parse')
+                     if not result[name]['identical']]
+        if different:
+            raise CommandError(f'Результаты различаются: {", ".join(different)}')
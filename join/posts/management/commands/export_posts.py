@@ -0,0 +1,46 @@
+
+from django.core.management.base import BaseCommand
+
+from posts.export import CHUNK_SIZE, EXPORT_FORMATS, export_lines
+
+
+class Command(BaseCommand):
+    """Выгружает все посты с авторами, группами и тэгами.
+
+    Пример:
+        python manage.py export_posts --format csv --output posts.csv
+    """
+    help = 'Потоковая выгрузка постов в NDJSON или CSV'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--format', choices=EXPORT_FORMATS, default='ndjson',
+            help='Формат выгрузки (по умолчанию ndjson)')
+        parser.add_argument(
+            '--output', default='-',
+            help='Файл для выгрузки, "-" - стандартный вывод')
+        parser.add_argument(
+            '--chunk-size', type=int, default=CHUNK_SIZE,
+            help='Сколько постов читать из БД за раз')
+
+    def handle(self, *args, **options):
+        lines = export_lines(options['format'],
+                             chunk_size=options['chunk_size'])
+        if options['output'] == '-':
+            self.write_lines(lines, self.stdout)
+            return
+        # newline='' - переводы строк CSV уже расставил csv.writer
+        with open(options['output'], 'w', encoding='utf-8',
+                  newline='') as output:
+            count = self.write_lines(lines, output)
+        self.stderr.write(f'Выгружено строк: {count}')
+
+    def write_lines(self, lines, output):
+        count = 0
+        for line in lines:
+            if output is self.stdout:
+                output.write(line, ending='')
+            else:
+                output.write(line)
+            count += 1
+        return count
@@ -0,0 +1,44 @@
+from concurrent.futures import as_completed
+
+from django.core.management.base import BaseCommand
+
+from core.jobs.queue import enqueue
+from posts.models import Post
+from posts.thumbnails import generate_post_thumbnails, needs_thumbnails
+
+
+class Command(BaseCommand):
+    """Строит миниатюры для постов, у которых их ещё нет.
+
+    Нужна один раз после добавления Post.thumbnails, а с --all - после
+    изменения CARD_WIDTHS или IMAGE_FORMATS. Задачи идут через ту же
+    очередь, что и при сохранении поста, поэтому картинки
+    обрабатываются параллельно в JOB_QUEUE_WORKERS процессах.
+
+    Пример:
+        python manage.py generate_thumbnails --all
+    """
+    help = 'Строит миниатюры картинок постов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Перестроить миниатюры у всех постов с картинками')
+
+    def handle(self, *args, **options):
+        posts = (
+            Post.objects.exclude(image='')
+            .only('image', 'thumbnails').order_by('id')
+            .iterator(chunk_size=1000)
+        )
+        futures = [
+            enqueue(generate_post_thumbnails, post.pk)
+            for post in posts
+            if options['all'] or needs_thumbnails(post)
+        ]
+        failed = 0
+        for future in as_completed(futures):
+            if future.exception() is not None:
+                failed += 1
+        self.stdout.write(
+            f'Обработано постов: {len(futures)}, с ошибкой: {failed}')
@@ -0,0 +1,64 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.importer import (BATCH_SIZE, FILE_FORMATS, IMPORT_KINDS, Importer,
+                            deferred_indexes)
+from posts.models import Comment, Follow, Post
+
+
+class Command(BaseCommand):
+    """Массовая загрузка данных из JSONL или CSV.
+
+    Файлы загружаются в порядке IMPORT_KINDS, независимо от порядка
+    в командной строке. Пример:
+        python manage.py import_data --users users.csv \\
+            --posts posts.jsonl --comments comments.jsonl --defer-indexes
+    """
+    help = 'Загружает пользователей, группы, тэги, посты, комментарии и подписки'
+
+    def add_arguments(self, parser):
+        for kind in IMPORT_KINDS:
+            parser.add_argument(
+                f'--{kind}', metavar='FILE', default=None,
+                help=f'Файл .jsonl или .csv ({kind})')
+        parser.add_argument(
+            '--format', choices=FILE_FORMATS, default=None,
+            help='Формат всех файлов, если его не видно по расширению')
+        parser.add_argument(
+            '--batch-size', type=int, default=BATCH_SIZE,
+            help='Сколько строк писать одной вставкой')
+        parser.add_argument(
+            '--no-copy', action='store_true',
+            help='INSERT через executemany вместо COPY даже на PostgreSQL')
+        parser.add_argument(
+            '--defer-indexes', action='store_true',
+            help='Снять индексы лент на время загрузки и построить в конце')
+        parser.add_argument(
+            '--no-timelines', action='store_true',
+            help='Не пополнять ленты подписок')
+
+    def handle(self, *args, **options):
+        files = [(kind, options[kind]) for kind in IMPORT_KINDS
+                 if options[kind]]
+        if not files:
+            raise CommandError('Не указано ни одного файла')
+        importer = Importer(
+            batch_size=options['batch_size'],
+            use_copy=False if options['no_copy'] else None,
+            timelines=not options['no_timelines'],
+            progress=lambda kind, done, rate: self.stderr.write(
+                f'{kind}: {done} ({rate:.0f} строк/с)')
+        )
+        # индексы снимаем только у больших таблиц с индексами лент
+        models = (Post, Comment, Follow) if options['defer_indexes'] else ()
+        try:
+            with deferred_indexes(models):
+                for kind, path in files:
+                    importer.import_file(kind, path, options['format'])
+        except (OSError, ValueError) as error:
+            raise CommandError(error)
+        importer.finish()
+        for kind, path in files:
+            self.stdout.write(
+                f'{kind}: загружено {importer.imported[kind]}, '
+                f'пропущено {importer.skipped[kind]}')
+        self.stdout.write(self.style.SUCCESS('Готово'))
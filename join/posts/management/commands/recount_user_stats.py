@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+
+from posts import timeline
+from posts.stats import recount_all, recount_comments_all
+
+
+class Command(BaseCommand):
+    """Пересчитывает счётчики постов, комментариев и подписок,
+    а также число комментариев каждого поста, и раскладывает по лентам
+    посты бывших «звёзд» (posts/timeline.py).
+
+    Нужна после массовой загрузки данных в обход сигналов
+    (bulk_create, COPY) или если счётчики разошлись с реальностью.
+    """
+    help = ('Пересчитывает денормализованные счётчики UserStats '
+            'и Post.comments_count')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=10000,
+            help='Сколько пользователей (постов) пересчитывать '
+                 'за одну транзакцию')
+
+    def handle(self, *args, **options):
+        total = recount_all(
+            batch_size=options['batch_size'],
+            progress=lambda done: self.stderr.write(
+                f'Пересчитано пользователей: {done}')
+        )
+        posts = recount_comments_all(
+            batch_size=options['batch_size'],
+            progress=lambda done: self.stderr.write(
+                f'Пересчитано постов: {done}')
+        )
+        authors = timeline.catch_up_pending()
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово, пересчитано пользователей: {total}, постов: {posts}, '
+            f'разложено лент авторов: {authors}'))
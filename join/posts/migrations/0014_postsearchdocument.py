@@ -0,0 +1,129 @@
+# Generated by Django 5.0.2 on 2026-10-18 15:59
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+POSTGRES_SQL = [
+    # Вектор считается самой БД из полей документа: заголовок важнее тэгов,
+    # тэги важнее текста
+    """
+    ALTER TABLE posts_postsearchdocument ADD COLUMN vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('russian', coalesce(title, '')), 'A')
+        || setweight(to_tsvector('russian', coalesce(tags, '')), 'B')
+        || setweight(to_tsvector('russian', coalesce(body, '')), 'C')
+    ) STORED
+    """,
+    'CREATE INDEX posts_postsearch_vector_idx '
+    'ON posts_postsearchdocument USING gin (vector)',
+]
+
+POSTGRES_REVERSE_SQL = [
+    'DROP INDEX IF EXISTS posts_postsearch_vector_idx',
+    'ALTER TABLE posts_postsearchdocument DROP COLUMN IF EXISTS vector',
+]
+
+# На SQLite - внешняя (external content) таблица FTS5, которую
+# триггеры держат в согласии с таблицей документов
+SQLITE_SQL = [
+    """
+    CREATE VIRTUAL TABLE posts_postsearch_fts USING fts5(
+        title, body, tags,
+        content='posts_postsearchdocument', content_rowid='post_id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER posts_postsearch_ai AFTER INSERT ON posts_postsearchdocument
+    BEGIN
+        INSERT INTO posts_postsearch_fts(rowid, title, body, tags)
+        VALUES (new.post_id, new.title, new.body, new.tags);
+    END
+    """,
+    """
+    CREATE TRIGGER posts_postsearch_ad AFTER DELETE ON posts_postsearchdocument
+    BEGIN
+        INSERT INTO posts_postsearch_fts(posts_postsearch_fts, rowid, title, body, tags)
+        VALUES ('delete', old.post_id, old.title, old.body, old.tags);
+    END
+    """,
+    """
+    CREATE TRIGGER posts_postsearch_au AFTER UPDATE ON posts_postsearchdocument
+    BEGIN
+        INSERT INTO posts_postsearch_fts(posts_postsearch_fts, rowid, title, body, tags)
+        VALUES ('delete', old.post_id, old.title, old.body, old.tags);
+        INSERT INTO posts_postsearch_fts(rowid, title, body, tags)
+        VALUES (new.post_id, new.title, new.body, new.tags);
+    END
+    """,
+]
+
+SQLITE_REVERSE_SQL = [
+    'DROP TRIGGER IF EXISTS posts_postsearch_au',
+    'DROP TRIGGER IF EXISTS posts_postsearch_ad',
+    'DROP TRIGGER IF EXISTS posts_postsearch_ai',
+    'DROP TABLE IF EXISTS posts_postsearch_fts',
+]
+
+
+def run_vendor_sql(statements):
+    """Выполняет SQL только на той БД, для которой он написан."""
+    def run(apps, schema_editor):
+        sql = statements.get(schema_editor.connection.vendor, [])
+        for statement in sql:
+            schema_editor.execute(statement)
+    return run
+
+
+def fill_documents(apps, schema_editor):
+    """Собирает поисковые документы для уже существующих постов."""
+    Post = apps.get_model('posts', 'Post')
+    TagPost = apps.get_model('posts', 'TagPost')
+    PostSearchDocument = apps.get_model('posts', 'PostSearchDocument')
+    tags = {}
+    for post_id, name in TagPost.objects.values_list('post_id', 'tag__name'):
+        tags.setdefault(post_id, []).append(name)
+    documents = []
+    for post in Post.objects.only('id', 'title', 'anons', 'text').iterator(
+            chunk_size=1000):
+        documents.append(PostSearchDocument(
+            post_id=post.id,
+            title=post.title,
+            body='\n'.join(part for part in (post.anons, post.text) if part),
+            tags=' '.join(tags.get(post.id, [])),
+        ))
+        if len(documents) >= 1000:
+            PostSearchDocument.objects.bulk_create(documents)
+            documents = []
+    if documents:
+        PostSearchDocument.objects.bulk_create(documents)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0013_timelineentry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostSearchDocument',
+            fields=[
+                ('post', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_document', serialize=False, to='posts.post', verbose_name='Пост')),
+                ('title', models.TextField(verbose_name='Заголовок')),
+                ('body', models.TextField(verbose_name='Текст')),
+                ('tags', models.TextField(blank=True, verbose_name='Тэги')),
+            ],
+            options={
+                'verbose_name': 'Поисковый документ',
+                'verbose_name_plural': 'Поисковые документы',
+            },
+        ),
+        migrations.RunPython(
+            run_vendor_sql({'postgresql': POSTGRES_SQL,
+                            'sqlite': SQLITE_SQL}),
+            run_vendor_sql({'postgresql': POSTGRES_REVERSE_SQL,
+                            'sqlite': SQLITE_REVERSE_SQL}),
+        ),
+        migrations.RunPython(fill_documents, migrations.RunPython.noop),
+    ]
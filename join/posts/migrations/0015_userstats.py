@@ -0,0 +1,63 @@
+# Generated by Django 5.0.2 on 2026-10-18 16:04
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_stats(apps, schema_editor):
+    """Считает счётчики для уже существующих пользователей."""
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+    Follow = apps.get_model('posts', 'Follow')
+    UserStats = apps.get_model('posts', 'UserStats')
+
+    def count(model, field):
+        counted = (
+            model.objects.filter(**{field: OuterRef('user_id')})
+            .order_by().values(field).annotate(total=Count('pk'))
+            .values('total')
+        )
+        return Coalesce(Subquery(counted, output_field=IntegerField()), 0)
+
+    UserStats.objects.bulk_create(
+        [UserStats(user_id=user_id)
+         for user_id in User.objects.values_list('id', flat=True)],
+        batch_size=1000,
+        ignore_conflicts=True
+    )
+    UserStats.objects.update(
+        posts_count=count(Post, 'author'),
+        comments_count=count(Comment, 'author'),
+        followers_count=count(Follow, 'author'),
+        following_count=count(Follow, 'user'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('posts', '0014_postsearchdocument'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+                ('posts_count', models.PositiveIntegerField(default=0, verbose_name='Постов')),
+                ('comments_count', models.PositiveIntegerField(default=0, verbose_name='Комментариев')),
+                ('followers_count', models.PositiveIntegerField(default=0, verbose_name='Подписчиков')),
+                ('following_count', models.PositiveIntegerField(default=0, verbose_name='Подписок')),
+            ],
+            options={
+                'verbose_name': 'Счётчики пользователя',
+                'verbose_name_plural': 'Счётчики пользователей',
+            },
+        ),
+        migrations.RunPython(fill_stats, migrations.RunPython.noop),
+    ]
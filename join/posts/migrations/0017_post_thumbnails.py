@@ -0,0 +1,18 @@
+# Generated by Django 5.0.2 on 2026-10-18 16:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0016_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='thumbnails',
+            field=models.JSONField(blank=True, default=dict, editable=False, verbose_name='Миниатюры'),
+        ),
+    ]
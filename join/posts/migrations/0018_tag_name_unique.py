@@ -0,0 +1,48 @@
+# Generated by Django 5.0.2 on 2026-10-18 16:28
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def merge_duplicate_tags(apps, schema_editor):
+    """Сливает тэги с одинаковым названием в самый старый.
+
+    Связи с постами переносятся на оставшийся тэг (без повторов
+    у одного поста), дубли удаляются. Поисковые документы не меняются:
+    названия тэгов те же.
+    """
+    Tag = apps.get_model('posts', 'Tag')
+    TagPost = apps.get_model('posts', 'TagPost')
+    duplicates = (
+        Tag.objects.values('name')
+        .annotate(keep=Min('id'), total=Count('id'))
+        .filter(total__gt=1)
+    )
+    for row in duplicates:
+        extra = list(Tag.objects.filter(name=row['name'])
+                     .exclude(id=row['keep']).values_list('id', flat=True))
+        tagged = TagPost.objects.filter(tag_id=row['keep']).values('post_id')
+        TagPost.objects.filter(tag_id__in=extra, post_id__in=tagged).delete()
+        TagPost.objects.filter(tag_id__in=extra).update(tag_id=row['keep'])
+        Tag.objects.filter(id__in=extra).delete()
+
+
+class Migration(migrations.Migration):
+    # слияние дублей коммитится до ALTER TABLE: на PostgreSQL нельзя
+    # менять таблицу, пока в транзакции висят отложенные проверки
+    # внешних ключей от удалённых тэгов
+    atomic = False
+
+    dependencies = [
+        ('posts', '0017_post_thumbnails'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            merge_duplicate_tags, migrations.RunPython.noop, atomic=True),
+        migrations.AlterField(
+            model_name='tag',
+            name='name',
+            field=models.CharField(max_length=50, unique=True),
+        ),
+    ]
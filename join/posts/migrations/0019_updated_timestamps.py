@@ -0,0 +1,28 @@
+# Generated by Django 5.0.2 on 2026-10-18 16:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0018_tag_name_unique'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='group',
+            name='updated',
+            field=models.DateTimeField(auto_now=True, verbose_name='Изменена'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='updated',
+            field=models.DateTimeField(auto_now=True, verbose_name='Изменён'),
+        ),
+        migrations.AddField(
+            model_name='userstats',
+            name='feed_updated',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Лента изменена'),
+        ),
+    ]
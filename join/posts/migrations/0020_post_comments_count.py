@@ -0,0 +1,34 @@
+# Generated by Django 5.0.2 on 2026-10-18 16:52
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_comments_count(apps, schema_editor):
+    """Считает комментарии уже существующих постов."""
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+    counted = (
+        Comment.objects.filter(post=OuterRef('pk'))
+        .order_by().values('post').annotate(total=Count('pk'))
+        .values('total')
+    )
+    Post.objects.update(comments_count=Coalesce(
+        Subquery(counted, output_field=IntegerField()), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0019_updated_timestamps'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='comments_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Комментариев'),
+        ),
+        migrations.RunPython(fill_comments_count, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.0.2 on 2026-10-18 17:03
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def mark_celebrities(apps, schema_editor):
+    """Посты нынешних «звёзд» по лентам не раскладывались."""
+    UserStats = apps.get_model('posts', 'UserStats')
+    UserStats.objects.filter(
+        followers_count__gt=getattr(settings, 'TIMELINE_FANOUT_LIMIT', 5000)
+    ).update(fanout_on_read=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0020_post_comments_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userstats',
+            name='fanout_on_read',
+            field=models.BooleanField(default=False, verbose_name='Посты подмешиваются при чтении'),
+        ),
+        migrations.RunPython(mark_celebrities, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.0.2 on 2026-10-18 17:12
+
+from django.db import migrations, models
+
+
+def mark_pending(apps, schema_editor):
+    """Посты, миниатюры которых не построены или устарели."""
+    Post = apps.get_model('posts', 'Post')
+    pending = [
+        post.pk
+        for post in Post.objects.exclude(image='')
+        .only('image', 'thumbnails').iterator(chunk_size=1000)
+        if (post.thumbnails or {}).get('source') != post.image.name
+    ]
+    for start in range(0, len(pending), 1000):
+        Post.objects.filter(pk__in=pending[start:start + 1000]).update(
+            thumbnails_pending=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0021_userstats_fanout_on_read'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='thumbnails_pending',
+            field=models.BooleanField(default=False, editable=False, verbose_name='Ждёт миниатюр'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(condition=models.Q(('thumbnails_pending', True)), fields=['id'], name='post_thumbnails_pending_idx'),
+        ),
+        migrations.RunPython(mark_pending, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,6 @@
-from django.db import models
+from django.db import models, router, transaction
+from django.db.models.functions import Greatest
+from django.utils import timezone
 # Для работы с моделями импортируется модуль models
 from django.contrib.auth import get_user_model
 # Для создания поля со ссылкой на модель User импортируется и эта модель:
@@ -20,7 +22,9 @@ class Tag(models.Model):
     передавать названия хештегов списком прямо в теле запроса.
     Без указания хештегов пост через API тоже должен создаваться.
     """
-    name = models.CharField(max_length=50)
+    # уникальность нужна, чтобы тэги создавались пачкой через
+    # bulk_create(ignore_conflicts=True) без гонок и дублей
+    name = models.CharField(max_length=50, unique=True)
 
     def __str__(self):
         return self.name
@@ -30,6 +34,9 @@ class Group(models.Model):
     title = models.CharField(max_length=200, verbose_name='Заголовок')
     slug = models.SlugField(max_length=200, unique=True, verbose_name='Читаемая ссылка')
     description = models.TextField(verbose_name='Описание')
+    # время последнего изменения - валидатор для ETag/Last-Modified
+    # (posts/conditional.py)
+    updated = models.DateTimeField('Изменена', auto_now=True)
 
     def __str__(self) -> str:
         return self.title
@@ -47,7 +54,50 @@ class Group(models.Model):
         super().save(*args, **kwargs)
 
 
-class Post(models.Model):
+class AtomicSaveModel(models.Model):
+    """Модель, которая сохраняется одной транзакцией вместе
+    с обработчиками post_save.
+
+    Сигналы posts/signals.py ведут по сохранениям счётчики (UserStats,
+    Post.comments_count). Без транзакции INSERT фиксируется сразу,
+    и упавший обработчик оставил бы строку без учтённого счётчика;
+    здесь откатываются оба. Удаление и так атомарно: Collector
+    удаляет и шлёт post_delete внутри транзакции.
+    """
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        using = kwargs.get('using') or router.db_for_write(
+            type(self), instance=self)
+        with transaction.atomic(using=using):
+            super().save(*args, **kwargs)
+
+
+class PostQuerySet(models.QuerySet):
+    """Набор запросов для постов."""
+
+    def with_related(self):
+        """Подтягивает автора, группу и тэги поста заранее.
+
+        Автор и группа приходят JOIN-ом в том же запросе, тэги - одним
+        дополнительным запросом через TagPost на всю страницу, поэтому
+        сериализация N постов стоит постоянное число запросов, а не 1 + 3N.
+        """
+        return self.select_related('author', 'group').prefetch_related('tag')
+
+    def touch(self, **changes):
+        """Отмечает посты изменёнными, не вызывая save() и сигналов.
+
+        Нужно, когда меняется то, что видно в посте, но хранится
+        в других таблицах: комментарии, тэги. changes - поля, которые
+        меняются тем же UPDATE (например, счётчик комментариев).
+        """
+        return self.update(updated=timezone.now(), **changes)
+
+
+class Post(AtomicSaveModel):
     title = models.CharField(
         max_length=50,
         verbose_name='Название поста',
@@ -67,6 +117,9 @@ class Post(models.Model):
     group = models.ForeignKey(
         Group,
         on_delete=models.SET_NULL,
+        # отдельный индекс по FK не нужен: его заменяет составной индекс
+        # из Meta.indexes, где это поле стоит первым
+        db_index=False,
         blank=True,
         null=True,
         related_name='posts',
@@ -77,6 +130,7 @@ class Post(models.Model):
         User,
         on_delete=models.CASCADE,
         related_name='posts',
+        db_index=False,  # индекс составной, см. Meta.indexes
         verbose_name='Автор'
         )
     # в объекте пользователя появилось поле posts,
@@ -97,11 +151,36 @@ class Post(models.Model):
     # называют media/.
     # таким образом картинки, прикреплённые к постам, будут сохраняться
     # в директории media/posts.
+    # Адреса заранее построенных миниатюр картинки (posts/thumbnails.py):
+    # {'source': имя картинки, 'card': адрес миниатюры 960x339}
+    thumbnails = models.JSONField(
+        'Миниатюры',
+        default=dict,
+        blank=True,
+        editable=False
+    )
+    # Миниатюры ещё не построены для текущей картинки: отметку ставит
+    # сохранение поста, снимает задача очереди - по ней run_jobs
+    # подбирает задачи, потерянные при перезапуске (core/jobs/queue.py)
+    thumbnails_pending = models.BooleanField(
+        'Ждёт миниатюр', default=False, editable=False)
+
+    # Время последнего изменения поста, его тэгов или комментариев:
+    # из него строятся ETag и Last-Modified (posts/conditional.py).
+    # update() не трогает auto_now - там его ставят явно (touch())
+    updated = models.DateTimeField('Изменён', auto_now=True)
+    # Число комментариев: ведут сигналы posts/signals.py, массовые
+    # загрузки пересчитывают его posts/stats.py - страница поста
+    # не считает COUNT(*) по комментариям
+    comments_count = models.PositiveIntegerField(
+        'Комментариев', default=0, editable=False)
 
     # Связь будет описана через вспомогательную модель TagPost
     # Связываем модель Post с моделью Tag через таблицу связи TagPost
     tag = models.ManyToManyField(Tag, through='TagPost')
 
+    objects = PostQuerySet.as_manager()
+
     def __str__(self) -> str:
         return self.text[:30]
 
@@ -109,6 +188,23 @@ class Post(models.Model):
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
         ordering = ['-pub_date']
+        # Индексы под каждую ленту: страница листается по ключу
+        # (pub_date, id) по убыванию, поэтому id входит в каждый индекс -
+        # выборка страницы идёт по индексу без сортировки в памяти
+        indexes = [
+            # главная страница
+            models.Index(fields=['-pub_date', '-id'],
+                         name='post_pub_date_id_idx'),
+            # профиль автора и посты «звёзд» в ленте подписок
+            models.Index(fields=['author', '-pub_date', '-id'],
+                         name='post_author_pub_date_idx'),
+            # страница группы
+            models.Index(fields=['group', '-pub_date', '-id'],
+                         name='post_group_pub_date_idx'),
+            # опрос run_jobs: частичный индекс только по отмеченным
+            models.Index(fields=['id'], name='post_thumbnails_pending_idx',
+                         condition=models.Q(thumbnails_pending=True)),
+        ]
 
 
 # В этой модели будут связаны id поста и id его тэгов
@@ -128,7 +224,37 @@ class TagPost(models.Model):
         return f'{self.post} {self.tag}'
 
 
-class Comment(models.Model):
+class PostSearchDocument(models.Model):
+    """Поисковый документ поста.
+
+    Собирает в одну запись всё, по чему ищут пост: заголовок, анонс с
+    текстом и названия тэгов. Поддерживается сигналами (posts/signals.py).
+    Сам полнотекстовый индекс строит миграция под конкретную БД:
+    на PostgreSQL - генерируемый столбец tsvector с GIN-индексом,
+    на SQLite - виртуальная таблица FTS5 (см. posts/search.py).
+    """
+    post = models.OneToOneField(
+        Post,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='search_document',
+        verbose_name='Пост'
+    )
+    title = models.TextField(verbose_name='Заголовок')
+    # анонс и текст поста
+    body = models.TextField(verbose_name='Текст')
+    # названия тэгов через пробел
+    tags = models.TextField(blank=True, verbose_name='Тэги')
+
+    class Meta:
+        verbose_name = 'Поисковый документ'
+        verbose_name_plural = 'Поисковые документы'
+
+    def __str__(self):
+        return self.title
+
+
+class Comment(AtomicSaveModel):
     """Создание комментария к посту.
 
     Комментировать может только зарегистрированный пользователь.
@@ -137,6 +263,7 @@ class Comment(models.Model):
         Post,
         on_delete=models.CASCADE,
         related_name='comments',
+        db_index=False,  # индекс составной, см. Meta.indexes
         verbose_name='Пост',
         help_text='Напишите комментарий к посту'
     )
@@ -164,9 +291,14 @@ class Comment(models.Model):
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
         ordering = ['-created']
+        indexes = [
+            # комментарии поста в порядке вывода
+            models.Index(fields=['post', '-created', '-id'],
+                         name='comment_post_created_idx'),
+        ]
 
 
-class Follow(models.Model):
+class Follow(AtomicSaveModel):
     """Система подписки на авторов."""
     # пользователь, который подписывается
     user = models.ForeignKey(
@@ -181,6 +313,7 @@ class Follow(models.Model):
         User,
         on_delete=models.CASCADE,
         related_name='following',
+        db_index=False,  # индекс составной, см. Meta.indexes
         verbose_name='Автор',
         help_text='Автор, на которого подписываются'
     )
@@ -197,11 +330,159 @@ class Follow(models.Model):
                 name='unique_follower_author'
             )
         ]
+        # уникальный индекс (user, author) отвечает на «на кого подписан
+        # пользователь», а раскладка поста по лентам спрашивает
+        # «кто подписан на автора» - для этого нужен обратный порядок
+        indexes = [
+            models.Index(fields=['author', 'user'],
+                         name='follow_author_user_idx'),
+        ]
 
     def __str__(self):
         return f'{self.user} подписан на {self.author}'
 
 
+class TimelineEntry(models.Model):
+    """Материализованная лента подписок (fan-out on write).
+
+    Когда автор публикует пост, ссылка на него раскладывается по лентам
+    всех его подписчиков, и страница follow_index читает готовую ленту
+    вместо соединения Post с Follow на каждый запрос.
+    Посты авторов с огромным числом подписчиков не раскладываются,
+    их подмешивают в ленту при чтении (см. posts/timeline.py).
+    """
+    # читатель, в чью ленту попал пост
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Читатель'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='Пост'
+    )
+    # автор поста продублирован, чтобы при отписке быстро вычистить
+    # его посты из ленты, не соединяя таблицу с постами
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор'
+    )
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'],
+                name='unique_timeline_user_post'
+            )
+        ]
+        indexes = [
+            models.Index(fields=['user', 'author'],
+                         name='timeline_user_author_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.post} в ленте {self.user}'
+
+
+class UserStats(models.Model):
+    """Денормализованные счётчики пользователя.
+
+    Вместо COUNT(*) по постам, комментариям и подпискам на каждый просмотр
+    профиля или поста счётчики увеличиваются и уменьшаются сигналами
+    (posts/signals.py) при создании и удалении объектов. Если они
+    разойдутся с реальностью, их пересчитывает
+    python manage.py recount_user_stats.
+    """
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        verbose_name='Пользователь'
+    )
+    posts_count = models.PositiveIntegerField('Постов', default=0)
+    comments_count = models.PositiveIntegerField('Комментариев', default=0)
+    # сколько пользователей подписано на него
+    followers_count = models.PositiveIntegerField('Подписчиков', default=0)
+    # на скольких авторов подписан он сам
+    following_count = models.PositiveIntegerField('Подписок', default=0)
+    # когда последний раз добавлялся, менялся или удалялся пост автора -
+    # версия его ленты на странице профиля
+    feed_updated = models.DateTimeField(
+        'Лента изменена', null=True, blank=True)
+    # раскладка постов автора по лентам подписчиков пропускалась
+    # (он был «звездой»): лента подписок берёт его посты из Post,
+    # пока posts/timeline.py:catch_up их не разложит
+    fanout_on_read = models.BooleanField(
+        'Посты подмешиваются при чтении', default=False)
+
+    class Meta:
+        verbose_name = 'Счётчики пользователя'
+        verbose_name_plural = 'Счётчики пользователей'
+
+    def __str__(self):
+        return f'Счётчики {self.user}'
+
+    @classmethod
+    def for_user(cls, user):
+        """Возвращает счётчики пользователя, создавая их при необходимости."""
+        try:
+            return user.stats
+        except cls.DoesNotExist:
+            stats, _ = cls.objects.get_or_create(user=user)
+            return stats
+
+    @classmethod
+    def bump(cls, user_id, field, delta):
+        """Атомарно меняет счётчик: UPDATE ... SET field = field + delta.
+
+        Значение не читается в Python, поэтому параллельные запросы
+        не затирают изменения друг друга.
+        """
+        # Greatest не даёт уйти в минус, если счётчик уже разошёлся
+        updated = cls.objects.filter(user_id=user_id).update(
+            **{field: Greatest(models.F(field) + delta, 0)})
+        if not updated and delta > 0:
+            # строки ещё нет (пользователь появился до счётчиков) -
+            # создаём её сразу с верными значениями. При уменьшении
+            # не создаём: это может быть каскадное удаление самого
+            # пользователя вместе со счётчиками
+            cls.recount(user_id)
+
+    @classmethod
+    def touch_feed(cls, user_id):
+        """Отмечает ленту автора изменённой.
+
+        Строку счётчиков не создаёт (как и bump() при уменьшении):
+        пост может удаляться каскадом вместе с самим автором.
+        """
+        cls.objects.filter(user_id=user_id).update(
+            feed_updated=timezone.now())
+
+    @classmethod
+    def recount(cls, user_id):
+        """Пересчитывает счётчики одного пользователя по-честному."""
+        cls.objects.update_or_create(
+            user_id=user_id,
+            defaults={
+                'posts_count': Post.objects.filter(author_id=user_id).count(),
+                'comments_count': Comment.objects.filter(
+                    author_id=user_id).count(),
+                'followers_count': Follow.objects.filter(
+                    author_id=user_id).count(),
+                'following_count': Follow.objects.filter(
+                    user_id=user_id).count(),
+            }
+        )
+
+
 class Contact(models.Model):
     """Обратная связь с администратором сайта.
 
@@ -0,0 +1,167 @@
+"""Полнотекстовый поиск по постам.
+
+Ищем не по таблице постов (title__icontains - это полный перебор),
+а по поисковым документам PostSearchDocument:
+- PostgreSQL: столбец vector (tsvector, веса: заголовок A, тэги B,
+  текст C) с GIN-индексом, ранжирование ts_rank, подсветка ts_headline;
+- SQLite (локальный запуск): виртуальная таблица FTS5, ранжирование
+  bm25, подсветка snippet();
+- другие БД: запасной вариант через icontains без ранжирования.
+Индексы создаёт миграция 0014_postsearchdocument.
+"""
+import re
+
+from django.db import connection
+from django.db.models import FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .models import Post, PostSearchDocument
+
+# Конфигурация полнотекстового поиска PostgreSQL - сайт русскоязычный
+SEARCH_CONFIG = 'russian'
+DOCUMENT_TABLE = 'posts_postsearchdocument'
+FTS_TABLE = 'posts_postsearch_fts'
+# Теги подсветки найденных слов. Фрагмент целиком экранируется,
+# а затем обратно восстанавливаются только эти два тега
+START_SEL = '<mark>'
+STOP_SEL = '</mark>'
+SNIPPET_WORDS = 30
+
+_WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def _fts5_query(query):
+    """Превращает строку пользователя в безопасный запрос FTS5.
+
+    Каждое слово берётся в кавычки (никакого синтаксиса FTS5 от
+    пользователя) и ищется по префиксу, слова объединяются через AND.
+    """
+    words = _WORD_RE.findall(query)
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def make_document(post, tag_names):
+    """Поисковый документ поста (без сохранения)."""
+    return PostSearchDocument(
+        post_id=post.pk,
+        title=post.title,
+        body='\n'.join(part for part in (post.anons, post.text) if part),
+        tags=' '.join(tag_names),
+    )
+
+
+def update_document(post):
+    """Пересобирает поисковый документ поста."""
+    document = make_document(post, post.tag.values_list('name', flat=True))
+    PostSearchDocument.objects.update_or_create(
+        post=post,
+        defaults={'title': document.title, 'body': document.body,
+                  'tags': document.tags}
+    )
+
+
+def search_posts(query, queryset=None):
+    """Возвращает посты, найденные по запросу, лучшие - первыми.
+
+    Результат - обычный QuerySet с аннотацией search_rank (чем больше,
+    тем выше пост в выдаче), его можно дальше фильтровать и разбивать
+    на страницы.
+    """
+    if queryset is None:
+        queryset = Post.objects.all()
+    query = (query or '').strip()
+    if not query:
+        return queryset.none()
+    vendor = connection.vendor
+    if vendor == 'postgresql':
+        match = RawSQL(
+            f'SELECT post_id FROM {DOCUMENT_TABLE} '
+            f'WHERE vector @@ websearch_to_tsquery(%s, %s)',
+            (SEARCH_CONFIG, query)
+        )
+        rank = RawSQL(
+            f'SELECT ts_rank(d.vector, websearch_to_tsquery(%s, %s)) '
+            f'FROM {DOCUMENT_TABLE} d WHERE d.post_id = posts_post.id',
+            (SEARCH_CONFIG, query),
+            output_field=FloatField()
+        )
+    elif vendor == 'sqlite':
+        fts_query = _fts5_query(query)
+        if not fts_query:
+            return queryset.none()
+        match = RawSQL(
+            f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+            (fts_query,)
+        )
+        # bm25 тем меньше, чем лучше совпадение; веса столбцов:
+        # заголовок, текст, тэги
+        rank = RawSQL(
+            f'SELECT -bm25({FTS_TABLE}, 10.0, 1.0, 5.0) FROM {FTS_TABLE} '
+            f'WHERE {FTS_TABLE} MATCH %s AND rowid = posts_post.id',
+            (fts_query,),
+            output_field=FloatField()
+        )
+    else:
+        return queryset.filter(
+            Q(title__icontains=query)
+            | Q(anons__icontains=query)
+            | Q(text__icontains=query)
+        ).annotate(
+            search_rank=Value(0.0, output_field=FloatField())
+        ).order_by('-pub_date', '-id')
+    return queryset.filter(pk__in=match).annotate(
+        search_rank=rank
+    ).order_by('-search_rank', '-pub_date', '-id')
+
+
+def _fetch_snippets(post_ids, query):
+    """Возвращает словарь {id поста: фрагмент с подсветкой}."""
+    vendor = connection.vendor
+    ids = list(post_ids)
+    if not ids or vendor not in ('postgresql', 'sqlite'):
+        return {}
+    placeholders = ', '.join(['%s'] * len(ids))
+    with connection.cursor() as cursor:
+        if vendor == 'postgresql':
+            options = (f'StartSel={START_SEL}, StopSel={STOP_SEL}, '
+                       f'MaxWords={SNIPPET_WORDS}, MinWords=10, '
+                       f'MaxFragments=2')
+            cursor.execute(
+                f'SELECT post_id, ts_headline(%s, body, '
+                f'websearch_to_tsquery(%s, %s), %s) '
+                f'FROM {DOCUMENT_TABLE} WHERE post_id IN ({placeholders})',
+                [SEARCH_CONFIG, SEARCH_CONFIG, query, options, *ids]
+            )
+        else:
+            fts_query = _fts5_query(query)
+            if not fts_query:
+                return {}
+            cursor.execute(
+                f'SELECT rowid, snippet({FTS_TABLE}, 1, %s, %s, %s, %s) '
+                f'FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s '
+                f'AND rowid IN ({placeholders})',
+                [START_SEL, STOP_SEL, '…', min(SNIPPET_WORDS, 64),
+                 fts_query, *ids]
+            )
+        return dict(cursor.fetchall())
+
+
+def highlight(posts, query):
+    """Проставляет найденным постам атрибут snippet с подсветкой.
+
+    Подсветка считается одним запросом и только для переданных постов
+    (обычно - для одной страницы выдачи). Текст поста экранируется,
+    так что snippet можно выводить в шаблоне без |escape.
+    """
+    posts = list(posts)
+    snippets = _fetch_snippets((post.pk for post in posts), query)
+    for post in posts:
+        raw = snippets.get(post.pk) or ''
+        post.snippet = mark_safe(
+            escape(raw)
+            .replace(escape(START_SEL), START_SEL)
+            .replace(escape(STOP_SEL), STOP_SEL)
+        )
+    return posts
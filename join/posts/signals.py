@@ -0,0 +1,221 @@
+from django.db.models import F, QuerySet
+from django.db.models.functions import Greatest
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_save)
+from django.dispatch import receiver
+
+from core.cache.generations import bump_generation
+from core.jobs.queue import enqueue_on_commit
+
+from . import search, thumbnails, timeline
+from .models import (Comment, Follow, Group, Post, Tag, TagPost, User,
+                     UserStats)
+
+
+@receiver(post_save, sender=Post)
+def post_fan_out(sender, instance, created, **kwargs):
+    """Новый пост попадает в ленты подписчиков автора."""
+    if created:
+        timeline.fan_out_post(instance)
+
+
+@receiver(post_save, sender=Follow)
+def follow_backfill(sender, instance, created, **kwargs):
+    """После подписки в ленту добавляются последние посты автора.
+
+    Срабатывает и для profile_follow, и для FollowViewSet.
+    """
+    if created:
+        timeline.backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_trim(sender, instance, **kwargs):
+    """После отписки посты автора убираются из ленты."""
+    timeline.trim(instance.user_id, instance.author_id)
+
+
+@receiver(pre_save, sender=Post)
+def post_image_strip_metadata(sender, instance, **kwargs):
+    """Новая картинка поста (форма, API, админка) попадает в хранилище
+    уже без EXIF и геопозиции: чистим её до того, как FileField
+    запишет файл."""
+    image = instance.image
+    if image and not image._committed:
+        instance.image = thumbnails.clean_upload(image.file)
+
+
+@receiver(pre_save, sender=Post)
+def post_thumbnails_pending(sender, instance, **kwargs):
+    """Отметка о миниатюрах пишется той же записью, что и картинка:
+    по ней run_jobs подберёт задачу, даже если её поставить не успели."""
+    instance.thumbnails_pending = thumbnails.needs_thumbnails(instance)
+
+
+@receiver(post_save, sender=Post)
+def post_thumbnails(sender, instance, **kwargs):
+    """Новая картинка поста - миниатюры строятся в фоновой очереди.
+
+    Задача ставится после коммита транзакции, чтобы процесс пула
+    точно увидел сохранённый пост; с JOB_QUEUE_EXTERNAL её по отметке
+    thumbnails_pending найдёт run_jobs.
+    """
+    if thumbnails.needs_thumbnails(instance):
+        enqueue_on_commit(thumbnails.generate_post_thumbnails, instance.pk)
+    elif not instance.image and instance.thumbnails:
+        # картинку убрали - забываем и миниатюры
+        instance.thumbnails = {}
+        Post.objects.filter(pk=instance.pk).update(thumbnails={})
+
+
+@receiver(post_save, sender=Post)
+def post_search_document(sender, instance, **kwargs):
+    """Поисковый документ пересобирается при каждом сохранении поста."""
+    search.update_document(instance)
+
+
+@receiver(post_save, sender=TagPost)
+def tagpost_search_document(sender, instance, **kwargs):
+    """Тэги тоже попадают в поисковый документ поста."""
+    search.update_document(instance.post)
+
+
+@receiver(post_delete, sender=TagPost)
+def tagpost_delete_search_document(sender, instance, origin=None, **kwargs):
+    """Тэг убрали с поста - убираем его и из документа.
+
+    Если связь удаляется каскадом вместе с постом или автором,
+    документ удалится тем же каскадом, пересобирать его не нужно.
+    """
+    origin_model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    if origin_model not in (TagPost, Tag):
+        return
+    post = Post.objects.filter(pk=instance.post_id).first()
+    if post is not None:
+        search.update_document(post)
+
+
+@receiver(m2m_changed, sender=Post.tag.through)
+def post_tags_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """То же для post.tag.add() / remove() / clear()."""
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        search.update_document(instance)
+        return
+    for post in Post.objects.filter(pk__in=pk_set or ()):
+        search.update_document(post)
+
+
+@receiver(post_save, sender=Tag)
+def tag_search_documents(sender, instance, created, **kwargs):
+    """После переименования тэга обновляем документы его постов."""
+    if created:
+        return
+    for post in Post.objects.filter(tag=instance).iterator(chunk_size=500):
+        search.update_document(post)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidate_posts_pages(sender, **kwargs):
+    """Любое изменение постов, комментариев или групп сбрасывает
+    закэшированные страницы ленты."""
+    bump_generation('posts')
+
+
+@receiver(post_save, sender=Comment)
+def comment_touch_post(sender, instance, created, **kwargs):
+    """Комментарии видны на странице поста - меняется и его версия,
+    а у нового комментария тем же UPDATE растёт счётчик поста."""
+    changes = {}
+    if created:
+        changes['comments_count'] = F('comments_count') + 1
+    Post.objects.filter(pk=instance.post_id).touch(**changes)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_delete_touch_post(sender, instance, **kwargs):
+    Post.objects.filter(pk=instance.post_id).touch(
+        comments_count=Greatest(F('comments_count') - 1, 0))
+
+
+@receiver(post_save, sender=TagPost)
+@receiver(post_delete, sender=TagPost)
+def tagpost_touch_post(sender, instance, **kwargs):
+    Post.objects.filter(pk=instance.post_id).touch()
+
+
+@receiver(m2m_changed, sender=Post.tag.through)
+def post_tags_touch(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        Post.objects.filter(pk=instance.pk).touch()
+    elif pk_set:
+        Post.objects.filter(pk__in=pk_set).touch()
+
+
+@receiver(post_save, sender=Tag)
+def tag_touch_posts(sender, instance, created, **kwargs):
+    """Переименованный тэг меняет представление всех его постов."""
+    if not created:
+        Post.objects.filter(tag=instance).touch()
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def post_touch_feed(sender, instance, **kwargs):
+    """Любое изменение поста меняет версию ленты автора в профиле."""
+    UserStats.touch_feed(instance.author_id)
+
+
+@receiver(post_save, sender=User)
+def create_user_stats(sender, instance, created, **kwargs):
+    """У каждого нового пользователя сразу есть нулевые счётчики."""
+    if created:
+        UserStats.objects.get_or_create(user_id=instance.pk)
+
+
+@receiver(post_save, sender=Post)
+def post_stats_created(sender, instance, created, **kwargs):
+    if created:
+        UserStats.bump(instance.author_id, 'posts_count', 1)
+
+
+@receiver(post_delete, sender=Post)
+def post_stats_deleted(sender, instance, **kwargs):
+    UserStats.bump(instance.author_id, 'posts_count', -1)
+
+
+@receiver(post_save, sender=Comment)
+def comment_stats_created(sender, instance, created, **kwargs):
+    if created:
+        UserStats.bump(instance.author_id, 'comments_count', 1)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_stats_deleted(sender, instance, **kwargs):
+    UserStats.bump(instance.author_id, 'comments_count', -1)
+
+
+@receiver(post_save, sender=Follow)
+def follow_stats_created(sender, instance, created, **kwargs):
+    """Подписка: +1 подписчик автору и +1 подписка подписчику."""
+    if created:
+        UserStats.bump(instance.author_id, 'followers_count', 1)
+        UserStats.bump(instance.user_id, 'following_count', 1)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_stats_deleted(sender, instance, **kwargs):
+    UserStats.bump(instance.author_id, 'followers_count', -1)
+    UserStats.bump(instance.user_id, 'following_count', -1)
+    if timeline.needs_catch_up(instance.author_id):
+        # автор опустился до порога «звезды» - раскладываем его посты,
+        # пропущенные, пока подписчиков было больше
+        enqueue_on_commit(timeline.catch_up, instance.author_id)
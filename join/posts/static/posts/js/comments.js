@@ -0,0 +1,25 @@
+// Кнопка «Показать ещё» под комментариями поста: следующая порция
+// приходит HTML-фрагментом и встаёт на место кнопки (вместе с новой
+// кнопкой, если комментарии ещё остались). Если запрос не удался,
+// переходим по обычной ссылке кнопки.
+document.addEventListener('click', function (event) {
+  const link = event.target.closest('.comments-more a[data-fragment]');
+  if (!link) {
+    return;
+  }
+  event.preventDefault();
+  link.classList.add('disabled');
+  fetch(link.dataset.fragment, {credentials: 'same-origin'})
+    .then(function (response) {
+      if (!response.ok) {
+        throw new Error(response.status);
+      }
+      return response.text();
+    })
+    .then(function (html) {
+      link.closest('.comments-more').outerHTML = html;
+    })
+    .catch(function () {
+      window.location = link.href;
+    });
+});
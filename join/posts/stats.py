@@ -0,0 +1,78 @@
+"""Массовый пересчёт денормализованных счётчиков: UserStats
+и числа комментариев поста (Post.comments_count)."""
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Comment, Follow, Post, UserStats
+
+User = get_user_model()
+
+
+def _count(queryset, field, outer='user_id'):
+    """Коррелированный подзапрос: число строк queryset для user_id
+    (или другого поля внешнего запроса outer)."""
+    counted = (
+        queryset.filter(**{field: OuterRef(outer)})
+        .order_by()
+        .values(field)
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+    return Coalesce(Subquery(counted, output_field=IntegerField()), 0)
+
+
+def recount_range(first_id, last_id):
+    """Пересчитывает счётчики пользователей с id в [first_id, last_id].
+
+    Недостающие строки создаются одним INSERT, сами счётчики считаются
+    одним UPDATE на весь диапазон - без цикла по пользователям в Python.
+    """
+    with transaction.atomic():
+        user_ids = User.objects.filter(
+            id__gte=first_id, id__lte=last_id).values_list('id', flat=True)
+        UserStats.objects.bulk_create(
+            [UserStats(user_id=user_id) for user_id in user_ids],
+            ignore_conflicts=True
+        )
+        return UserStats.objects.filter(
+            user_id__gte=first_id, user_id__lte=last_id
+        ).update(
+            posts_count=_count(Post.objects.all(), 'author'),
+            comments_count=_count(Comment.objects.all(), 'author'),
+            followers_count=_count(Follow.objects.all(), 'author'),
+            following_count=_count(Follow.objects.all(), 'user'),
+        )
+
+
+def _in_batches(model, recount, batch_size, progress):
+    """Вызывает recount(first_id, last_id) пачками по id модели."""
+    bounds = model.objects.order_by('id').values_list('id', flat=True)
+    first = bounds.first()
+    last = bounds.last()
+    if first is None:
+        return 0
+    total = 0
+    for start in range(first, last + 1, batch_size):
+        total += recount(start, start + batch_size - 1)
+        if progress is not None:
+            progress(total)
+    return total
+
+
+def recount_all(batch_size=10000, progress=None):
+    """Пересчитывает счётчики всех пользователей пачками по id."""
+    return _in_batches(User, recount_range, batch_size, progress)
+
+
+def recount_comments_range(first_id, last_id):
+    """Пересчитывает число комментариев постов с id в [first_id, last_id]
+    одним UPDATE."""
+    return Post.objects.filter(id__gte=first_id, id__lte=last_id).update(
+        comments_count=_count(Comment.objects.all(), 'post', outer='pk'))
+
+
+def recount_comments_all(batch_size=10000, progress=None):
+    """Пересчитывает число комментариев всех постов пачками по id."""
+    return _in_batches(Post, recount_comments_range, batch_size, progress)
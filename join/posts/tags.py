@@ -0,0 +1,40 @@
+"""Тэги постов по названиям.
+
+Название тэга уникально, поэтому недостающие тэги создаются одной
+вставкой bulk_create(ignore_conflicts=True): если такой же тэг
+параллельно создал другой запрос, вставка его просто пропустит.
+На любое число тэгов уходит не больше трёх запросов.
+"""
+from .models import Tag
+
+# Сколько названий искать одним запросом (лимит параметров SQLite)
+LOOKUP_CHUNK = 900
+
+
+def normalize(names):
+    """Названия без пробелов по краям, пустых и повторов, в исходном порядке."""
+    return list(dict.fromkeys(
+        name.strip() for name in names if name and name.strip()))
+
+
+def _lookup(names):
+    ids = {}
+    for start in range(0, len(names), LOOKUP_CHUNK):
+        ids.update(Tag.objects.filter(
+            name__in=names[start:start + LOOKUP_CHUNK]
+        ).values_list('name', 'id'))
+    return ids
+
+
+def resolve_tags(names):
+    """Возвращает {название: id} для всех names, создавая недостающие."""
+    names = normalize(names)
+    ids = _lookup(names)
+    missing = [name for name in names if name not in ids]
+    if missing:
+        # id вставленных строк при ignore_conflicts не возвращаются,
+        # поэтому недостающие перечитываются
+        Tag.objects.bulk_create(
+            [Tag(name=name) for name in missing], ignore_conflicts=True)
+        ids.update(_lookup(missing))
+    return ids
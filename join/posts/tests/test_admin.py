@@ -0,0 +1,118 @@
+import datetime
+
+from django.contrib.admin.helpers import ACTION_CHECKBOX_NAME
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from ..admin import TEXT_PREVIEW_LENGTH
+from ..models import Group, Post, User
+
+
+class TestPostAdmin(TestCase):
+    """Список постов в админке не зависит от размера таблицы."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(
+            username='post_admin', password='x', email='a@example.com')
+        cls.author = User.objects.create_user(username='admin_author')
+        cls.group = Group.objects.create(
+            title='Старая', slug='admin-old', description='-')
+        cls.target = Group.objects.create(
+            title='Новая', slug='admin-new', description='-')
+        cls.post = Post.objects.create(
+            title='Длинный', text='начало ' + 'я' * 500 + ' хвост',
+            author=cls.author, group=cls.group)
+        cls.other = Post.objects.create(
+            title='Другой', text='кактус цветёт', author=cls.author,
+            group=cls.group)
+        # пост прошлого года - для навигации по датам
+        Post.objects.filter(pk=cls.other.pk).update(
+            pub_date=timezone.now() - datetime.timedelta(days=400))
+        cls.url = reverse('admin:posts_post_changelist')
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.admin)
+
+    def get(self, params=None):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, params or {})
+        self.assertEqual(response.status_code, 200)
+        return response, [query['sql'] for query in queries]
+
+    def test_text_preview(self):
+        response, queries = self.get()
+        preview = 'начало ' + 'я' * (TEXT_PREVIEW_LENGTH - len('начало '))
+        self.assertContains(response, preview)
+        self.assertNotContains(response, 'хвост')
+        # ни <select> группы в строках, ни запроса автора на строку
+        self.assertNotContains(response, 'name="form-0-group"')
+        self.assertEqual(
+            sum('FROM "auth_user"' in sql.split('WHERE')[0]
+                for sql in queries), 1)
+
+    def test_full_text_search(self):
+        response, queries = self.get({'q': 'кактус'})
+        self.assertContains(response, 'Другой')
+        self.assertNotContains(response, 'Длинный')
+        self.assertFalse(any('LIKE' in sql for sql in queries))
+
+    def test_date_hierarchy(self):
+        year = timezone.localtime(self.post.pub_date).year
+        old_year = timezone.localtime(
+            Post.objects.get(pk=self.other.pk).pub_date).year
+        response, queries = self.get()
+        self.assertContains(response, f'pub_date__year={year}')
+        self.assertContains(response, f'pub_date__year={old_year}')
+        self.assertFalse(any('DISTINCT' in sql for sql in queries))
+        response, queries = self.get({'pub_date__year': year})
+        self.assertContains(response, 'Длинный')
+        self.assertNotContains(response, 'Другой')
+        self.assertFalse(any('DISTINCT' in sql for sql in queries))
+
+    def act(self, action, **data):
+        return self.client.post(self.url, {
+            'action': action,
+            ACTION_CHECKBOX_NAME: [self.post.pk, self.other.pk],
+            **data,
+        })
+
+    def test_move_to_group(self):
+        updated = Post.objects.get(pk=self.post.pk).updated
+        with CaptureQueriesContext(connection) as queries:
+            response = self.act('move_to_group', group=self.target.pk)
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(
+            set(Post.objects.values_list('group', flat=True)),
+            {self.target.pk})
+        self.assertGreater(Post.objects.get(pk=self.post.pk).updated, updated)
+        # один UPDATE постов на все выбранные
+        self.assertEqual(
+            sum(sql.startswith('UPDATE "posts_post"')
+                for sql in (query['sql'] for query in queries)), 1)
+
+    def test_move_to_group_requires_group(self):
+        self.act('move_to_group')
+        self.assertEqual(
+            set(Post.objects.values_list('group', flat=True)),
+            {self.group.pk})
+
+    def test_remove_from_group(self):
+        self.act('remove_from_group')
+        self.assertEqual(
+            set(Post.objects.values_list('group', flat=True)), {None})
+
+    def test_autocomplete(self):
+        response = self.client.get(reverse('admin:autocomplete'), {
+            'app_label': 'posts', 'model_name': 'post',
+            'field_name': 'group', 'term': 'Нов'})
+        self.assertEqual(
+            [result['text'] for result in response.json()['results']],
+            ['Новая'])
+        response = self.client.get(
+            reverse('admin:posts_post_change', args=[self.post.pk]))
+        self.assertContains(response, 'admin-autocomplete')
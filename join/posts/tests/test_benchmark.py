@@ -0,0 +1,63 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+
+from ..benchmark import compare, run, seed
+from ..models import Comment, Follow, Post, PostSearchDocument, UserStats
+
+SIZES = {'users': 12, 'groups': 3, 'tags': 5, 'posts': 60,
+         'comments': 120, 'follows': 30}
+
+
+class TestBenchmark(TestCase):
+    """Наполнение синтетикой и прогон замеров на маленьком наборе."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.created = seed(SIZES, random_seed=1)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_seed_fills_derived_tables(self):
+        self.assertEqual(Post.objects.count(), SIZES['posts'])
+        self.assertEqual(Comment.objects.count(), SIZES['comments'])
+        self.assertEqual(Follow.objects.count(), self.created['follows'])
+        self.assertEqual(PostSearchDocument.objects.count(), SIZES['posts'])
+        # счётчики досчитаны, хотя сигналы при bulk_create не срабатывали
+        self.assertEqual(
+            sum(UserStats.objects.values_list('posts_count', flat=True)),
+            SIZES['posts'])
+        # даты разбросаны, а не проставлены auto_now_add
+        self.assertGreater(
+            Post.objects.values('pub_date').distinct().count(), 1)
+
+    def test_run_reports_every_endpoint(self):
+        report = run(requests=3, warmup=1)
+        self.assertIn('posts:index', report['results'])
+        self.assertIn('api:post-list', report['results'])
+        self.assertEqual(report['meta']['dataset']['posts'], SIZES['posts'])
+        for name, result in report['results'].items():
+            with self.subTest(endpoint=name):
+                self.assertEqual(result['requests'], 3)
+                self.assertLessEqual(result['p50_ms'], result['p99_ms'])
+                self.assertNotIn('500', result['status_codes'])
+
+    def test_command_writes_json_and_compares(self):
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'bench.json')
+            call_command('benchmark', requests=2, warmup=0, output=output,
+                         endpoints=['posts:index', 'api:group-list'],
+                         stderr=StringIO())
+            with open(output, encoding='utf-8') as file:
+                report = json.load(file)
+        self.assertEqual(
+            set(report['results']), {'posts:index', 'api:group-list'})
+        lines, regressions = compare(report, report)
+        self.assertEqual(len(lines), 2)
+        self.assertEqual(regressions, 0)
@@ -0,0 +1,81 @@
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from .. import views
+from ..models import Comment, Post, User
+
+
+class TestPostComments(TestCase):
+    """Комментарии на странице поста приходят порциями по ключу,
+    число комментариев хранится в посте."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='comments_author')
+        cls.post = Post.objects.create(
+            title='Пост', text='Текст', author=cls.author)
+        cls.total = views.COMMENTS_PER_PAGE + 5
+        for number in range(cls.total):
+            Comment.objects.create(
+                post=cls.post, author=cls.author, text=f'комментарий {number}')
+        cls.detail_url = reverse('posts:post_detail', args=[cls.post.pk])
+        cls.more_url = reverse('posts:post_comments', args=[cls.post.pk])
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def texts(self, response):
+        return [comment.text for comment in response.context['comments']]
+
+    def test_comments_count(self):
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, self.total)
+        Comment.objects.filter(post=self.post).first().delete()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, self.total - 1)
+
+    def test_first_page(self):
+        response = self.client.get(self.detail_url)
+        texts = self.texts(response)
+        self.assertEqual(len(texts), views.COMMENTS_PER_PAGE)
+        # новые первыми
+        self.assertEqual(texts[0], f'комментарий {self.total - 1}')
+        self.assertContains(response, f'Комментарии: {self.total}')
+        self.assertContains(response, 'Показать ещё')
+
+    def test_load_more(self):
+        page = self.client.get(self.detail_url).context['comments']
+        response = self.client.get(
+            self.more_url, {'after': page.next_cursor})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            self.texts(response),
+            [f'комментарий {number}' for number in reversed(range(5))])
+        # последняя порция - без кнопки и без остальной страницы
+        self.assertNotContains(response, 'Показать ещё')
+        self.assertNotContains(response, '<html')
+
+    def test_load_more_queries(self):
+        page = self.client.get(self.detail_url).context['comments']
+        # версия поста и комментарии с авторами одним JOIN
+        with self.assertNumQueries(2):
+            self.client.get(self.more_url, {'after': page.next_cursor})
+
+    def test_load_more_not_found(self):
+        response = self.client.get(self.more_url, {'after': 'испорчен'})
+        self.assertEqual(response.status_code, 404)
+        response = self.client.get(
+            reverse('posts:post_comments', args=[self.post.pk + 100]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_recount(self):
+        Post.objects.filter(pk=self.post.pk).update(comments_count=0)
+        call_command('recount_user_stats', '--batch-size', '1',
+                     stdout=StringIO(), stderr=StringIO())
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, self.total)
@@ -0,0 +1,67 @@
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post, User
+
+
+class TestConditionalPages(TestCase):
+    """post_detail и profile отвечают 304, пока страница не изменилась."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='etag_author')
+        cls.reader = User.objects.create_user(username='etag_reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='etag-group', description='-')
+        cls.post = Post.objects.create(
+            title='Пост', text='Текст', author=cls.author, group=cls.group)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def revalidate(self, url):
+        """Первый запрос, затем повтор с If-None-Match: код повтора."""
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Cookie', response['Vary'])
+        return lambda: self.client.get(
+            url, HTTP_IF_NONE_MATCH=response['ETag']).status_code
+
+    def test_post_detail(self):
+        url = reverse('posts:post_detail', args=[self.post.pk])
+        again = self.revalidate(url)
+        # 304 - без шаблона и комментариев: сессия, пользователь
+        # и один запрос версии поста
+        with self.assertNumQueries(3):
+            self.assertEqual(again(), 304)
+        Comment.objects.create(post=self.post, author=self.reader, text='!')
+        self.assertEqual(again(), 200)
+
+    def test_post_detail_group_rename(self):
+        again = self.revalidate(
+            reverse('posts:post_detail', args=[self.post.pk]))
+        self.group.title = 'Новое название'
+        self.group.save()
+        self.assertEqual(again(), 200)
+
+    def test_profile(self):
+        url = reverse('posts:profile', args=[self.author.username])
+        again = self.revalidate(url)
+        self.assertEqual(again(), 304)
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(again(), 200)
+
+    def test_profile_new_post(self):
+        again = self.revalidate(
+            reverse('posts:profile', args=[self.author.username]))
+        Post.objects.create(title='Ещё', text='Текст', author=self.author)
+        self.assertEqual(again(), 200)
+
+    def test_etag_depends_on_user(self):
+        url = reverse('posts:post_detail', args=[self.post.pk])
+        etag = self.client.get(url)['ETag']
+        guest = Client().get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(guest.status_code, 200)
@@ -0,0 +1,121 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+from ..models import (Comment, Follow, Group, Post, PostSearchDocument, Tag,
+                      TimelineEntry, User, UserStats)
+
+
+class TestImportData(TestCase):
+    """Команда import_data: связи по натуральным ключам, производные
+    таблицы и пропуск неполных строк."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def write(self, name, content):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w', encoding='utf-8') as file:
+            if name.endswith('.jsonl'):
+                file.write('\n'.join(json.dumps(row, ensure_ascii=False)
+                                     for row in content))
+            else:
+                file.write(content)
+        return path
+
+    def import_data(self, **files):
+        stdout = StringIO()
+        call_command('import_data', stdout=stdout, stderr=StringIO(),
+                     **files)
+        return stdout.getvalue()
+
+    def test_import_all_kinds(self):
+        output = self.import_data(
+            users=self.write(
+                'users.csv', 'username,email\nanna,anna@example.com\n'
+                             'boris,\nvera,\n'),
+            groups=self.write('groups.jsonl', [
+                {'slug': 'travel', 'title': 'Путешествия'}]),
+            posts=self.write('posts.jsonl', [
+                {'id': 501, 'title': 'Горы', 'text': 'Поход в горы',
+                 'author': 'anna', 'group': 'travel',
+                 'publication_date': '2020-05-01T10:00:00+00:00',
+                 'tags': ['горы', 'поход']},
+                {'title': 'Море', 'text': 'Берег', 'author': 'anna',
+                 'tags': 'море, горы'},
+                # неизвестный автор - строка пропускается
+                {'title': 'Нет', 'text': 'Автора', 'author': 'nobody'},
+            ]),
+            comments=self.write('comments.jsonl', [
+                {'post': 501, 'author': 'boris', 'text': 'Красиво'},
+                {'post': 999999, 'author': 'boris', 'text': 'Мимо'},
+            ]),
+            follows=self.write(
+                'follows.csv', 'user,author\nboris,anna\nboris,anna\n'
+                               'vera,vera\n'),
+        )
+        self.assertIn('posts: загружено 2, пропущено 1', output)
+        self.assertIn('comments: загружено 1, пропущено 1', output)
+        self.assertIn('follows: загружено 1, пропущено 2', output)
+
+        post = Post.objects.get(pk=501)
+        self.assertEqual(post.group, Group.objects.get(slug='travel'))
+        self.assertEqual(post.pub_date.year, 2020)
+        self.assertEqual(
+            sorted(post.tag.values_list('name', flat=True)), ['горы', 'поход'])
+        second = Post.objects.get(title='Море')
+        self.assertGreater(second.pk, 501)
+        # тэг «горы» не задвоился
+        self.assertEqual(
+            second.tag.get(name='горы'), post.tag.get(name='горы'))
+        self.assertEqual(PostSearchDocument.objects.count(), 2)
+        self.assertEqual(Comment.objects.get().post, post)
+
+        anna = User.objects.get(username='anna')
+        boris = User.objects.get(username='boris')
+        self.assertFalse(anna.has_usable_password())
+        self.assertTrue(Follow.objects.filter(user=boris, author=anna).exists())
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=boris).count(), 2)
+        stats = UserStats.objects.get(user=anna)
+        self.assertEqual((stats.posts_count, stats.followers_count), (2, 1))
+
+    def test_conflicts_not_counted(self):
+        """Строки, пропущенные из-за конфликтов, не считаются загруженными."""
+        users = self.write('users.csv', 'username\nanna\nboris\n')
+        follows = self.write('follows.csv', 'user,author\nboris,anna\n')
+        self.import_data(users=users, follows=follows)
+        output = self.import_data(users=users, follows=follows)
+        self.assertIn('users: загружено 0, пропущено 2', output)
+        self.assertIn('follows: загружено 0, пропущено 1', output)
+        self.assertEqual(Follow.objects.count(), 1)
+
+    def test_tags_count_only_new(self):
+        """Существующие тэги и повторы в файле не считаются загруженными."""
+        Tag.objects.create(name='горы')
+        output = self.import_data(
+            tags=self.write('tags.csv', 'name\nморе\nгоры\nморе\n'))
+        self.assertIn('tags: загружено 1, пропущено 2', output)
+        self.assertEqual(Tag.objects.count(), 2)
+
+    def test_export_round_trip(self):
+        author = User.objects.create_user(username='exporter')
+        Post.objects.create(title='Пост', text='Текст', author=author)
+        path = os.path.join(self.directory, 'posts.ndjson')
+        call_command('export_posts', output=path, stderr=StringIO())
+        Post.objects.all().delete()
+        self.import_data(posts=path, defer_indexes=False)
+        self.assertEqual(
+            list(Post.objects.values_list('title', 'author__username')),
+            [('Пост', 'exporter')])
+
+    def test_unknown_extension(self):
+        with self.assertRaises(CommandError):
+            self.import_data(users=self.write('users.txt', 'username\n'))
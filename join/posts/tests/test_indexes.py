@@ -0,0 +1,125 @@
+import re
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+
+from core.paginators.keyset import KeysetPaginator
+from .. import timeline
+from ..models import Comment, Follow, Group, Post, UserStats
+
+User = get_user_model()
+
+
+class TestFeedIndexes(TestCase):
+    """Проверяет по EXPLAIN, что запросы лент идут по составным индексам."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='index_author')
+        cls.reader = User.objects.create_user(username='index_reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='index-group', description='Описание')
+        posts = Post.objects.bulk_create([
+            Post(title=f'Пост {i}', text='Текст', author=cls.author,
+                 group=cls.group)
+            for i in range(30)
+        ])
+        cls.post = posts[0]
+        Comment.objects.bulk_create([
+            Comment(post=cls.post, author=cls.reader, text='Комментарий')
+            for _ in range(30)
+        ])
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        if connection.vendor == 'postgresql':
+            # на тестовой таблице в пару десятков строк планировщик
+            # честно выбрал бы полный перебор
+            with connection.cursor() as cursor:
+                cursor.execute('SET enable_seqscan = off')
+
+    def assertUsesIndex(self, queryset, index_name):
+        plan = queryset.explain()
+        self.assertIn(index_name, plan)
+        if connection.vendor == 'postgresql':
+            self.assertRegex(plan, r'Index( Only)? Scan')
+            self.assertNotIn('Seq Scan', plan)
+        elif connection.vendor == 'sqlite':
+            self.assertNotIn('USE TEMP B-TREE FOR ORDER BY', plan)
+
+    def assertNoFullScan(self, plan):
+        if connection.vendor == 'postgresql':
+            self.assertNotIn('Seq Scan', plan)
+        elif connection.vendor == 'sqlite':
+            # SCAN без USING INDEX - перебор всей таблицы
+            self.assertIsNone(
+                re.search(r'\bSCAN (?!.*USING).*$', plan, re.MULTILINE), plan)
+
+    def page_queryset(self, queryset, cursor_from=None):
+        """Запрос страницы ленты так, как его строит KeysetPaginator."""
+        paginator = KeysetPaginator(queryset, 10)
+        ordered = queryset.order_by(*paginator._ordering())
+        if cursor_from is not None:
+            values = [getattr(cursor_from, key) for key in paginator.keys]
+            ordered = ordered.filter(
+                paginator._seek_filter(values, forward=True))
+        return ordered[:11]
+
+    def test_feed_queries_use_indexes(self):
+        """Каждая лента читается по своему индексу."""
+        cases = {
+            'index': (Post.objects.all(), 'post_pub_date_id_idx'),
+            'profile': (Post.objects.filter(author=self.author),
+                        'post_author_pub_date_idx'),
+            'group_posts': (Post.objects.filter(group=self.group),
+                            'post_group_pub_date_idx'),
+        }
+        for name, (queryset, index_name) in cases.items():
+            with self.subTest(feed=name):
+                self.assertUsesIndex(self.page_queryset(queryset), index_name)
+
+    def test_first_page_of_feeds_uses_indexes(self):
+        """Первая страница - простой ORDER BY ... LIMIT по индексу."""
+        self.assertUsesIndex(
+            Post.objects.order_by('-pub_date', '-id')[:11],
+            'post_pub_date_id_idx')
+        self.assertUsesIndex(
+            Post.objects.filter(author=self.author)
+            .order_by('-pub_date', '-id')[:11],
+            'post_author_pub_date_idx')
+
+    def test_post_comments_use_index(self):
+        """Комментарии поста выбираются в порядке вывода по индексу."""
+        self.assertUsesIndex(
+            Comment.objects.filter(post=self.post).order_by(
+                '-created', '-id')[:20],
+            'comment_post_created_idx')
+
+    def test_followers_lookup_uses_index(self):
+        """Раскладка поста ищет подписчиков автора по индексу."""
+        self.assertUsesIndex(
+            Follow.objects.filter(author=self.author).order_by().values_list(
+                'user_id', flat=True),
+            'follow_author_user_idx')
+
+    def test_follow_feed_uses_indexes(self):
+        """Лента подписок читает TimelineEntry по индексу (user, post),
+        а посты «звёзд» - по индексу (author, pub_date), без перебора."""
+        if connection.vendor == 'sqlite':
+            # UNIQUE из CREATE TABLE SQLite индексирует автоиндексом
+            timeline_index = 'sqlite_autoindex_posts_timelineentry'
+        else:
+            timeline_index = 'unique_timeline_user_post'
+        plan = self.page_queryset(
+            timeline.feed_queryset(self.reader)).explain()
+        self.assertIn(timeline_index, plan)
+        self.assertNoFullScan(plan)
+
+        # бывшая «звезда»: посты автора подмешиваются из posts_post
+        UserStats.objects.filter(user=self.author).update(fanout_on_read=True)
+        plan = self.page_queryset(
+            timeline.feed_queryset(self.reader), self.post).explain()
+        self.assertIn(timeline_index, plan)
+        self.assertIn('post_author_pub_date_idx', plan)
+        self.assertNoFullScan(plan)
@@ -1,6 +1,10 @@
 from django.test import TestCase
 from django.contrib.auth import get_user_model
-from ..models import Post, Group, Comment  # подняться на два уровня выше
+from io import StringIO
+from unittest import mock
+from django.db import DatabaseError
+from django.core.management import call_command
+from ..models import Post, Group, Comment, Follow, UserStats  # подняться на два уровня выше
 
 User = get_user_model()
 
@@ -149,3 +153,78 @@ class TestCommentModel(TestCase):
                     expected,
                     f'Verbose_name для поля {field} некорректно!'
                 )
+
+
+class TestUserStatsModel(TestCase):
+    """Тестирует денормализованные счётчики пользователя."""
+
+    def setUp(self):
+        self.author = User.objects.create_user(username='stats_author')
+        self.reader = User.objects.create_user(username='stats_reader')
+
+    def stats(self, user):
+        return UserStats.objects.get(user=user)
+
+    def test_counters_follow_create_and_delete(self):
+        """Счётчики растут при создании и уменьшаются при удалении."""
+        post = Post.objects.create(
+            title='Пост', text='Текст', author=self.author)
+        comment = Comment.objects.create(
+            post=post, author=self.reader, text='Комментарий')
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        author_stats = self.stats(self.author)
+        reader_stats = self.stats(self.reader)
+        self.assertEqual(author_stats.posts_count, 1)
+        self.assertEqual(author_stats.followers_count, 1)
+        self.assertEqual(reader_stats.comments_count, 1)
+        self.assertEqual(reader_stats.following_count, 1)
+        follow.delete()
+        # удаление поста каскадом удаляет и комментарий
+        post.delete()
+        author_stats = self.stats(self.author)
+        reader_stats = self.stats(self.reader)
+        self.assertEqual(author_stats.posts_count, 0)
+        self.assertEqual(author_stats.followers_count, 0)
+        self.assertEqual(reader_stats.comments_count, 0)
+        self.assertEqual(reader_stats.following_count, 0)
+
+    def test_user_delete_cascades(self):
+        """Удаление пользователя с постами и подписками не падает."""
+        Post.objects.create(title='Пост', text='Текст', author=self.author)
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.author.delete()
+        self.assertFalse(UserStats.objects.filter(
+            user_id=self.author.id).exists())
+        self.assertEqual(self.stats(self.reader).following_count, 0)
+
+    def test_failed_counter_rolls_back_save(self):
+        """Строка и её счётчики сохраняются одной транзакцией:
+        упавшее обновление счётчика откатывает и INSERT."""
+        post = Post.objects.create(
+            title='Пост', text='Текст', author=self.author)
+        with mock.patch.object(UserStats, 'bump',
+                               side_effect=DatabaseError('сбой')):
+            with self.assertRaises(DatabaseError):
+                Post.objects.create(
+                    title='Второй', text='Текст', author=self.author)
+            with self.assertRaises(DatabaseError):
+                Comment.objects.create(
+                    post=post, author=self.reader, text='Комментарий')
+            with self.assertRaises(DatabaseError):
+                Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(Post.objects.filter(author=self.author).count(), 1)
+        self.assertEqual(self.stats(self.author).posts_count, 1)
+        self.assertFalse(Comment.objects.exists())
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 0)
+        self.assertFalse(Follow.objects.exists())
+
+    def test_recount_command_repairs_counters(self):
+        """recount_user_stats чинит разошедшиеся счётчики."""
+        Post.objects.create(title='Пост', text='Текст', author=self.author)
+        UserStats.objects.filter(user=self.author).update(posts_count=42)
+        UserStats.objects.filter(user=self.reader).delete()
+        call_command('recount_user_stats', '--batch-size', '1',
+                     stdout=StringIO(), stderr=StringIO())
+        self.assertEqual(self.stats(self.author).posts_count, 1)
+        self.assertEqual(self.stats(self.reader).posts_count, 0)
@@ -0,0 +1,61 @@
+from django.core.cache import cache
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from core.nplusone.testing import QueryBudgetMixin
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class TestViewQueryBudgets(QueryBudgetMixin, TestCase):
+    """Страницы укладываются в заявленный бюджет запросов без N+1.
+
+    Постов и комментариев больше порога детектора, так что обращение
+    к автору или группе в цикле шаблона сразу уронит тест.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.group = Group.objects.create(
+            title='Группа', slug='budget-group', description='Описание')
+        cls.reader = User.objects.create_user(username='budget_reader')
+        authors = [User.objects.create_user(username=f'budget_author_{i}')
+                   for i in range(5)]
+        for i in range(15):
+            Post.objects.create(
+                title=f'Пост {i}', text='Текст', author=authors[i % 5],
+                group=cls.group)
+        cls.author = authors[0]
+        cls.post = Post.objects.filter(author=cls.author).first()
+        for author in authors:
+            Comment.objects.create(
+                post=cls.post, author=author, text='Комментарий')
+            Follow.objects.create(user=cls.reader, author=author)
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def test_pages_within_budget(self):
+        pages = {
+            'posts:index': {},
+            'posts:group_list': {'slug': self.group.slug},
+            'posts:profile': {'username': self.author.username},
+            'posts:post_detail': {'post_id': self.post.pk},
+            'posts:follow_index': {},
+        }
+        for name, kwargs in pages.items():
+            with self.subTest(page=name):
+                response = self.client.get(reverse(name, kwargs=kwargs))
+                self.assertEqual(response.status_code, 200)
+
+    def test_detector_catches_n_plus_one(self):
+        """Сам детектор: обращение к автору в цикле - это N+1."""
+        with self.assertRaises(AssertionError) as error:
+            with self.assertQueryBudget():
+                [post.author.username for post in Post.objects.all()]
+        self.assertIn('test_queries.py', str(error.exception))
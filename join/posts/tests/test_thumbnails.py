@@ -0,0 +1,201 @@
+import io
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from .. import thumbnails
+from ..models import Post
+
+User = get_user_model()
+
+
+def make_image(name='photo.png', size=(120, 80), image_format='PNG',
+               **options):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, 'red').save(buffer, image_format, **options)
+    return SimpleUploadedFile(name, buffer.getvalue())
+
+
+def open_media(url):
+    """Открывает картинку из хранилища по её адресу."""
+    name = url[len(settings.MEDIA_URL):]
+    with default_storage.open(name) as file:
+        image = Image.open(file)
+        image.load()
+    return image
+
+
+# задачи очереди выполняются сразу, без пула процессов
+@override_settings(JOB_QUEUE_WORKERS=0)
+class TestThumbnails(TestCase):
+    """Тестирует заранее построенные миниатюры картинок постов."""
+
+    @classmethod
+    def setUpClass(cls):
+        # медиафайлы - во временном каталоге вне исходников
+        media_root = tempfile.mkdtemp()
+        cls.addClassCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=media_root)
+        override.enable()
+        cls.addClassCleanup(override.disable)
+        super().setUpClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='thumb_author')
+
+    def create_post(self, **kwargs):
+        # миниатюры ставятся в очередь после коммита транзакции
+        with self.captureOnCommitCallbacks(execute=True):
+            post = Post.objects.create(
+                title='С картинкой', text='Текст', author=self.user,
+                **kwargs)
+        post.refresh_from_db()
+        return post
+
+    def test_thumbnail_generated_on_save(self):
+        """После сохранения поста миниатюра готова и записана в пост."""
+        post = self.create_post(image=make_image())
+        self.assertEqual(post.thumbnails['source'], post.image.name)
+        thumb = open_media(post.thumbnails['card'])
+        self.assertEqual(thumb.format, 'JPEG')
+        self.assertEqual(thumb.size, (960, 339))
+
+    def test_srcset_variants(self):
+        """Для каждого формата строятся все ширины не больше исходной."""
+        post = self.create_post(image=make_image(size=(1600, 900)))
+        srcset = post.thumbnails['srcset']
+        self.assertIn('webp', srcset)
+        self.assertIn('jpg', srcset)
+        for extension, candidates in srcset.items():
+            widths = []
+            for candidate in candidates.split(', '):
+                url, width = candidate.split()
+                thumb = open_media(url)
+                self.assertEqual(thumb.width, int(width[:-1]))
+                widths.append(thumb.width)
+            with self.subTest(extension=extension):
+                self.assertEqual(widths, [480, 960, 1440])
+        # маленькую картинку не растягиваем сверх основной ширины
+        post = self.create_post(image=make_image())
+        self.assertNotIn('1440w', post.thumbnails['srcset']['webp'])
+
+    def test_metadata_stripped(self):
+        """EXIF не попадает ни в миниатюры, ни в сохранённый оригинал."""
+        exif = Image.Exif()
+        exif[0x010F] = 'Камера'  # Make
+        post = self.create_post(image=make_image(
+            'photo.jpg', image_format='JPEG', exif=exif.tobytes()))
+        original = open_media(post.image.url)
+        self.assertFalse(original.getexif())
+        self.assertEqual(original.size, (120, 80))
+        for candidates in post.thumbnails['srcset'].values():
+            url = candidates.split(', ')[0].split()[0]
+            self.assertFalse(open_media(url).getexif())
+
+    def test_metadata_stripped_on_upload(self):
+        """Оригинал чистится ещё при сохранении поста - без фоновой
+        задачи (её колбэк здесь не выполняется)."""
+        exif = Image.Exif()
+        exif[0x010F] = 'Камера'
+        post = Post.objects.create(
+            title='Без очереди', text='Текст', author=self.user,
+            image=make_image('gps.jpg', image_format='JPEG',
+                             exif=exif.tobytes()))
+        self.assertEqual(post.thumbnails, {})
+        self.assertFalse(open_media(post.image.url).getexif())
+
+    def test_stored_original_replaced_under_new_name(self):
+        """Старый оригинал с EXIF заменяется копией под новым именем,
+        старый файл удаляется только после переключения поста."""
+        post = self.create_post(image=make_image())
+        exif = Image.Exif()
+        exif[0x010F] = 'Камера'
+        buffer = io.BytesIO()
+        Image.new('RGB', (120, 80), 'red').save(
+            buffer, 'JPEG', exif=exif.tobytes())
+        old_name = default_storage.save(
+            'posts/legacy.jpg', io.BytesIO(buffer.getvalue()))
+        Post.objects.filter(pk=post.pk).update(image=old_name)
+        thumbnails.generate_post_thumbnails(post.pk)
+        post.refresh_from_db()
+        self.assertNotEqual(post.image.name, old_name)
+        self.assertFalse(default_storage.exists(old_name))
+        self.assertFalse(open_media(post.image.url).getexif())
+        self.assertEqual(post.thumbnails['source'], post.image.name)
+
+    def test_regenerated_thumbnails_replace_old_files(self):
+        """Новые миниатюры пишутся рядом со старыми, старые удаляются
+        после того, как пост переключён на новые адреса."""
+        post = self.create_post(image=make_image())
+        old_files = post.thumbnails['files']
+        thumbnails.generate_post_thumbnails(post.pk)
+        post.refresh_from_db()
+        self.assertTrue(set(old_files).isdisjoint(post.thumbnails['files']))
+        for name in old_files:
+            self.assertFalse(default_storage.exists(name))
+        for name in post.thumbnails['files']:
+            self.assertTrue(default_storage.exists(name))
+
+    def test_templates_use_stored_thumbnail(self):
+        """Шаблон выводит сохранённый адрес, не обращаясь к sorl."""
+        post = self.create_post(image=make_image())
+        response = Client().get(
+            reverse('posts:post_detail', args=[post.pk]))
+        self.assertContains(response, post.thumbnails['card'])
+        self.assertContains(response, '<picture>')
+        self.assertContains(
+            response,
+            f'<source type="image/webp" '
+            f'srcset="{post.thumbnails["srcset"]["webp"]}"')
+
+    def test_no_image_no_thumbnails(self):
+        """У поста без картинки миниатюр нет, а убранная картинка
+        забирает их с собой."""
+        self.assertEqual(self.create_post().thumbnails, {})
+        post = self.create_post(image=make_image())
+        post.image = ''
+        post.save()
+        post.refresh_from_db()
+        self.assertEqual(post.thumbnails, {})
+
+    def test_generate_thumbnails_command(self):
+        """Команда достраивает миниатюры старым постам."""
+        post = self.create_post(image=make_image())
+        Post.objects.filter(pk=post.pk).update(thumbnails={})
+        call_command('generate_thumbnails', stdout=io.StringIO())
+        post.refresh_from_db()
+        self.assertIn('card', post.thumbnails)
+
+    @override_settings(JOB_QUEUE_EXTERNAL=True)
+    def test_pending_thumbnails_recovered(self):
+        """Без пула в веб-процессе пост только отмечается, а run_jobs
+        подбирает отметку и строит миниатюры."""
+        post = self.create_post(image=make_image())
+        self.assertTrue(post.thumbnails_pending)
+        self.assertEqual(post.thumbnails, {})
+        call_command('run_jobs', once=True, stdout=io.StringIO())
+        post.refresh_from_db()
+        self.assertFalse(post.thumbnails_pending)
+        self.assertEqual(post.thumbnails['source'], post.image.name)
+
+    @override_settings(JOB_QUEUE_EXTERNAL=True)
+    def test_broken_image_not_retried(self):
+        """Битую картинку run_jobs не пытается обработать снова."""
+        post = self.create_post(image=make_image())
+        with default_storage.open(post.image.name, 'wb') as file:
+            file.write(b'not an image')
+        stdout = io.StringIO()
+        with self.assertLogs('core.jobs.queue', 'ERROR'):
+            call_command('run_jobs', once=True, stdout=stdout)
+        self.assertIn('с ошибкой: 1', stdout.getvalue())
+        post.refresh_from_db()
+        self.assertFalse(post.thumbnails_pending)
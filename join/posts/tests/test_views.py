@@ -1,7 +1,8 @@
 from django.test import TestCase, Client, override_settings
 from django.contrib.auth import get_user_model
 from django.urls import reverse
-from ..models import Post, Group, Follow
+from ..models import (Post, Group, Follow, Tag, TagPost, TimelineEntry,
+                      UserStats)
 from django import forms
 import shutil
 import tempfile
@@ -242,39 +243,35 @@ class TestPostsViews(TestCase):
 
     def test_cache_index_page(self):
         """Проверяет работу кэша на главной странице.
-        
-        Кэширование подключено к шаблону posts/index.html,
-        ключ index_page, под которым данные хранятся в кэше.
+
+        Пока данные не менялись, гости получают страницу из кэша; новый
+        пост меняет поколение кэша 'posts', и страница сразу пересобирается.
         """
-        # на главной странице все посты, значит сейчас все они в кэше
-        # зарегистрированный пользователь заходит на главную стр
-        # добавим новый пост, он должен будет появиться на главной странице
-        # только через 20 секунд
         cache.clear()
+        guest = Client()
+        posts_cache = guest.get(reverse('posts:index')).content
+        # ничего не менялось - другой гость, даже с csrf-cookie после
+        # формы входа, получает ту же страницу из кэша без рендеринга
+        other_guest = Client()
+        other_guest.cookies['csrftoken'] = 'x' * 32
+        cached_response = other_guest.get(reverse('posts:index'))
+        self.assertEqual(posts_cache, cached_response.content)
+        self.assertIsNone(cached_response.context)
+        # авторизованному пользователю страница рендерится со своей шапкой
         response = self.another_user.get(reverse('posts:index'))
-        posts_cache = response.content
-        new_post = Post.objects.create(
+        self.assertIsNotNone(response.context)
+        self.assertContains(response, 'Выйти')
+        Post.objects.create(
             title='Новый пост',
             anons='Новый анонс',
             text='Здест текст',
             group=TestPostsViews.group,
             author=TestPostsViews.user,
         )
-        # зарегистрированный пользователь заходит на главную стр после
-        # создания поста, кэша ещё нет, он сейчас будет записываться с постом
-        #new_post.delete()
-        # зарегистрированный пользователь заходит на главную стр после удаления поста
-        second_response = self.another_user.get(reverse('posts:index'))
-        second_posts = second_response.content
-        # но т к 20 секунд не прошло, контекст страницы должен совпасть 
-        self.assertEqual(posts_cache, second_posts)
-        # теперь очистим кэш и перезайдем на главную страницу
-        cache.clear()
-        new_response = self.another_user.get(reverse('posts:index'))
-        # кэш перезаписался, теперь там ещё один пост,
-        # результат первоначального кэша и нового не должен совпадать
+        # новый пост сбросил кэш, ждать истечения TTL не нужно
+        new_response = guest.get(reverse('posts:index'))
         self.assertNotEqual(posts_cache, new_response.content)
-
+        self.assertIn('Новый анонс', new_response.content.decode())
 
 
 @override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
@@ -359,6 +356,60 @@ class TestPaginator(TestCase):
                 # тест на кол-во объектов на второй странице = 5
                 self.assertEqual(len(response2.context['page_obj']), 5)
 
+    def test_keyset_paginator(self):
+        """Тестирует листание ленты курсорами ?after= / ?before=."""
+        cache.clear()
+        reverse_names_pages = [
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.user.username})
+        ]
+        for reverse_name in reverse_names_pages:
+            with self.subTest(reverse_name=reverse_name):
+                first_page = self.user_auth.get(reverse_name).context['page_obj']
+                self.assertEqual(len(first_page), 10)
+                self.assertFalse(first_page.has_previous())
+                # переходим на следующую страницу по курсору последнего поста
+                second_page = self.user_auth.get(
+                    reverse_name, {'after': first_page.next_cursor}
+                ).context['page_obj']
+                self.assertEqual(len(second_page), 5)
+                self.assertFalse(second_page.has_next())
+                # посты на страницах не повторяются
+                self.assertFalse(
+                    set(first_page.object_list) & set(second_page.object_list))
+                # и возвращаемся обратно
+                back_page = self.user_auth.get(
+                    reverse_name, {'before': second_page.previous_cursor}
+                ).context['page_obj']
+                self.assertEqual(back_page.object_list, first_page.object_list)
+
+    def test_keyset_paginator_keeps_query(self):
+        """Ссылки листания сохраняют остальные параметры адреса."""
+        cache.clear()
+        response = self.user_auth.get(reverse('posts:index'), {'q': 'пост'})
+        page_obj = response.context['page_obj']
+        self.assertContains(
+            response, f'?q=%D0%BF%D0%BE%D1%81%D1%82&amp;after='
+                      f'{page_obj.next_cursor}')
+        response = self.user_auth.get(
+            reverse('posts:index'), {'q': 'пост', 'after': page_obj.next_cursor})
+        page_obj = response.context['page_obj']
+        self.assertContains(
+            response, f'?q=%D0%BF%D0%BE%D1%81%D1%82&amp;before='
+                      f'{page_obj.previous_cursor}')
+        self.assertContains(
+            response, 'href="?q=%D0%BF%D0%BE%D1%81%D1%82">Первая')
+
+    def test_keyset_paginator_broken_cursor(self):
+        """Испорченный курсор открывает первую страницу, а не 500."""
+        response = self.user_auth.get(
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            {'after': 'not-a-cursor'}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['page_obj']), 10)
+
 
 class TestFollow(TestCase):
     """Тестирует сервис подписки/отписки на автора."""
@@ -448,3 +499,147 @@ class TestFollow(TestCase):
         )
         response = self.one_more.get(reverse('posts:follow_index'))
         self.assertNotIn(post, response.context['page_obj'].object_list)
+
+    def test_unfollow_removes_posts_from_feed(self):
+        """Тест: после отписки посты автора пропадают из ленты."""
+        self.auth_user.get(reverse(
+            'posts:profile_follow', kwargs={'username': TestFollow.user.username}))
+        response = self.auth_user.get(reverse('posts:follow_index'))
+        self.assertIn(TestFollow.post, response.context['page_obj'].object_list)
+        self.auth_user.get(reverse(
+            'posts:profile_unfollow', kwargs={'username': TestFollow.user.username}))
+        response = self.auth_user.get(reverse('posts:follow_index'))
+        self.assertNotIn(TestFollow.post, response.context['page_obj'].object_list)
+        self.assertFalse(TimelineEntry.objects.filter(
+            user=TestFollow.another_user).exists())
+
+    def test_celebrity_posts_are_read_on_the_fly(self):
+        """Тест: посты «звёзд» не раскладываются, но видны в ленте."""
+        with override_settings(TIMELINE_FANOUT_LIMIT=0):
+            Follow.objects.create(
+                user=TestFollow.another_user,
+                author=TestFollow.user
+            )
+            post = Post.objects.create(
+                title='Пост звезды',
+                text='Здесь текст',
+                author=TestFollow.user
+            )
+            self.assertFalse(TimelineEntry.objects.filter(post=post).exists())
+            response = self.auth_user.get(reverse('posts:follow_index'))
+            self.assertIn(post, response.context['page_obj'].object_list)
+            self.assertIn(
+                TestFollow.post, response.context['page_obj'].object_list)
+
+    @override_settings(JOB_QUEUE_WORKERS=0)
+    def test_former_celebrity_posts_stay_in_feed(self):
+        """Тест: когда «звезда» опускается до порога, посты, написанные
+        без раскладки, остаются в ленте и раскладываются по ней."""
+        Follow.objects.create(
+            user=TestFollow.another_user, author=TestFollow.user)
+        with override_settings(TIMELINE_FANOUT_LIMIT=1):
+            Follow.objects.create(
+                user=TestFollow.third_user, author=TestFollow.user)
+            post = Post.objects.create(
+                title='Пост звезды', text='Здесь текст',
+                author=TestFollow.user)
+            self.assertFalse(TimelineEntry.objects.filter(post=post).exists())
+            # задача раскладки ещё не выполнилась - пост читается из Post
+            with self.captureOnCommitCallbacks(execute=False):
+                Follow.objects.filter(user=TestFollow.third_user).delete()
+            response = self.auth_user.get(reverse('posts:follow_index'))
+            self.assertIn(post, response.context['page_obj'].object_list)
+            # то же с выполненной задачей: посты разложены, отметка снята
+            with self.captureOnCommitCallbacks(execute=True):
+                Follow.objects.create(
+                    user=TestFollow.third_user, author=TestFollow.user)
+                Follow.objects.filter(user=TestFollow.third_user).delete()
+            self.assertTrue(TimelineEntry.objects.filter(
+                user=TestFollow.another_user, post=post).exists())
+            self.assertFalse(
+                UserStats.objects.get(user=TestFollow.user).fanout_on_read)
+            response = self.auth_user.get(reverse('posts:follow_index'))
+            self.assertIn(post, response.context['page_obj'].object_list)
+
+
+class TestSearch(TestCase):
+    """Тестирует полнотекстовый поиск по постам."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Search_author')
+        cls.title_post = Post.objects.create(
+            title='Мандарины',
+            text='Новогодний рецепт салата.',
+            author=cls.user
+        )
+        cls.text_post = Post.objects.create(
+            title='Рецепты',
+            anons='Зимние десерты',
+            text='Мандарины <b>в шоколаде</b> к чаю.',
+            author=cls.user
+        )
+        cls.other_post = Post.objects.create(
+            title='Совсем другое',
+            text='Про погоду и пробки.',
+            author=cls.user
+        )
+        cls.tag = Tag.objects.create(name='цитрусы')
+        TagPost.objects.create(post=cls.other_post, tag=cls.tag)
+
+    def setUp(self):
+        self.visitor = Client()
+
+    def test_search_ranks_title_first(self):
+        """Совпадение в заголовке выше совпадения в тексте."""
+        response = self.visitor.get(reverse('posts:search'), {'q': 'мандарины'})
+        posts = list(response.context['page_obj'])
+        self.assertEqual(posts, [self.title_post, self.text_post])
+
+    def test_search_by_anons_and_tag(self):
+        """Ищутся анонс и названия тэгов."""
+        for keyword, expected in (('десерты', self.text_post),
+                                  ('цитрусы', self.other_post)):
+            with self.subTest(keyword=keyword):
+                response = self.visitor.get(
+                    reverse('posts:search'), {'q': keyword})
+                self.assertEqual(list(response.context['page_obj']), [expected])
+
+    def test_search_document_follows_post_changes(self):
+        """Документ пересобирается при правке поста и удалении тэга."""
+        self.other_post.text = 'Теперь про апельсины.'
+        self.other_post.save()
+        TagPost.objects.filter(post=self.other_post).delete()
+        response = self.visitor.get(reverse('posts:search'), {'q': 'апельсины'})
+        self.assertEqual(list(response.context['page_obj']), [self.other_post])
+        response = self.visitor.get(reverse('posts:search'), {'q': 'цитрусы'})
+        self.assertEqual(list(response.context['page_obj']), [])
+
+    def test_deleted_post_leaves_search(self):
+        """Удалённый пост (вместе с тэгами) пропадает из поиска."""
+        post = Post.objects.create(
+            title='Временный', text='Клементины', author=self.user)
+        TagPost.objects.create(post=post, tag=self.tag)
+        post.delete()
+        response = self.visitor.get(reverse('posts:search'), {'q': 'клементины'})
+        self.assertEqual(list(response.context['page_obj']), [])
+
+    def test_search_snippet_is_escaped(self):
+        """Во фрагменте подсвечено слово, а HTML из текста экранирован."""
+        response = self.visitor.get(reverse('posts:search'), {'q': 'шоколаде'})
+        snippet = response.context['page_obj'][0].snippet
+        self.assertIn('<mark>шоколаде</mark>', snippet)
+        self.assertIn('&lt;b&gt;', snippet)
+
+    def test_search_syntax_is_not_an_error(self):
+        """Спецсимволы в запросе не ломают поиск."""
+        response = self.visitor.get(
+            reverse('posts:search'), {'q': '"мандарины* OR (NEAR'})
+        self.assertEqual(response.status_code, 200)
+
+    def test_api_search(self):
+        """?search= в API ищет тем же полнотекстовым поиском."""
+        response = self.visitor.get('/api/v1/posts/', {'search': 'мандарины'})
+        titles = [post['title'] for post in response.json()['response']]
+        self.assertEqual(titles, [self.title_post.title, self.text_post.title])
@@ -0,0 +1,264 @@
+"""Миниатюры картинок постов.
+
+Миниатюры строятся заранее, сразу после сохранения поста, в фоновой
+очереди (core/jobs/queue.py), а их адреса записываются в Post.thumbnails.
+Шаблоны выводят готовые адреса и не обращаются к sorl-thumbnail и Pillow
+во время запроса.
+
+Для карточки поста строится несколько ширин в WebP (и в AVIF, если
+Pillow умеет его сохранять) плюс JPEG для старых браузеров; шаблон
+includes/post_image.html отдаёт их через <picture> и srcset, и телефон
+скачивает картинку своей ширины, а не 960px. Метаданные (EXIF с
+геопозицией, профили камер) из миниатюр не переносятся, а из оригинала
+вычищаются ещё при загрузке, до записи файла в хранилище
+(clean_upload, сигнал pre_save в posts/signals.py).
+
+Файлы в хранилище не перезаписываются: новая версия картинки или
+миниатюры пишется под новым именем, пост переключается на неё одним
+UPDATE, и только потом удаляются старые файлы. Поэтому окна, когда
+адрес из поста отдаёт 404, нет, а неудачная запись не теряет картинку.
+"""
+import io
+import os
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from core.cache.generations import bump_generation
+from core.jobs.queue import enqueue
+
+from .models import Post, UserStats
+
+try:
+    # AVIF в Pillow появляется с плагином pillow-avif-plugin
+    import pillow_avif  # noqa: F401
+except ImportError:
+    pass
+
+# Пропорции карточки поста и основная ширина - её JPEG остаётся
+# в Post.thumbnails['card'] как адрес по умолчанию
+CARD_SIZE = (960, 339)
+# Ширины для srcset. Ширины больше исходной картинки не строятся,
+# кроме основной
+CARD_WIDTHS = (480, 960, 1440)
+# Форматы в порядке предпочтения браузером: формат Pillow,
+# расширение файла и параметры сохранения
+IMAGE_FORMATS = (
+    ('AVIF', 'avif', {'quality': 60, 'speed': 6}),
+    ('WEBP', 'webp', {'quality': 80, 'method': 6}),
+    ('JPEG', 'jpg', {'quality': 85, 'optimize': True, 'progressive': True}),
+)
+# исходники в этих форматах пересохраняются без метаданных
+STRIP_FORMATS = ('JPEG', 'PNG', 'WEBP')
+THUMBNAIL_DIR = 'thumbs'
+EXIF_ORIENTATION = 0x0112
+# Сколько отмеченных постов run_jobs берёт за один опрос
+PENDING_BATCH_SIZE = 1000
+
+
+def available_formats():
+    """Форматы из IMAGE_FORMATS, которые установленный Pillow умеет писать."""
+    Image.init()
+    return [item for item in IMAGE_FORMATS if item[0] in Image.SAVE]
+
+
+def card_widths(source_width):
+    """Ширины миниатюр для картинки шириной source_width."""
+    base = CARD_SIZE[0]
+    return sorted({
+        width for width in CARD_WIDTHS
+        if width <= max(source_width, base)
+    } | {base})
+
+
+def card_size(width):
+    """Размер миниатюры заданной ширины в пропорциях карточки."""
+    base_width, base_height = CARD_SIZE
+    return width, round(width * base_height / base_width)
+
+
+def thumbnail_name(image_name, size, extension='jpg'):
+    """Имя файла миниатюры в хранилище: thumbs/posts/<имя>_960x339.jpg."""
+    base, _ = os.path.splitext(image_name)
+    width, height = size
+    return f'{THUMBNAIL_DIR}/{base}_{width}x{height}.{extension}'
+
+
+def render_thumbnail(image, size, image_format='JPEG', **options):
+    """Обрезает картинку по центру до size (с увеличением) и кодирует.
+
+    Повторяет то, что делал {% thumbnail ... crop="center" upscale=True %}.
+    exif и icc_profile в save() не передаются, поэтому метаданных
+    в миниатюре нет.
+    """
+    thumb = ImageOps.fit(image, size, Image.LANCZOS, centering=(0.5, 0.5))
+    if thumb.mode != 'RGB':
+        thumb = thumb.convert('RGB')
+    buffer = io.BytesIO()
+    thumb.save(buffer, image_format, **options)
+    return buffer.getvalue()
+
+
+def _save(name, content):
+    # существующий файл не трогаем: при совпадении имени хранилище
+    # подберёт свободное (name_<случайный суффикс>)
+    return default_storage.save(name, ContentFile(content))
+
+
+def _delete(names):
+    for name in names:
+        default_storage.delete(name)
+
+
+def _has_metadata(image):
+    return bool(image.info.get('exif') or image.getexif()
+                or image.info.get('xmp')
+                or image.info.get('XML:com.adobe.xmp'))
+
+
+def strip_metadata(image):
+    """Байты картинки, пересохранённой без EXIF и прочих метаданных,
+    или None, если чистить нечего.
+
+    Анимированные картинки и форматы не из STRIP_FORMATS не трогаем.
+    """
+    if image.format not in STRIP_FORMATS or getattr(image, 'is_animated',
+                                                    False):
+        return None
+    if not _has_metadata(image):
+        return None
+    options = {}
+    if image.getexif().get(EXIF_ORIENTATION, 1) != 1:
+        # поворот из EXIF применяем к пикселям, иначе без метаданных
+        # картинка ляжет набок
+        clean = ImageOps.exif_transpose(image)
+        if image.format == 'JPEG':
+            options = {'quality': 95}
+    else:
+        clean = image
+        if image.format == 'JPEG':
+            # без повторной потери качества: таблицы квантования исходника
+            options = {'quality': 'keep'}
+    buffer = io.BytesIO()
+    clean.save(buffer, image.format, **options)
+    return buffer.getvalue()
+
+
+def clean_upload(upload):
+    """Загруженный файл без метаданных - до того, как он попадёт
+    в хранилище. Возвращает upload, если чистить нечего."""
+    try:
+        upload.seek(0)
+        image = Image.open(upload)
+        image.load()
+    except (OSError, ValueError, Image.DecompressionBombError):
+        # не картинка - это забота валидатора ImageField
+        upload.seek(0)
+        return upload
+    content = strip_metadata(image)
+    upload.seek(0)
+    if content is None:
+        return upload
+    return ContentFile(content, name=os.path.basename(upload.name))
+
+
+def _strip_stored_original(post_id, image_name, image):
+    """Чистит метаданные оригинала, загруженного до clean_upload
+    (старые посты, импорт): чистая копия пишется под новым именем,
+    пост переключается на неё, старый файл удаляется.
+
+    Возвращает имя картинки поста после чистки.
+    """
+    content = strip_metadata(image)
+    if content is None:
+        return image_name
+    clean_name = _save(image_name, content)
+    switched = Post.objects.filter(pk=post_id, image=image_name).update(
+        image=clean_name, updated=timezone.now())
+    if not switched:
+        # картинку поста успели заменить - наша копия не нужна
+        _delete([clean_name])
+        return None
+    _delete([image_name])
+    return clean_name
+
+
+def generate_post_thumbnails(post_id):
+    """Фоновая задача: строит миниатюры поста и сохраняет их адреса.
+
+    Возвращает словарь Post.thumbnails:
+    {'source': имя картинки, 'card': адрес JPEG 960x339,
+     'srcset': {'webp': 'адрес 480w, адрес 960w, ...', ...}}
+    или None, если картинки нет.
+    """
+    post = Post.objects.filter(pk=post_id).only(
+        'image', 'author', 'thumbnails').first()
+    if post is None:
+        return None
+    if not post.image:
+        Post.objects.filter(pk=post_id, image='').update(
+            thumbnails_pending=False)
+        return None
+    image_name = post.image.name
+    try:
+        with default_storage.open(image_name) as source:
+            image = Image.open(source)
+            image.load()
+    except OSError:
+        # файла нет или это не картинка - повторять задачу бесполезно
+        Post.objects.filter(pk=post_id, image=image_name).update(
+            thumbnails_pending=False)
+        raise
+    image_name = _strip_stored_original(post_id, image_name, image)
+    if image_name is None:
+        return None
+    # учитываем поворот из EXIF, как это делает камера телефона
+    image = ImageOps.exif_transpose(image)
+    thumbnails = {'source': image_name, 'srcset': {}, 'files': []}
+    for image_format, extension, options in available_formats():
+        candidates = []
+        for width in card_widths(image.width):
+            size = card_size(width)
+            name = _save(
+                thumbnail_name(image_name, size, extension),
+                render_thumbnail(image, size, image_format, **options))
+            thumbnails['files'].append(name)
+            url = default_storage.url(name)
+            candidates.append(f'{url} {width}w')
+            if image_format == 'JPEG' and size == CARD_SIZE:
+                thumbnails['card'] = url
+        thumbnails['srcset'][extension] = ', '.join(candidates)
+    # update() без сигналов; условие по image - на случай, если пока
+    # строились миниатюры, картинку поста успели заменить
+    updated = Post.objects.filter(pk=post_id, image=image_name).update(
+        thumbnails=thumbnails, thumbnails_pending=False,
+        updated=timezone.now())
+    if not updated:
+        _delete(thumbnails['files'])
+        return None
+    # прежние миниатюры больше нигде не указаны
+    _delete(set((post.thumbnails or {}).get('files', ()))
+            - set(thumbnails['files']))
+    # закэшированные страницы ленты должны получить новые адреса
+    bump_generation('posts')
+    UserStats.touch_feed(post.author_id)
+    return thumbnails
+
+
+def enqueue_pending():
+    """Ставит в очередь миниатюры отмеченных постов (для run_jobs),
+    возвращает Future."""
+    post_ids = (
+        Post.objects.filter(thumbnails_pending=True)
+        .order_by('id').values_list('id', flat=True)[:PENDING_BATCH_SIZE]
+    )
+    return [enqueue(generate_post_thumbnails, post_id)
+            for post_id in post_ids]
+
+
+def needs_thumbnails(post):
+    """Миниатюры поста отсутствуют или построены для другой картинки."""
+    return bool(post.image) and (
+        (post.thumbnails or {}).get('source') != post.image.name)
@@ -0,0 +1,188 @@
+"""Лента подписок: fan-out on write с подмешиванием при чтении.
+
+Обычные авторы раскладывают новый пост по лентам подписчиков в момент
+публикации (TimelineEntry), поэтому follow_index читает ленту по индексу
+(user, post). У «звёзд» - авторов, у которых подписчиков больше
+TIMELINE_FANOUT_LIMIT, - раскладка стоила бы слишком дорого, их посты
+добавляются в ленту при чтении (fan-out on read).
+
+Пропущенная раскладка отмечается в UserStats.fanout_on_read. Когда
+подписчиков у автора снова становится не больше порога, catch_up()
+в фоновой очереди раскладывает его последние посты по лентам всех
+подписчиков и снимает отметку; до тех пор (и если задача потерялась)
+посты автора по-прежнему подмешиваются при чтении и из ленты не
+пропадают. Отмеченных авторов, которых задача не дождалась, доводит
+catch_up_pending() (python manage.py recount_user_stats).
+"""
+from django.conf import settings
+from django.db.models import Q
+
+from core.jobs.queue import enqueue
+
+from .models import Follow, Post, TimelineEntry, UserStats
+
+# Размер пачки для bulk_create
+BATCH_SIZE = 1000
+
+
+def fanout_limit():
+    """Порог числа подписчиков, после которого автор считается «звездой»."""
+    return getattr(settings, 'TIMELINE_FANOUT_LIMIT', 5000)
+
+
+def backfill_size():
+    """Сколько последних постов автора добавить в ленту при подписке."""
+    return getattr(settings, 'TIMELINE_BACKFILL_SIZE', 200)
+
+
+def is_celebrity(author_id):
+    """Проверяет, слишком ли много у автора подписчиков для раскладки."""
+    # число подписчиков берём из денормализованного счётчика
+    return UserStats.objects.filter(
+        user_id=author_id, followers_count__gt=fanout_limit()).exists()
+
+
+def _mark_fanout_on_read(author_id):
+    """Раскладка постов автора пропущена - лента читает их из Post."""
+    UserStats.objects.filter(
+        user_id=author_id, fanout_on_read=False).update(fanout_on_read=True)
+
+
+def celebrities_followed_by(user):
+    """Возвращает id авторов, на которых подписан пользователь и чьи
+    посты лента берёт прямо из таблицы постов: «звёзд» и бывших
+    «звёзд», посты которых ещё не разложены по лентам."""
+    return list(
+        UserStats.objects
+        .filter(user__following__user=user)
+        .filter(Q(followers_count__gt=fanout_limit())
+                | Q(fanout_on_read=True))
+        .values_list('user_id', flat=True)
+    )
+
+
+def _followers(author_id):
+    """id подписчиков автора, читаются порциями."""
+    return (
+        Follow.objects.filter(author_id=author_id)
+        # порядок не важен, без сортировки читается один индекс
+        .order_by()
+        .values_list('user_id', flat=True)
+        .iterator(chunk_size=BATCH_SIZE)
+    )
+
+
+def _write_entries(author_id, follower_ids, post_ids):
+    """Пишет записи лент (подписчик x пост) пачками по BATCH_SIZE;
+    уже существующие пропускает ignore_conflicts."""
+    entries = []
+    for user_id in follower_ids:
+        for post_id in post_ids:
+            entries.append(TimelineEntry(
+                user_id=user_id, post_id=post_id, author_id=author_id))
+        if len(entries) >= BATCH_SIZE:
+            TimelineEntry.objects.bulk_create(
+                entries, batch_size=BATCH_SIZE, ignore_conflicts=True)
+            entries = []
+    if entries:
+        TimelineEntry.objects.bulk_create(
+            entries, batch_size=BATCH_SIZE, ignore_conflicts=True)
+
+
+def fan_out_post(post):
+    """Раскладывает новый пост по лентам подписчиков автора."""
+    fan_out_posts(post.author_id, [post.pk])
+
+
+def fan_out_posts(author_id, post_ids):
+    """Раскладывает несколько новых постов одного автора.
+
+    Подписчики читаются один раз на все посты - так пачка постов
+    из api/v1/posts/bulk/ стоит столько же запросов, сколько один пост.
+    """
+    if not post_ids:
+        return
+    if is_celebrity(author_id):
+        _mark_fanout_on_read(author_id)
+        return
+    _write_entries(author_id, _followers(author_id), post_ids)
+
+
+def _recent_post_ids(author_id):
+    return list(
+        Post.objects.filter(author_id=author_id)
+        .order_by('-pub_date', '-id')
+        .values_list('id', flat=True)[:backfill_size()]
+    )
+
+
+def backfill(user_id, author_id):
+    """Добавляет в ленту нового подписчика последние посты автора."""
+    if is_celebrity(author_id):
+        _mark_fanout_on_read(author_id)
+        return
+    _write_entries(author_id, [user_id], _recent_post_ids(author_id))
+
+
+def needs_catch_up(author_id):
+    """Автор перестал быть «звездой», а его посты ещё не разложены."""
+    return UserStats.objects.filter(
+        user_id=author_id, fanout_on_read=True,
+        followers_count__lte=fanout_limit()).exists()
+
+
+def catch_up(author_id):
+    """Фоновая задача: раскладывает последние посты бывшей «звезды»
+    по лентам всех подписчиков и снимает fanout_on_read.
+
+    Новые посты, появившиеся за время работы, раскладываются обычным
+    порядком, повторные записи пропускает ignore_conflicts.
+    """
+    if is_celebrity(author_id):
+        return False
+    _write_entries(author_id, _followers(author_id),
+                   _recent_post_ids(author_id))
+    # если автор за это время снова стал «звездой», отметка остаётся
+    return bool(UserStats.objects.filter(
+        user_id=author_id, followers_count__lte=fanout_limit()
+    ).update(fanout_on_read=False))
+
+
+def _pending_authors():
+    """Отмеченные авторы, которые уже не «звёзды»."""
+    return list(
+        UserStats.objects.filter(
+            fanout_on_read=True, followers_count__lte=fanout_limit())
+        .values_list('user_id', flat=True))
+
+
+def catch_up_pending():
+    """Доводит всех отмеченных авторов, которые уже не «звёзды»
+    (например, если задача catch_up потерялась). Возвращает их число."""
+    return sum(catch_up(author_id) for author_id in _pending_authors())
+
+
+def enqueue_catch_up_pending():
+    """То же в фоновой очереди (для run_jobs), возвращает Future."""
+    return [enqueue(catch_up, author_id) for author_id in _pending_authors()]
+
+
+def trim(user_id, author_id):
+    """Убирает из ленты отписавшегося пользователя посты автора."""
+    TimelineEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def feed_queryset(user):
+    """Возвращает посты ленты подписок пользователя.
+
+    Посты обычных авторов берутся из материализованной ленты,
+    посты «звёзд» (и ещё не разложенных бывших «звёзд») - напрямую
+    из таблицы постов.
+    """
+    celebrities = celebrities_followed_by(user)
+    if not celebrities:
+        return Post.objects.filter(timeline_entries__user=user)
+    return Post.objects.filter(
+        Q(id__in=TimelineEntry.objects.filter(user=user).values('post_id'))
+        | Q(author_id__in=celebrities)
+    )
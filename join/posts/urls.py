@@ -35,6 +35,8 @@ urlpatterns = [
     # Django ожидает строковое значение и преобразует его
     # в представление — переменную username.
     path('posts/<int:post_id>/comment/', views.add_comment, name='add_comment'),
+    path('posts/<int:post_id>/comments/', views.post_comments,
+         name='post_comments'),
     path('posts/<int:post_id>/edit/', views.post_edit, name='post_edit'),
     path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
     # Django ожидает целочисленное значение и преобразует его
@@ -1,14 +1,18 @@
 from django.shortcuts import render, get_object_or_404, redirect, get_list_or_404
-from django.http import HttpResponse
+from django.http import Http404, HttpResponse
 from django.template import loader
-from django.db.models import Q
 
-from .models import Post, Group, User, Comment, Follow
+from .models import Post, Group, User, Comment, Follow, UserStats
 import datetime
-from django.core.paginator import Paginator
+from core.paginators.estimated import EstimatedCountPaginator
+from core.paginators.keyset import InvalidCursor, KeysetPaginator
 from .forms import PostForm, CommentForm
+from . import conditional, search, timeline
 from django.contrib.auth.decorators import login_required
-from django.views.decorators.cache import cache_page
+from django.conf import settings
+from core.cache.conditional import conditional_page
+from core.cache.generations import cache_page_generation
+from core.decorators.craft_decorators import query_budget
 from django.http import JsonResponse
 
 from api.serializer import PostSerializer
@@ -16,28 +20,59 @@ from rest_framework import status
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 
-# Число в аргументе указывает, сколько секунд надо хранить значение в кеше
-@cache_page(20)
-# добавила кеширование в шаблон, только список постов, не всю страницу
+# Сколько постов показывать на одной странице ленты
+POSTS_PER_PAGE = 10
+# Сколько комментариев показывать на странице поста и подгружать
+# кнопкой «Показать ещё»
+COMMENTS_PER_PAGE = 20
+
+
+def get_page_obj(request, posts_list):
+    """Возвращает страницу ленты постов.
+
+    По умолчанию лента листается курсорами ?after= / ?before= по ключу
+    (pub_date, id): без COUNT(*) и OFFSET, любая страница стоит как первая.
+    Старые ссылки вида ?page=N по-прежнему листаются по номерам,
+    с приблизительным числом страниц.
+    """
+    page_number = request.GET.get('page')
+    if page_number:
+        paginator = EstimatedCountPaginator(
+            posts_list.order_by('-pub_date', '-id'), POSTS_PER_PAGE)
+        return paginator.get_page(page_number)
+    paginator = KeysetPaginator(posts_list, POSTS_PER_PAGE)
+    return paginator.get_page(
+        after=request.GET.get('after'),
+        before=request.GET.get('before')
+    )
+
+
+# Страница для гостей хранится в общем для всех воркеров кэше
+# (авторизованным рендерится заново). Срок хранения длинный:
+# любое сохранение/удаление поста, комментария или группы меняет
+# поколение 'posts' (см. posts/signals.py), и старая страница
+# перестаёт читаться сразу же
+# @query_budget - сколько запросов к БД может сделать страница;
+# проверяется в posts/tests/test_queries.py
+@query_budget(5)
+@cache_page_generation(settings.POSTS_PAGE_CACHE_TIMEOUT, namespace='posts')
 def index(request):
     """Главная страница сайта."""
     # поиск на главной странице
     keyword = request.GET.get('q', None)
     if keyword:  # если слово существует, True
-        posts = Post.objects.select_related('author', 'group').filter(
-            text__contains=keyword)
-        # поля в кавычках 'author', 'group', переменная без кавычек keyword
+        # лучшие совпадения полнотекстового поиска, одна страница
+        posts = search.search_posts(keyword).select_related(
+            'author', 'group')[:POSTS_PER_PAGE]
+        posts = search.highlight(posts, keyword)
     else:
         posts = None
         #posts = Post.objects.all().order_by('-pub_date')
 
-    posts_list = Post.objects.all().order_by('-pub_date')
-    # Показывать по 10 записей на странице.
-    paginator = Paginator(posts_list, 10)
-    # Из URL извлекаем номер запрошенной страницы - это значение параметра page
-    page_number = request.GET.get('page')
-    # Получаем набор записей для страницы с запрошенным номером
-    page_obj = paginator.get_page(page_number)
+    # автор и группа каждого поста приходят JOIN-ом, без N+1 в шаблоне
+    posts_list = Post.objects.select_related('author', 'group')
+    # Показывать по 10 записей на странице, листаем курсорами из URL
+    page_obj = get_page_obj(request, posts_list)
 
     context = {
         'page_obj': page_obj,
@@ -61,12 +96,11 @@ def index(request):
         # posts = None
 
 
+@query_budget(6)
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    posts_list = Post.objects.filter(group=group).order_by('-pub_date')
-    paginator = Paginator(posts_list, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    posts_list = Post.objects.filter(group=group).select_related('author')
+    page_obj = get_page_obj(request, posts_list)
     context = {
         'group': group,
         'page_obj': page_obj
@@ -98,6 +132,10 @@ def all_groups(request):
     # список всех групп
 
 
+# @conditional_page - ответ 304 без рендеринга, если лента автора,
+# его счётчики и кнопка подписки не изменились (posts/conditional.py)
+@query_budget(8)
+@conditional_page(conditional.profile)
 def profile(request, username):
     """На странице профиля будут отображаться все посты автора.
     А так же ник автора.
@@ -106,10 +144,10 @@ def profile(request, username):
     # эта запись значит получить из модели User объект с
     # username=username или, если такого нет в базе,
     # вернуть страницу 404
-    posts_author = author.posts.all().order_by('-pub_date')
-    paginator = Paginator(posts_author, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    posts_author = author.posts.select_related('group').order_by('-pub_date')
+    page_obj = get_page_obj(request, posts_author)
+    # число постов и подписчиков - из счётчиков, без COUNT(*)
+    stats = UserStats.for_user(author)
     # тк возможность подписки на автора доступна только
     # зарегистрированным пользователям, нужно проверить,
     # зарегистрирован ли текущий пользователь
@@ -129,21 +167,29 @@ def profile(request, username):
         'author': author,
         'page_obj': page_obj,
         'posts_author': posts_author,
+        'stats': stats,
         'following': following
     }
     return render(request, 'posts/profile.html', context)
 
 
+@query_budget(6)
+@conditional_page(conditional.post_detail)
 def post_detail(request, post_id):
     """Возвращает конкретный пост автора и кол-во постов,
     написанных автором.
     """
-    post = get_object_or_404(Post, id=post_id)  # pk or id
+    post = get_object_or_404(
+        Post.objects.select_related('author__stats', 'group'), id=post_id)
     # эта запись значит получить из модели Post объект с pk=post_id
     # или, если такого нет в базе, вернуть страницу 404
-    posts_count = Post.objects.filter(author_id=post.author_id).count()
+    # число постов автора берём из счётчика, он приходит тем же запросом
+    posts_count = UserStats.for_user(post.author).posts_count
     comment_form = CommentForm()
-    comments = Comment.objects.filter(post_id=post_id) # ?????
+    # только первая порция комментариев, остальные - по кнопке
+    # «Показать ещё» (post_comments); общее число - из счётчика поста
+    comments = comments_paginator(post_id).get_page(
+        after=request.GET.get('after'))
     context = {
         'post': post,
         'posts_count': posts_count,
@@ -152,6 +198,33 @@ def post_detail(request, post_id):
     }
     return render(request, 'posts/post_detail.html', context)
 
+
+def comments_paginator(post_id):
+    """Комментарии поста, новые первыми, листаются по ключу
+    (created, id) - по индексу comment_post_created_idx, без OFFSET."""
+    return KeysetPaginator(
+        Comment.objects.filter(post_id=post_id).select_related('author'),
+        COMMENTS_PER_PAGE, keys=('created', 'id'))
+
+
+@query_budget(5)
+@conditional_page(conditional.post_comments)
+def post_comments(request, post_id):
+    """HTML-фрагмент со следующей порцией комментариев поста
+    после курсора ?after= - для кнопки «Показать ещё»."""
+    try:
+        comments = comments_paginator(post_id).page(
+            after=request.GET.get('after'))
+    except InvalidCursor:
+        raise Http404('Неверный курсор')
+    if not comments and not Post.objects.filter(pk=post_id).exists():
+        raise Http404('Пост не найден')
+    context = {
+        'post_id': post_id,
+        'comments': comments
+    }
+    return render(request, 'includes/comments.html', context)
+
 @login_required
 def post_create(request):
     """Возвращает страницу создания поста для авторизованного пользователя."""
@@ -245,19 +318,17 @@ def add_comment(request, post_id):
     # После создания комментария, возвращаем на страницу детали поста
     return redirect('posts:post_detail', post_id=post_id)
 
+@query_budget(6)
 @login_required
 def follow_index(request):
     """Страница с постами авторов, на которых подписан
     текущий пользователь.
     """
-    # получается, читаем с конца: пользователь, который отправляет запрос
-    # он же user из модели Follow, найти связанные с ним following,
-    # т е тех, на кого он подписан, они же будут являться авторами в
-    # модели Post, показать все посты этих авторов
-    posts_list = Post.objects.filter(author__following__user=request.user).order_by('-pub_date')
-    paginator = Paginator(posts_list, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # лента читается из материализованной таблицы TimelineEntry,
+    # посты авторов-«звёзд» подмешиваются при чтении
+    posts_list = timeline.feed_queryset(request.user).select_related(
+        'author', 'group')
+    page_obj = get_page_obj(request, posts_list)
     context = {
         'user': request.user,
         'page_obj': page_obj,
@@ -308,8 +379,21 @@ def profile_unfollow(request, username):
 
 
 def search_view(request):
+    """Полнотекстовый поиск по заголовку, анонсу, тексту и тэгам постов.
+
+    Результаты ранжированы по релевантности, разбиты на страницы,
+    найденные слова подсвечены во фрагменте текста.
+    """
     keyword = request.GET.get('q', '')  # Получаем значение поискового запроса
-    posts = Post.objects.filter(
-        Q(title__icontains=keyword) | Q(text__icontains=keyword)
-    )  # Поиск по заголовку и тексту
-    return render(request, 'posts/search_results.html', {'posts': posts, 'keyword': keyword})
+    posts_list = search.search_posts(keyword).select_related('author', 'group')
+    # у выдачи поиска порядок по релевантности, а не по дате,
+    # поэтому здесь обычные номера страниц
+    paginator = EstimatedCountPaginator(posts_list, POSTS_PER_PAGE)
+    page_obj = paginator.get_page(request.GET.get('page'))
+    page_obj.object_list = search.highlight(page_obj.object_list, keyword)
+    context = {
+        'page_obj': page_obj,
+        'posts': page_obj.object_list,
+        'keyword': keyword
+    }
+    return render(request, 'posts/search_results.html', context)